@@ -0,0 +1,124 @@
+#!/bin/bash
+# memory-write-trigger.sh - UserPromptSubmit hook (Hot Path)
+# VERSION: 2.50.0
+#
+# Detects explicit memory intent in the user's prompt ("remember ...",
+# "note that ...", "don't forget ...", "keep in mind ..."; the list is
+# hot_path.auto_triggers in ~/.ralph/config/memory-config.json) and stores the
+# prompt as a semantic fact via memory-manager.py.
+#
+# v2.50: Two tiers. This hook runs on every prompt and almost never fires,
+# so the first tier is pure bash (read builtin, parameter expansion, [[ =~ ]]
+# under nocasematch) and answers "no trigger" without forking jq, python or
+# any other process. Only bash 3.2 features are used so the hook still prints
+# JSON under macOS /bin/bash.
+# Only when the raw input matches a trigger does the second tier parse the
+# JSON with jq, confirm the match on the prompt itself, and start
+# `memory-manager.py write` detached so the prompt is never held up.
+#
+# Security (v2.49.1):
+#   SEC-002: ERR trap guarantees JSON output; MATCHED goes through escape_json
+#   The prompt reaches memory-manager.py as one argv element (--content=...),
+#   never through eval or a shell string.
+#
+# Always exits 0 with {"decision": "continue"}.
+
+set -euo pipefail
+umask 077
+
+MAX_INPUT_BYTES=100000
+MAX_CONTENT_CHARS=2000
+
+CONFIG_FILE="${HOME}/.ralph/config/memory-config.json"
+MEMORY_MANAGER="${HOME}/.claude/scripts/memory-manager.py"
+DEFAULT_TRIGGERS=("remember" "note" "don't forget" "keep in mind")
+
+# Guaranteed JSON output on command failure (exit != 0)
+output_json() {
+    echo '{"decision": "continue"}'
+}
+trap 'output_json; exit 0' ERR
+
+escape_json() {
+    local s="$1"
+    s="${s//\\/\\\\}"
+    s="${s//\"/\\\"}"
+    s="${s//[[:cntrl:]]/ }"
+    printf '%s' "$s"
+}
+
+# --- Tier 1: pure bash, no forks ----------------------------------------------
+
+INPUT=""
+IFS= read -r -d '' -n "$MAX_INPUT_BYTES" INPUT || true
+
+# Triggers from the config, read with builtins only; anything unexpected
+# falls back to the defaults
+TRIGGERS=()
+if [ -f "$CONFIG_FILE" ]; then
+    CONFIG=""
+    IFS= read -r -d '' -n "$MAX_INPUT_BYTES" CONFIG < "$CONFIG_FILE" || true
+    if [[ "$CONFIG" =~ \"auto_triggers\"[[:space:]]*:[[:space:]]*\[([^]]*)\] ]]; then
+        LIST="${BASH_REMATCH[1]}"
+        while [[ "$LIST" =~ ^[^\"]*\"([^\"]+)\"(.*)$ ]]; do
+            TRIGGERS+=("${BASH_REMATCH[1]}")
+            LIST="${BASH_REMATCH[2]}"
+        done
+    fi
+fi
+[ "${#TRIGGERS[@]}" -gt 0 ] || TRIGGERS=("${DEFAULT_TRIGGERS[@]}")
+
+# One alternation; characters outside [[:alnum:] '] match anything, which can
+# only widen tier 1 (tier 2 re-checks the prompt alone)
+ALTERNATION=""
+for t in "${TRIGGERS[@]}"; do
+    ALTERNATION+="${ALTERNATION:+|}${t//[^[:alnum:] \']/.}"
+done
+TRIGGER_RE="(^|[^[:alnum:]])(${ALTERNATION})([^[:alnum:]]|$)"
+
+# Case-insensitive matching without ${var,,} (bash 4+)
+shopt -s nocasematch
+
+if [[ ! "$INPUT" =~ $TRIGGER_RE ]]; then
+    output_json
+    exit 0
+fi
+
+# --- Tier 2: a trigger word is somewhere in the payload -----------------------
+
+if ! command -v jq &>/dev/null; then
+    output_json
+    exit 0
+fi
+
+if [ -f "$CONFIG_FILE" ] \
+        && [ "$(jq -r '.hot_path.enabled != false' "$CONFIG_FILE" 2>/dev/null || echo true)" = "false" ]; then
+    output_json
+    exit 0
+fi
+
+PROMPT=$(jq -r '(.user_prompt // .prompt // "") | strings' <<< "$INPUT" 2>/dev/null || true)
+if [[ ! "$PROMPT" =~ $TRIGGER_RE ]]; then
+    output_json
+    exit 0
+fi
+MATCHED="${BASH_REMATCH[2]}"
+# Report the trigger as configured, not as the user happened to type it
+for t in "${TRIGGERS[@]}"; do
+    if [[ "$MATCHED" =~ ^${t//[^[:alnum:] \']/.}$ ]]; then
+        MATCHED="$t"
+        break
+    fi
+done
+
+CONTENT="${PROMPT//[[:cntrl:]]/ }"
+CONTENT="${CONTENT:0:$MAX_CONTENT_CHARS}"
+
+if [ -f "$MEMORY_MANAGER" ] && command -v python3 &>/dev/null; then
+    nohup python3 "$MEMORY_MANAGER" write semantic --content="$CONTENT" \
+        --category user_note --tags="auto-trigger" </dev/null >/dev/null 2>&1 &
+fi
+
+printf '{"decision": "continue", "memory_trigger": {"detected": true, "trigger": "%s"}}\n' \
+    "$(escape_json "$MATCHED")"
+exit 0
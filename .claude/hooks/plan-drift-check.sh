@@ -0,0 +1,61 @@
+#!/bin/bash
+# plan-drift-check.sh - PostToolUse(Edit|Write|MultiEdit) hook
+# VERSION: 2.50.0
+#
+# Incremental plan drift: when an edited file belongs to a plan-state step,
+# plan-drift.py re-fingerprints that one file, compares its exported
+# interface with the step's completion baseline and flags downstream steps
+# whose specs need patching (reported by `ralph plan sync`).
+#
+# v2.50: Edits to files no step declared are answered in pure bash: the
+# edited path is looked up in .claude/plan-drift.json's text with a
+# substring test, without forking python or jq. Paths that arrive
+# JSON-escaped (a backslash in the raw value) skip the shortcut.
+#
+# Always exits 0 with {"decision": "continue"}: drift is reported, never
+# blocking.
+
+set -euo pipefail
+umask 077
+
+MAX_INPUT_BYTES=100000
+
+DRIFT_ENGINE="${HOME}/.claude/scripts/plan-drift.py"
+DRIFT_INDEX=".claude/plan-drift.json"
+
+# Guaranteed JSON output on command failure (exit != 0)
+output_json() {
+    echo '{"decision": "continue"}'
+}
+trap 'output_json; exit 0' ERR
+
+INPUT=""
+IFS= read -r -d '' -n "$MAX_INPUT_BYTES" INPUT || true
+
+if [ ! -f "$DRIFT_INDEX" ] || [ ! -f "$DRIFT_ENGINE" ] \
+        || [[ ! "$INPUT" =~ \"tool_name\"[[:space:]]*:[[:space:]]*\"(Edit|Write|MultiEdit)\" ]] \
+        || [[ ! "$INPUT" =~ \"file_path\"[[:space:]]*:[[:space:]]*\"([^\"]+)\" ]]; then
+    output_json
+    exit 0
+fi
+
+# Declared files are stored relative to the project root
+FILE_PATH="${BASH_REMATCH[1]}"
+REL_PATH="${FILE_PATH#"$PWD"/}"
+REL_PATH="${REL_PATH#./}"
+
+INDEX=""
+IFS= read -r -d '' INDEX < "$DRIFT_INDEX" || true
+if { [[ "$REL_PATH" != *\\* ]] && [[ "$INDEX" != *"\"${REL_PATH}\":{"* ]]; } \
+        || ! command -v python3 &>/dev/null; then
+    output_json
+    exit 0
+fi
+
+OUTPUT=$(printf '%s' "$INPUT" | python3 "$DRIFT_ENGINE" hook 2>/dev/null || true)
+if [[ "$OUTPUT" == "{"* ]]; then
+    printf '%s\n' "$OUTPUT"
+else
+    output_json
+fi
+exit 0
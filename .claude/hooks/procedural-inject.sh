@@ -0,0 +1,49 @@
+#!/bin/bash
+# procedural-inject.sh - PreToolUse(Task) hook
+# VERSION: 2.50.0
+#
+# Injects learned procedural rules (~/.ralph/procedural/rules.json) that match
+# the Task's description/prompt as additionalContext:
+#   "Based on past experience: [learned behavior]"
+#
+# v2.50: Matching goes through procedural-matcher.py, which compiles the rules
+# (confidence threshold from memory-config.json pre-applied, keyword index)
+# whenever rules.json or the config changes. Each call tokenizes the prompt
+# once, so latency stays flat as the rule base grows.
+#
+# Security (v2.49.1):
+#   SEC-006: ERR trap guarantees JSON output
+#
+# Always exits 0 with {"decision": "continue"}: rule injection must never
+# block a Task.
+
+set -euo pipefail
+umask 077
+
+MAX_INPUT_BYTES=100000
+
+MATCHER="${HOME}/.claude/scripts/procedural-matcher.py"
+RULES_FILE="${HOME}/.ralph/procedural/rules.json"
+
+# Guaranteed JSON output on command failure (exit != 0)
+output_json() {
+    echo '{"decision": "continue"}'
+}
+trap 'output_json; exit 0' ERR
+
+INPUT=$(head -c "$MAX_INPUT_BYTES")
+
+# Cheap exits first: only Task calls, and only when rules exist
+if [[ ! "$INPUT" =~ \"tool_name\"[[:space:]]*:[[:space:]]*\"Task\" ]] \
+        || [ ! -s "$RULES_FILE" ] || [ ! -f "$MATCHER" ] || ! command -v python3 &>/dev/null; then
+    output_json
+    exit 0
+fi
+
+OUTPUT=$(printf '%s' "$INPUT" | python3 "$MATCHER" hook 2>/dev/null || true)
+if [[ "$OUTPUT" == "{"* ]]; then
+    printf '%s\n' "$OUTPUT"
+else
+    output_json
+fi
+exit 0
@@ -0,0 +1,885 @@
+#!/bin/bash
+# quality-gates-v2.sh - Quality-first validation (PostToolUse Edit|Write, `ralph gates`)
+# VERSION: 2.50.0
+#
+# Stages (quality over consistency):
+#   STAGE 1: CORRECTNESS   syntax / parse errors          BLOCKING
+#   STAGE 2: QUALITY       type checkers, builds           BLOCKING
+#   STAGE 2.5: SECURITY    semgrep SAST, gitleaks secrets  BLOCKING
+#   STAGE 3: CONSISTENCY   linters / formatters            ADVISORY (warning only)
+#
+# Languages: TypeScript, JavaScript, Python, Go, Rust, Solidity, Swift, JSON,
+# YAML, plus GitHub Actions workflows (actionlint).
+#
+# History:
+#   VERSION: 2.46.0 - advisory consistency stage (quality over consistency)
+#   VERSION: 2.48.0 - STAGE 2.5: SECURITY (semgrep + gitleaks, graceful degradation)
+#
+# v2.50: Change-scoped gates. The gates run on a file set instead of the whole
+# project whenever one is known:
+#   - hook payload: tool_input.file_path of the Edit/Write that triggered us
+#   - `--changed`:  `git diff --name-only HEAD` plus untracked files
+#   - FILE...:      explicit paths (`ralph gates src/a.py src/b.ts`)
+# Only the stages of the languages present in the set are planned, and every
+# tool that accepts file arguments (ast, node --check, jq, pyright, eslint,
+# ruff, gofmt, rustfmt, semgrep, gitleaks, actionlint) gets just those files.
+# Type checkers widen to dependents only when they need them: when the diff
+# against HEAD touches an exported declaration, the importers of the file are
+# added (pyright, tsc) or go vet runs on ./... instead of the file's package.
+# Past RALPH_GATES_MAX_DEPENDENTS importers the checker runs project-wide.
+# `--full` or RALPH_GATES_SCOPE=full restores the whole-project run.
+#
+# v2.50: Parallel gate runner. Stages run in per-language lanes on a worker
+# pool of RALPH_GATES_JOBS (default: CPU count), each with its own captured
+# output and timing. Every run writes one JSON report (RALPH_GATES_REPORT,
+# default ~/.ralph/gates/last-report.json); `--json` also prints it on
+# stdout, with the human-readable progress moved to stderr.
+#
+# Blocking (legacy-compatible): RALPH_GATES_BLOCKING=1 turns a failed
+# blocking stage into {"decision": "block"} (hook) or exit 2 (CLI); the
+# default (0) reports the same failures without blocking.
+#
+# Hook mode always exits 0 with one JSON object on stdout; progress goes to
+# stderr.
+
+set -euo pipefail
+umask 077
+
+MAX_INPUT_BYTES=100000
+BLOCKING_MODE="${RALPH_GATES_BLOCKING:-0}"
+SCOPE_MODE="${RALPH_GATES_SCOPE:-auto}"
+GATE_TIMEOUT="${RALPH_GATES_TIMEOUT:-300}"
+SEMGREP_TIMEOUT="${RALPH_SEMGREP_TIMEOUT:-5}"
+GITLEAKS_TIMEOUT="${RALPH_GITLEAKS_TIMEOUT:-5}"
+MAX_DEPENDENTS="${RALPH_GATES_MAX_DEPENDENTS:-50}"
+MAX_REPORT_LINES=20
+REPORT_FILE="${RALPH_GATES_REPORT:-${HOME}/.ralph/gates/last-report.json}"
+JSON_OUTPUT=0
+
+HOOK_MODE=0
+
+# Guaranteed JSON output on command failure (exit != 0) in hook mode
+output_json() {
+    echo '{"decision": "continue"}'
+}
+on_error() {
+    if [ "$HOOK_MODE" = "1" ]; then
+        output_json
+        exit 0
+    fi
+    exit 1
+}
+trap on_error ERR
+
+# --- Input: hook payload or CLI arguments --------------------------------------
+
+SCOPE_FILES=()
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --changed) SCOPE_MODE="changed" ;;
+        --full)    SCOPE_MODE="full" ;;
+        --json)    JSON_OUTPUT=1 ;;
+        --)        shift; SCOPE_FILES+=("$@"); break ;;
+        -*)        echo "quality-gates-v2.sh: unknown option: $1" >&2; exit 1 ;;
+        *)         SCOPE_FILES+=("$1") ;;
+    esac
+    shift
+done
+
+INPUT=""
+if [ ! -t 0 ]; then
+    IFS= read -r -d '' -n "$MAX_INPUT_BYTES" INPUT || true
+fi
+
+if [[ "$INPUT" =~ \"tool_name\"[[:space:]]*: ]]; then
+    HOOK_MODE=1
+    # Hook output is JSON on stdout; everything human-readable goes to stderr
+    exec 3>&2
+    if [ "$SCOPE_MODE" = "auto" ]; then
+        if [[ ! "$INPUT" =~ \"(file_path|notebook_path)\"[[:space:]]*:[[:space:]]*\"([^\"]+)\" ]]; then
+            # Not a file edit (or malformed payload): nothing to gate
+            output_json
+            exit 0
+        fi
+        SCOPE_FILES+=("${BASH_REMATCH[2]}")
+    fi
+elif [ "$JSON_OUTPUT" = "1" ]; then
+    exec 3>&2
+else
+    exec 3>&1
+fi
+
+if [ ${#SCOPE_FILES[@]} -gt 0 ]; then
+    SCOPE_MODE="files"
+elif [ "$SCOPE_MODE" = "auto" ]; then
+    SCOPE_MODE="full"
+fi
+
+if [ "$HOOK_MODE" = "0" ] && [ -t 3 ]; then
+    RED='\033[0;31m'; GREEN='\033[0;32m'; YELLOW='\033[1;33m'; BLUE='\033[0;34m'; NC='\033[0m'
+else
+    RED=''; GREEN=''; YELLOW=''; BLUE=''; NC=''
+fi
+say() { echo -e "$1" >&3; }
+
+WORK_DIR=$(mktemp -d "${TMPDIR:-/tmp}/ralph-gates.XXXXXX")
+trap 'rm -rf "$WORK_DIR"' EXIT
+
+IN_GIT=0
+if git rev-parse --is-inside-work-tree &>/dev/null; then
+    IN_GIT=1
+fi
+
+TIMEOUT_BIN=""
+if command -v timeout &>/dev/null; then
+    TIMEOUT_BIN="timeout"
+elif command -v gtimeout &>/dev/null; then
+    TIMEOUT_BIN="gtimeout"
+fi
+
+# run_timeout SECONDS CMD... - bounded tool run (no-op bound without coreutils)
+run_timeout() {
+    local seconds="$1"
+    shift
+    if [ -n "$TIMEOUT_BIN" ]; then
+        "$TIMEOUT_BIN" "$seconds" "$@"
+    else
+        "$@"
+    fi
+}
+
+# node_bin NAME - project-local node tool first, then PATH
+node_bin() {
+    if [ -x "node_modules/.bin/$1" ]; then
+        echo "node_modules/.bin/$1"
+    elif command -v "$1" &>/dev/null; then
+        command -v "$1"
+    fi
+}
+
+# --- File set ------------------------------------------------------------------
+
+changed_files() {
+    if git rev-parse --verify -q HEAD &>/dev/null; then
+        git diff --name-only --diff-filter=ACMR HEAD -- 2>/dev/null || true
+    else
+        git diff --name-only --diff-filter=ACMR --cached -- 2>/dev/null || true
+    fi
+    git ls-files --others --exclude-standard 2>/dev/null || true
+}
+
+project_files() {
+    if [ "$IN_GIT" = "1" ]; then
+        git ls-files --cached --others --exclude-standard 2>/dev/null || true
+    else
+        find . \( -name node_modules -o -name .git -o -name vendor -o -name target \
+                -o -name dist -o -name build -o -name .venv -o -name venv \
+                -o -name __pycache__ \) -prune -o -type f -print 2>/dev/null | sed 's|^\./||'
+    fi
+}
+
+case "$SCOPE_MODE" in
+    files|full) ;;
+    changed)
+        if [ "$IN_GIT" = "0" ]; then
+            say "${YELLOW}[WARN]${NC} --changed needs a git work tree; running full gates"
+            SCOPE_MODE="full"
+        else
+            while IFS= read -r f; do
+                [ -n "$f" ] && SCOPE_FILES+=("$f")
+            done < <(changed_files | sort -u)
+            SCOPE_MODE="files"
+        fi
+        ;;
+    *)
+        say "${YELLOW}[WARN]${NC} Unknown RALPH_GATES_SCOPE '$SCOPE_MODE'; running full gates"
+        SCOPE_MODE="full"
+        ;;
+esac
+
+FILES_PY=(); FILES_TS=(); FILES_JS=(); FILES_GO=(); FILES_RS=(); FILES_SOL=()
+FILES_SWIFT=(); FILES_JSON=(); FILES_YAML=(); FILES_GHA=(); FILES_ALL=()
+
+classify_file() {
+    local f="$1"
+    [ -f "$f" ] || return 0
+    f="${f#"$PWD"/}"
+    f="${f#./}"
+    FILES_ALL+=("$f")
+    case "$f" in
+        *.py|*.pyi)                   FILES_PY+=("$f") ;;
+        *.ts|*.tsx|*.mts|*.cts)       FILES_TS+=("$f") ;;
+        *.js|*.jsx|*.mjs|*.cjs)       FILES_JS+=("$f") ;;
+        *.go)                         FILES_GO+=("$f") ;;
+        *.rs)                         FILES_RS+=("$f") ;;
+        *.sol)                        FILES_SOL+=("$f") ;;
+        *.swift)                      FILES_SWIFT+=("$f") ;;
+        tsconfig*.json|*/tsconfig*.json|jsconfig*.json|*/jsconfig*.json|.vscode/*) ;;
+        *.json)                       FILES_JSON+=("$f") ;;
+        *.yml|*.yaml)
+            FILES_YAML+=("$f")
+            case "$f" in
+                .github/workflows/*) FILES_GHA+=("$f") ;;
+            esac
+            ;;
+    esac
+    return 0
+}
+
+if [ "$SCOPE_MODE" = "files" ]; then
+    for f in ${SCOPE_FILES[@]+"${SCOPE_FILES[@]}"}; do
+        classify_file "$f"
+    done
+else
+    while IFS= read -r f; do
+        classify_file "$f"
+    done < <(project_files)
+fi
+
+# --- Dependents (scoped type checks only) ----------------------------------------
+
+# Declarations that make up a file's importable interface, matched against
+# the +/- lines of `git diff -U0 HEAD`
+DECL_RE_PY='^[-+]((async[[:space:]]+)?def|class)[[:space:]]|^[-+][[:space:]]+(async[[:space:]]+)?def[[:space:]]+[A-Za-z]|^[-+][A-Za-z][A-Za-z0-9_]*[[:space:]]*(:[^=]*)?=|^[-+]__all__'
+DECL_RE_TS='^[-+][[:space:]]*(export[[:space:]]|module\.exports)'
+DECL_RE_GO='^[-+](func|type|var|const)[[:space:]]+(\([^)]*\)[[:space:]]*)?[A-Z]|^[-+][[:space:]]+[A-Z][A-Za-z0-9_]*[[:space:]]'
+
+# interface_changed FILE DECL_RE - true when dependents may see a difference.
+# New or untracked files count as changed; without git we cannot tell either.
+interface_changed() {
+    local file="$1" decl_re="$2" diff
+    [ "$IN_GIT" = "1" ] || return 0
+    git ls-files --error-unmatch -- "$file" &>/dev/null || return 0
+    git rev-parse --verify -q HEAD &>/dev/null || return 0
+    diff=$(git diff --no-ext-diff -U0 HEAD -- "$file" 2>/dev/null || true)
+    diff=$(printf '%s\n' "$diff" | grep -vE '^(\+\+\+|---) ' || true)
+    grep -qE "$decl_re" <<< "$diff"
+}
+
+# find_dependents py|ts FILE - files importing FILE's module (by module name)
+find_dependents() {
+    local lang="$1" file="$2" mod pattern
+    local -a globs
+    mod=$(basename "$file")
+    mod="${mod%.*}"
+    case "$lang" in
+        py)
+            [ "$mod" != "__init__" ] || mod=$(basename "$(dirname "$file")")
+            [[ "$mod" =~ ^[A-Za-z_][A-Za-z0-9_]*$ ]] || return 0
+            pattern="^[[:space:]]*(from|import)[[:space:]](.*[^[:alnum:]_])?${mod}([^[:alnum:]_]|\$)"
+            globs=('*.py' '*.pyi')
+            ;;
+        ts)
+            [ "$mod" != "index" ] || mod=$(basename "$(dirname "$file")")
+            [[ "$mod" =~ ^[A-Za-z0-9_.-]+$ ]] || return 0
+            mod="${mod//./\\.}"
+            pattern="(from|require\\(|import\\()[[:space:]]*['\"][^'\"]*/${mod}(\\.[cm]?[jt]sx?)?(/index)?['\"]"
+            globs=('*.ts' '*.tsx' '*.mts' '*.cts')
+            ;;
+    esac
+    if [ "$IN_GIT" = "1" ]; then
+        git grep -lE "$pattern" -- "${globs[@]}" 2>/dev/null || true
+    else
+        grep -rlE "$pattern" --exclude-dir=node_modules --exclude-dir=.git \
+            "${globs[@]/#/--include=}" . 2>/dev/null | sed 's|^\./||' || true
+    fi | grep -vxF "$file" || true
+}
+
+# widen LANG DECL_RE FILES... - sets WIDE_FILES (files + needed dependents) and
+# WIDE_PROJECT=1 when there are too many dependents to list
+widen() {
+    local lang="$1" decl_re="$2" f
+    shift 2
+    WIDE_PROJECT=0
+    WIDE_FILES=("$@")
+    local deps="$WORK_DIR/deps.$lang"
+    : > "$deps"
+    for f in "$@"; do
+        if interface_changed "$f" "$decl_re"; then
+            find_dependents "$lang" "$f" >> "$deps"
+        fi
+    done
+    local count=0
+    while IFS= read -r f; do
+        [ -f "$f" ] || continue
+        WIDE_FILES+=("$f")
+        count=$((count + 1))
+    done < <(sort -u "$deps")
+    if [ "$count" -gt "$MAX_DEPENDENTS" ]; then
+        WIDE_PROJECT=1
+    fi
+    if [ "$count" -gt 0 ]; then
+        echo "widened to $count dependent file(s)"
+    fi
+}
+
+# --- Stage implementations --------------------------------------------------------
+# Each prints its findings and returns 0 (pass), 1 (fail) or 125 (skipped:
+# tool unavailable or nothing to check). They run in a subshell with their
+# output captured, so they may exit early.
+
+SKIP=125
+
+gate_python_syntax() {
+    command -v python3 &>/dev/null || { echo "python3 not found"; return $SKIP; }
+    python3 - "${FILES_PY[@]}" <<'PY'
+import ast
+import sys
+
+failed = 0
+for path in sys.argv[1:]:
+    try:
+        with open(path, "rb") as handle:
+            ast.parse(handle.read(), path)
+    except SyntaxError as exc:
+        failed = 1
+        print(f"{path}:{exc.lineno}: {exc.msg}")
+    except (OSError, ValueError) as exc:
+        failed = 1
+        print(f"{path}: {exc}")
+sys.exit(failed)
+PY
+}
+
+gate_js_syntax() {
+    command -v node &>/dev/null || { echo "node not found"; return $SKIP; }
+    local f rc=0
+    for f in "${FILES_JS[@]}"; do
+        node --check "$f" 2>&1 || rc=1
+    done
+    return $rc
+}
+
+gate_json() {
+    command -v jq &>/dev/null || { echo "jq not found"; return $SKIP; }
+    local f rc=0
+    for f in "${FILES_JSON[@]}"; do
+        if ! jq empty "$f" >/dev/null 2>&1; then
+            echo "$f: invalid JSON"
+            rc=1
+        fi
+    done
+    return $rc
+}
+
+gate_yaml() {
+    command -v python3 &>/dev/null && python3 -c 'import yaml' 2>/dev/null \
+        || { echo "PyYAML not available"; return $SKIP; }
+    python3 - "${FILES_YAML[@]}" <<'PY'
+import sys
+
+import yaml
+
+failed = 0
+for path in sys.argv[1:]:
+    try:
+        with open(path, "rb") as handle:
+            list(yaml.safe_load_all(handle))
+    except yaml.YAMLError as exc:
+        failed = 1
+        print(f"{path}: {exc}")
+    except OSError as exc:
+        failed = 1
+        print(f"{path}: {exc}")
+sys.exit(failed)
+PY
+}
+
+gate_swift_syntax() {
+    command -v swiftc &>/dev/null || { echo "swiftc not found"; return $SKIP; }
+    run_timeout "$GATE_TIMEOUT" swiftc -parse "${FILES_SWIFT[@]}" 2>&1
+}
+
+gate_go_syntax() {
+    command -v gofmt &>/dev/null || { echo "gofmt not found"; return $SKIP; }
+    gofmt -e -l "${FILES_GO[@]}" >/dev/null
+}
+
+gate_pyright() {
+    command -v pyright &>/dev/null || { echo "pyright not found (npm i -g pyright)"; return $SKIP; }
+    if [ "$SCOPE_MODE" = "full" ]; then
+        run_timeout "$GATE_TIMEOUT" pyright 2>&1
+        return
+    fi
+    widen py "$DECL_RE_PY" "${FILES_PY[@]}"
+    if [ "$WIDE_PROJECT" = "1" ]; then
+        echo "too many dependents; checking the whole project"
+        run_timeout "$GATE_TIMEOUT" pyright 2>&1
+    else
+        run_timeout "$GATE_TIMEOUT" pyright "${WIDE_FILES[@]}" 2>&1
+    fi
+}
+
+gate_tsc() {
+    local tsc
+    tsc=$(node_bin tsc)
+    [ -n "$tsc" ] || { echo "tsc not found (npm i -D typescript)"; return $SKIP; }
+    if [ "$SCOPE_MODE" = "full" ]; then
+        if [ -f tsconfig.json ]; then
+            run_timeout "$GATE_TIMEOUT" "$tsc" --noEmit 2>&1
+        else
+            run_timeout "$GATE_TIMEOUT" "$tsc" --noEmit --skipLibCheck "${FILES_TS[@]}" 2>&1
+        fi
+        return
+    fi
+    widen ts "$DECL_RE_TS" "${FILES_TS[@]}"
+    if [ ! -f tsconfig.json ]; then
+        run_timeout "$GATE_TIMEOUT" "$tsc" --noEmit --skipLibCheck "${WIDE_FILES[@]}" 2>&1
+        return
+    fi
+    if [ "$WIDE_PROJECT" = "1" ]; then
+        echo "too many dependents; checking the whole project"
+        run_timeout "$GATE_TIMEOUT" "$tsc" --noEmit 2>&1
+        return
+    fi
+    # tsc ignores tsconfig.json when given files, so the scoped program is a
+    # throwaway config in WORK_DIR (never in the user's tree, where a killed
+    # run would leave it for the next --changed): same compilerOptions via an
+    # absolute extends, only these roots (tsc still follows their imports)
+    local TS_GATE_CONFIG="$WORK_DIR/tsconfig.gates.json"
+    local abs=() f
+    for f in "${WIDE_FILES[@]}"; do
+        case "$f" in
+            /*) abs+=("$f") ;;
+            *)  abs+=("$PWD/$f") ;;
+        esac
+    done
+    # Default @types lookup starts at the config's directory; keep it on the project
+    local type_roots="[]"
+    grep -q '"typeRoots"' tsconfig.json 2>/dev/null \
+        || type_roots=$(jq -cn --arg d "$PWD/node_modules/@types" '[$d]')
+    jq -n --arg base "$PWD/tsconfig.json" --argjson roots "$type_roots" --args \
+        '{extends: $base,
+          compilerOptions: ({noEmit: true, incremental: false, composite: false}
+                            + (if $roots == [] then {} else {typeRoots: $roots} end)),
+          files: $ARGS.positional, include: []}' "${abs[@]}" > "$TS_GATE_CONFIG"
+    run_timeout "$GATE_TIMEOUT" "$tsc" -p "$TS_GATE_CONFIG" 2>&1
+}
+
+gate_go_vet() {
+    command -v go &>/dev/null || { echo "go not found"; return $SKIP; }
+    [ -f go.mod ] || { echo "no go.mod"; return $SKIP; }
+    if [ "$SCOPE_MODE" = "full" ]; then
+        run_timeout "$GATE_TIMEOUT" go vet ./... 2>&1
+        return
+    fi
+    local f exported=0
+    local -a pkgs=()
+    for f in "${FILES_GO[@]}"; do
+        case "$f" in /*) continue ;; esac
+        pkgs+=("./$(dirname "$f")")
+        if interface_changed "$f" "$DECL_RE_GO"; then
+            exported=1
+        fi
+    done
+    [ ${#pkgs[@]} -gt 0 ] || { echo "no files inside the module"; return $SKIP; }
+    if [ "$exported" = "1" ]; then
+        echo "exported declarations changed; vetting ./..."
+        run_timeout "$GATE_TIMEOUT" go vet ./... 2>&1
+    else
+        # shellcheck disable=SC2046
+        run_timeout "$GATE_TIMEOUT" go vet $(printf '%s\n' "${pkgs[@]}" | sort -u) 2>&1
+    fi
+}
+
+gate_cargo_check() {
+    command -v cargo &>/dev/null || { echo "cargo not found"; return $SKIP; }
+    [ -f Cargo.toml ] || { echo "no Cargo.toml"; return $SKIP; }
+    # cargo checks whole crates; there is no per-file mode
+    run_timeout "$GATE_TIMEOUT" cargo check --quiet 2>&1
+}
+
+gate_forge_build() {
+    command -v forge &>/dev/null || { echo "forge not found"; return $SKIP; }
+    [ -f foundry.toml ] || { echo "no foundry.toml"; return $SKIP; }
+    run_timeout "$GATE_TIMEOUT" forge build 2>&1
+}
+
+gate_actionlint() {
+    command -v actionlint &>/dev/null || { echo "actionlint not found"; return $SKIP; }
+    run_timeout "$GATE_TIMEOUT" actionlint "${FILES_GHA[@]}" 2>&1
+}
+
+gate_semgrep() {
+    if ! command -v semgrep &>/dev/null; then
+        echo "semgrep not installed (install: ~/.claude/scripts/install-security-tools.sh or pip install semgrep)"
+        return $SKIP
+    fi
+    if [ "$SCOPE_MODE" = "full" ]; then
+        run_timeout "$GATE_TIMEOUT" semgrep scan --config auto --error --quiet . 2>&1
+    else
+        run_timeout "$SEMGREP_TIMEOUT" semgrep scan --config auto --error --quiet "${FILES_ALL[@]}" 2>&1
+    fi
+    local rc=$?
+    # A timed-out scan is inconclusive, not a finding
+    [ "$rc" -ne 124 ] || { echo "semgrep timed out"; return $SKIP; }
+    return $rc
+}
+
+gate_gitleaks() {
+    if ! command -v gitleaks &>/dev/null; then
+        echo "gitleaks not installed (install: brew install gitleaks)"
+        return $SKIP
+    fi
+    local f rc out found=0 timed_out=0
+    if [ "$SCOPE_MODE" = "full" ]; then
+        rc=0
+        run_timeout "$GATE_TIMEOUT" gitleaks detect --source . --no-banner --redact 2>&1 || rc=$?
+        case "$rc" in 0) ;; 124) timed_out=1 ;; *) found=1 ;; esac
+    else
+        # A finding in any file wins over timeouts in others
+        for f in "${FILES_ALL[@]}"; do
+            rc=0
+            out=$(run_timeout "$GITLEAKS_TIMEOUT" gitleaks detect --no-git --source "$f" \
+                --no-banner --redact 2>&1) || rc=$?
+            case "$rc" in
+                0) ;;
+                124) timed_out=1; echo "gitleaks timed out on $f" ;;
+                *) found=1; echo "$out" ;;
+            esac
+        done
+    fi
+    if [ "$found" -eq 1 ]; then
+        echo "SECRETS detected (gitleaks): remove them and rotate the credentials"
+        return 1
+    fi
+    [ "$timed_out" -eq 0 ] || { echo "gitleaks timed out"; return $SKIP; }
+    return 0
+}
+
+gate_ruff() {
+    command -v ruff &>/dev/null || { echo "ruff not found"; return $SKIP; }
+    if [ "$SCOPE_MODE" = "full" ]; then
+        ruff check . 2>&1
+    else
+        ruff check "${FILES_PY[@]}" 2>&1
+    fi
+}
+
+gate_eslint() {
+    local eslint
+    eslint=$(node_bin eslint)
+    [ -n "$eslint" ] || { echo "eslint not found"; return $SKIP; }
+    if [ "$SCOPE_MODE" = "full" ]; then
+        run_timeout "$GATE_TIMEOUT" "$eslint" . 2>&1
+    else
+        run_timeout "$GATE_TIMEOUT" "$eslint" ${FILES_TS[@]+"${FILES_TS[@]}"} ${FILES_JS[@]+"${FILES_JS[@]}"} 2>&1
+    fi
+}
+
+gate_gofmt() {
+    command -v gofmt &>/dev/null || { echo "gofmt not found"; return $SKIP; }
+    local out
+    out=$(gofmt -l "${FILES_GO[@]}" 2>&1) || true
+    [ -z "$out" ] || { echo "needs gofmt:"; echo "$out"; return 1; }
+}
+
+gate_rustfmt() {
+    command -v rustfmt &>/dev/null || { echo "rustfmt not found"; return $SKIP; }
+    rustfmt --check "${FILES_RS[@]}" 2>&1
+}
+
+gate_forge_fmt() {
+    command -v forge &>/dev/null || { echo "forge not found"; return $SKIP; }
+    forge fmt --check "${FILES_SOL[@]}" 2>&1
+}
+
+gate_yamllint() {
+    command -v yamllint &>/dev/null || { echo "yamllint not found"; return $SKIP; }
+    yamllint "${FILES_YAML[@]}" 2>&1
+}
+
+
+# --- Plan ---------------------------------------------------------------------------
+
+STAGE_CLASS=(); STAGE_LANE=(); STAGE_NAME=(); STAGE_FN=()
+
+# stage CLASS LANE NAME FUNCTION
+stage() {
+    STAGE_CLASS+=("$1")
+    STAGE_LANE+=("$2")
+    STAGE_NAME+=("$3")
+    STAGE_FN+=("$4")
+}
+
+# STAGE 1: CORRECTNESS (blocking)
+[ ${#FILES_PY[@]} -eq 0 ]    || stage correctness python     "Python syntax"     gate_python_syntax
+[ ${#FILES_JS[@]} -eq 0 ]    || stage correctness javascript "JavaScript syntax" gate_js_syntax
+[ ${#FILES_GO[@]} -eq 0 ]    || stage correctness go         "Go syntax"         gate_go_syntax
+[ ${#FILES_SWIFT[@]} -eq 0 ] || stage correctness swift      "Swift syntax"      gate_swift_syntax
+[ ${#FILES_JSON[@]} -eq 0 ]  || stage correctness json       "JSON"              gate_json
+[ ${#FILES_YAML[@]} -eq 0 ]  || stage correctness yaml       "YAML"              gate_yaml
+
+# STAGE 2: QUALITY (blocking)
+[ ${#FILES_PY[@]} -eq 0 ]  || stage quality python     "Python types (pyright)"      gate_pyright
+[ ${#FILES_TS[@]} -eq 0 ]  || stage quality typescript "TypeScript types (tsc)"      gate_tsc
+[ ${#FILES_GO[@]} -eq 0 ]  || stage quality go         "Go vet"                      gate_go_vet
+[ ${#FILES_RS[@]} -eq 0 ]  || stage quality rust       "Rust (cargo check)"          gate_cargo_check
+[ ${#FILES_SOL[@]} -eq 0 ] || stage quality solidity   "Solidity (forge build)"      gate_forge_build
+[ ${#FILES_GHA[@]} -eq 0 ] || stage quality actions    "GitHub Actions (actionlint)" gate_actionlint
+
+# STAGE 2.5: SECURITY (blocking)
+if [ ${#FILES_ALL[@]} -gt 0 ]; then
+    stage security semgrep  "SAST (semgrep)"     gate_semgrep
+    stage security gitleaks "SECRETS (gitleaks)" gate_gitleaks
+fi
+
+# STAGE 3: CONSISTENCY (advisory)
+[ ${#FILES_PY[@]} -eq 0 ]   || stage consistency python     "Python lint (ruff)" gate_ruff
+[ $((${#FILES_TS[@]} + ${#FILES_JS[@]})) -eq 0 ] || stage consistency javascript "ESLint" gate_eslint
+[ ${#FILES_GO[@]} -eq 0 ]   || stage consistency go         "gofmt"              gate_gofmt
+[ ${#FILES_RS[@]} -eq 0 ]   || stage consistency rust       "rustfmt"            gate_rustfmt
+[ ${#FILES_SOL[@]} -eq 0 ]  || stage consistency solidity   "forge fmt"          gate_forge_fmt
+[ ${#FILES_YAML[@]} -eq 0 ] || stage consistency yaml       "yamllint"           gate_yamllint
+
+# --- Run ----------------------------------------------------------------------------
+# v2.50: Stages run in a worker pool of per-language lanes. A lane runs its
+# language's stages in plan order (syntax before types before lint, and no
+# two cargo/forge/node processes of one toolchain at once); lanes run
+# concurrently, at most RALPH_GATES_JOBS (default: CPU count) at a time, so a
+# polyglot change costs about as much as its slowest language. Every stage
+# writes its output, exit code and duration to WORK_DIR; results are
+# reported in plan order once the pool drains.
+
+JOBS="${RALPH_GATES_JOBS:-$(getconf _NPROCESSORS_ONLN 2>/dev/null || sysctl -n hw.ncpu 2>/dev/null || echo 4)}"
+if ! [[ "$JOBS" =~ ^[0-9]+$ ]] || [ "$JOBS" -lt 1 ]; then
+    JOBS=1
+fi
+
+# Sets NOW_MS to the current epoch time in milliseconds (no fork on bash 5+)
+now_ms() {
+    if [ -n "${EPOCHREALTIME:-}" ]; then
+        local USEC="${EPOCHREALTIME/[.,]/}"
+        NOW_MS=$((10#$USEC / 1000))
+    else
+        NOW_MS=$(( $(date +%s) * 1000 ))
+    fi
+}
+
+# stage_status CLASS RC - report status of a finished stage
+stage_status() {
+    if [ "$2" -eq 0 ]; then
+        echo "passed"
+    elif [ "$2" -eq "$SKIP" ]; then
+        echo "skipped"
+    elif [ "$1" = "consistency" ]; then
+        echo "warning"
+    else
+        echo "failed"
+    fi
+}
+
+# run_lane LANE - run LANE's stages in order (in a background subshell)
+run_lane() {
+    local lane="$1" i rc start status
+    for i in "${!STAGE_FN[@]}"; do
+        [ "${STAGE_LANE[$i]}" = "$lane" ] || continue
+        now_ms
+        start="$NOW_MS"
+        rc=0
+        ( set +e; "${STAGE_FN[$i]}" ) > "$WORK_DIR/stage.$i.log" 2>&1 || rc=$?
+        now_ms
+        status=$(stage_status "${STAGE_CLASS[$i]}" "$rc")
+        echo "$status $rc $((NOW_MS - start))" > "$WORK_DIR/stage.$i.status"
+    done
+}
+
+LANES=()
+for i in "${!STAGE_LANE[@]}"; do
+    case " ${LANES[*]-} " in
+        *" ${STAGE_LANE[$i]} "*) ;;
+        *) LANES+=("${STAGE_LANE[$i]}") ;;
+    esac
+done
+
+if [ "$SCOPE_MODE" = "files" ]; then
+    say "${BLUE}[INFO]${NC} Quality gates (scoped): ${#FILES_ALL[@]} file(s), ${#STAGE_FN[@]} stage(s), ${#LANES[@]} lane(s) x $JOBS jobs"
+else
+    say "${BLUE}[INFO]${NC} Quality gates (full project): ${#STAGE_FN[@]} stage(s), ${#LANES[@]} lane(s) x $JOBS jobs"
+fi
+
+# wait -n needs bash 4.3+; older shells poll
+HAS_WAIT_N=0
+if [ "${BASH_VERSINFO[0]}" -gt 4 ] || { [ "${BASH_VERSINFO[0]}" -eq 4 ] && [ "${BASH_VERSINFO[1]}" -ge 3 ]; }; then
+    HAS_WAIT_N=1
+fi
+
+now_ms
+RUN_START="$NOW_MS"
+LANE_PIDS=()
+RUNNING=0
+for lane in ${LANES[@]+"${LANES[@]}"}; do
+    while [ "$RUNNING" -ge "$JOBS" ]; do
+        if [ "$HAS_WAIT_N" -eq 1 ]; then
+            wait -n 2>/dev/null || true
+        else
+            sleep 0.1
+        fi
+        RUNNING=0
+        for pid in "${LANE_PIDS[@]}"; do
+            # Zombies still answer kill -0; they are picked up on the next wait -n
+            if kill -0 "$pid" 2>/dev/null; then
+                RUNNING=$((RUNNING + 1))
+            fi
+        done
+    done
+    run_lane "$lane" &
+    LANE_PIDS+=("$!")
+    RUNNING=$((RUNNING + 1))
+done
+for pid in ${LANE_PIDS[@]+"${LANE_PIDS[@]}"}; do
+    wait "$pid" 2>/dev/null || true
+done
+now_ms
+WALL_MS=$((NOW_MS - RUN_START))
+
+# --- Report -------------------------------------------------------------------------
+
+stage_header() {
+    case "$1" in
+        correctness) echo "STAGE 1: CORRECTNESS (blocking)" ;;
+        quality)     echo "STAGE 2: QUALITY (blocking)" ;;
+        security)    echo "STAGE 2.5: SECURITY (blocking)" ;;
+        consistency) echo "STAGE 3: CONSISTENCY (advisory)" ;;
+    esac
+}
+
+# fmt_ms MS - "1.25s"
+fmt_ms() {
+    printf '%d.%02ds' $(($1 / 1000)) $(($1 % 1000 / 10))
+}
+
+FAILED=(); WARNINGS=(); REPORT=""; SERIAL_MS=0; REPORT_ARGS=()
+LAST_CLASS=""
+for i in "${!STAGE_FN[@]}"; do
+    if [ "${STAGE_CLASS[$i]}" != "$LAST_CLASS" ]; then
+        LAST_CLASS="${STAGE_CLASS[$i]}"
+        say ""
+        say "$(stage_header "$LAST_CLASS")"
+    fi
+    OUT="$WORK_DIR/stage.$i.log"
+    NAME="${STAGE_NAME[$i]}"
+    # A lane killed mid-stage leaves no status: count it as failed
+    STATUS="failed"; RC=1; MS=0
+    if [ -f "$WORK_DIR/stage.$i.status" ]; then
+        read -r STATUS RC MS < "$WORK_DIR/stage.$i.status"
+    fi
+    SERIAL_MS=$((SERIAL_MS + MS))
+    REPORT_ARGS+=(--arg "meta$i" "$NAME"$'\t'"${STAGE_CLASS[$i]}"$'\t'"${STAGE_LANE[$i]}"$'\t'"$STATUS"$'\t'"$RC"$'\t'"$MS")
+    if [ -f "$OUT" ]; then
+        REPORT_ARGS+=(--rawfile "out$i" "$OUT")
+    fi
+    case "$STATUS" in
+        passed)
+            say "  ${GREEN}✓${NC} $NAME ($(fmt_ms "$MS"))"
+            continue
+            ;;
+        skipped)
+            say "  - $NAME: skipped ($(head -n 1 "$OUT" 2>/dev/null))"
+            continue
+            ;;
+        warning)
+            WARNINGS+=("$NAME")
+            say "  ${YELLOW}!${NC} $NAME (advisory warning, $(fmt_ms "$MS"))"
+            ;;
+        *)
+            FAILED+=("$NAME")
+            say "  ${RED}✗${NC} $NAME FAILED ($(fmt_ms "$MS"))"
+            ;;
+    esac
+    DETAIL=$(head -n "$MAX_REPORT_LINES" "$OUT" 2>/dev/null || true)
+    [ -z "$DETAIL" ] || say "$(sed 's/^/      /' <<< "$DETAIL")"
+    REPORT+="[$NAME]"$'\n'"$DETAIL"$'\n'
+done
+
+# join_names NAME... - "a, b, c"
+join_names() {
+    local out
+    out=$(printf '%s, ' "$@")
+    echo "${out%, }"
+}
+
+say ""
+if [ ${#FAILED[@]} -gt 0 ]; then
+    SUMMARY="Quality gates failed: $(join_names "${FAILED[@]}")"
+    RESULT="failed"
+elif [ ${#WARNINGS[@]} -gt 0 ]; then
+    SUMMARY="Quality gates passed with ${#WARNINGS[@]} advisory warning(s): $(join_names "${WARNINGS[@]}")"
+    RESULT="warnings"
+else
+    SUMMARY="Quality gates passed"
+    RESULT="passed"
+fi
+BLOCKED=false
+if [ ${#FAILED[@]} -gt 0 ] && [ "$BLOCKING_MODE" = "1" ]; then
+    BLOCKED=true
+fi
+say "$(fmt_ms "$WALL_MS") wall, $(fmt_ms "$SERIAL_MS") of stage time"
+
+# One JSON report per run: stages in plan order with their timing, built by
+# a single jq from the per-stage status lines and captured outputs
+REPORT_JSON=""
+if command -v jq &>/dev/null; then
+    REPORT_JSON=$(jq -n ${REPORT_ARGS[@]+"${REPORT_ARGS[@]}"} \
+        --argjson n "${#STAGE_FN[@]}" --argjson lines "$MAX_REPORT_LINES" \
+        --arg version "2.50.0" --arg scope "$SCOPE_MODE" --arg result "$RESULT" \
+        --arg cwd "$PWD" --arg timestamp "$(date -u +%Y-%m-%dT%H:%M:%SZ)" \
+        --argjson blocking "$([ "$BLOCKING_MODE" = "1" ] && echo true || echo false)" \
+        --argjson blocked "$BLOCKED" --argjson jobs "$JOBS" \
+        --argjson files "${#FILES_ALL[@]}" \
+        --argjson wall "$WALL_MS" --argjson serial "$SERIAL_MS" '
+        [range(0; $n) as $i
+         | ($ARGS.named["meta\($i)"] | split("\t")) as $m
+         | {name: $m[0], stage: $m[1], lane: $m[2],
+            blocking: ($m[1] != "consistency"), status: $m[3],
+            exit_code: ($m[4] | tonumber), duration_ms: ($m[5] | tonumber),
+            output: (($ARGS.named["out\($i)"] // "") | rtrimstr("\n")
+                     | split("\n")[:$lines] | join("\n"))}]
+        | {version: $version, timestamp: $timestamp, cwd: $cwd, scope: $scope,
+           files: $files, jobs: $jobs, blocking_mode: $blocking,
+           result: $result, blocked: $blocked,
+           wall_ms: $wall, stage_ms: $serial,
+           failed: [.[] | select(.status == "failed") | .name],
+           warnings: [.[] | select(.status == "warning") | .name],
+           stages: .}' 2>/dev/null || true)
+fi
+if [ -n "$REPORT_JSON" ]; then
+    REPORT_DIR=$(dirname "$REPORT_FILE")
+    if mkdir -p "$REPORT_DIR" 2>/dev/null; then
+        printf '%s\n' "$REPORT_JSON" > "$REPORT_FILE.$$" && mv -f "$REPORT_FILE.$$" "$REPORT_FILE" || true
+    fi
+fi
+
+if [ "$HOOK_MODE" = "1" ]; then
+    say "$SUMMARY"
+    if [ "$BLOCKED" = "true" ]; then
+        jq -n --arg reason "$SUMMARY"$'\n'"$REPORT" '{decision: "block", reason: $reason}'
+    elif [ -n "$REPORT" ]; then
+        jq -n --arg ctx "$SUMMARY (non-blocking)"$'\n'"$REPORT" \
+            '{decision: "continue", hookSpecificOutput: {hookEventName: "PostToolUse", additionalContext: $ctx}}'
+    else
+        output_json
+    fi
+    exit 0
+fi
+
+if [ "$JSON_OUTPUT" = "1" ]; then
+    if [ -n "$REPORT_JSON" ]; then
+        printf '%s\n' "$REPORT_JSON"
+    else
+        say "${YELLOW}[WARN]${NC} --json needs jq"
+    fi
+fi
+
+if [ ${#FAILED[@]} -gt 0 ]; then
+    if [ "$BLOCKED" = "true" ]; then
+        say "${RED}[ERROR]${NC} $SUMMARY"
+        exit 2
+    fi
+    say "${YELLOW}[WARN]${NC} $SUMMARY (non-blocking)"
+elif [ ${#WARNINGS[@]} -gt 0 ]; then
+    say "${YELLOW}[WARN]${NC} $SUMMARY"
+else
+    say "${GREEN}[OK]${NC} $SUMMARY"
+fi
+exit 0
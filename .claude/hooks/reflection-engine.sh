@@ -0,0 +1,97 @@
+#!/bin/bash
+# reflection-engine.sh - Stop hook (Cold Path)
+# VERSION: 2.50.0
+#
+# When a session stops, hands its transcript to reflection-executor.py, which
+# turns the new turns into an episode (~/.ralph/episodes). When an episode was
+# saved, cross-session pattern detection (`patterns --save`) runs detached so
+# it never delays the stop.
+#
+# v2.50: extract streams the transcript from a per-transcript byte-offset
+# checkpoint, so this hook costs about the same after 50 turns as after
+# 5,000: only turns appended since the previous stop are read.
+#
+# Security (v2.49.1):
+#   SEC-001: ERR trap guarantees JSON output; SESSION_ID goes through escape_json
+#   SEC-003: the executor only accepts transcripts in allowlisted directories
+#   RE-001:  escape_json for every value placed in JSON output
+#
+# Always exits 0 with {"decision": "continue"}: reflection must never block a stop.
+
+set -euo pipefail
+umask 077
+
+MAX_INPUT_BYTES=100000
+EXTRACT_TIMEOUT=25
+
+RALPH_DIR="${HOME}/.ralph"
+CONFIG_FILE="${RALPH_DIR}/config/memory-config.json"
+EXECUTOR="${HOME}/.claude/scripts/reflection-executor.py"
+LOG_FILE="${RALPH_DIR}/logs/reflection.log"
+
+# Guaranteed JSON output on command failure (exit != 0)
+output_json() {
+    echo '{"decision": "continue"}'
+}
+trap 'output_json; exit 0' ERR
+
+escape_json() {
+    local s="$1"
+    s="${s//\\/\\\\}"
+    s="${s//\"/\\\"}"
+    s="${s//$'\n'/\\n}"
+    s="${s//$'\r'/\\r}"
+    s="${s//$'\t'/\\t}"
+    printf '%s' "$s" | tr -d '\000-\037'
+}
+
+log() {
+    mkdir -p "${LOG_FILE%/*}" 2>/dev/null || return 0
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $*" >> "$LOG_FILE" 2>/dev/null || true
+}
+
+INPUT=$(head -c "$MAX_INPUT_BYTES")
+
+if ! command -v jq &>/dev/null || ! command -v python3 &>/dev/null || [ ! -f "$EXECUTOR" ]; then
+    output_json
+    exit 0
+fi
+
+# Cold path switched off in memory-config.json (missing config = enabled)
+if [ -f "$CONFIG_FILE" ]; then
+    ENABLED=$(jq -r '(.cold_path.enabled != false) and (.cold_path.reflection_on_stop != false)' \
+        "$CONFIG_FILE" 2>/dev/null || echo "true")
+    if [ "$ENABLED" = "false" ]; then
+        output_json
+        exit 0
+    fi
+fi
+
+SESSION_ID=$(jq -r '.session_id // empty | strings' <<< "$INPUT" 2>/dev/null || true)
+TRANSCRIPT=$(jq -r '.transcript_path // empty | strings' <<< "$INPUT" 2>/dev/null || true)
+SESSION_ID=$(printf '%s' "$SESSION_ID" | tr -cd 'A-Za-z0-9._-' | cut -c1-128)
+
+if [ -z "$TRANSCRIPT" ] || [ ! -f "$TRANSCRIPT" ]; then
+    output_json
+    exit 0
+fi
+
+RUNNER=()
+command -v timeout &>/dev/null && RUNNER=(timeout "$EXTRACT_TIMEOUT")
+ARGS=(extract "$TRANSCRIPT")
+[ -n "$SESSION_ID" ] && ARGS+=(--session "$SESSION_ID")
+PROJECT=$(basename "$(pwd)")
+export PROJECT
+
+mkdir -p "${LOG_FILE%/*}" 2>/dev/null || true
+RESULT=$(${RUNNER[@]+"${RUNNER[@]}"} python3 "$EXECUTOR" "${ARGS[@]}" 2>>"$LOG_FILE" || true)
+log "session=${SESSION_ID:-unknown} ${RESULT:-extract failed}"
+
+if [[ "$RESULT" == "Episode saved"* ]]; then
+    nohup python3 "$EXECUTOR" patterns --save >/dev/null 2>&1 &
+    printf '{"decision": "continue", "reflection": {"session_id": "%s", "episode_saved": true}}\n' \
+        "$(escape_json "$SESSION_ID")"
+else
+    output_json
+fi
+exit 0
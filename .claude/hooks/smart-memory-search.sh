@@ -0,0 +1,506 @@
+#!/bin/bash
+# smart-memory-search.sh - PreToolUse(Task) hook
+# VERSION: 2.47.2
+#
+# Searches all memory sources in PARALLEL before a Task runs and writes the
+# aggregated result to .claude/memory-context.json:
+#   - claude-mem: observations stored under ~/.claude-mem
+#   - memvid:     vector-encoded context (~/.ralph/memory/ralph-memory.mv2)
+#   - handoffs:   session snapshots (~/.ralph/handoffs, full-text index)
+#   - ledgers:    session continuity data (~/.ralph/ledgers)
+#   - vectors:    nearest sessions from the local vector index (~/.ralph/index)
+#
+# v2.50: Query-keyed cache. Results are cached per project under
+# ~/.ralph/cache/memory-search/<project>/<query-key>/, one file per source.
+# The key is a hash of the normalized keyword set, so related prompts share
+# an entry. A source's cached result stays valid until that source changes
+# (a new handoff, ledger, memvid frame or claude-mem write makes its files
+# newer than the cached result); only stale sources are re-run. There is no
+# wall-clock expiry.
+#
+# v2.50: Per-source deadlines. Each stale source runs as its own background
+# worker with a latency budget (source_deadline_ms). The hook writes
+# memory-context.json with whatever arrived in time; every source is tagged
+# with status (ok, cached, timeout, unavailable, error), latency_ms and count.
+# Workers that miss their deadline keep running detached and backfill the
+# cache when they finish, so the next call benefits.
+#
+# Security (v2.47.1 / v2.47.2):
+#   SECURITY-001: keywords are regex-escaped (escape_for_grep) before grep -E
+#   SECURITY-002: every file read goes through validate_file_path (realpath)
+#   SECURITY-003: umask 077, chmod 700 temp dir, atomic create_initial_file
+#   ADV-001: input JSON schema validated before use (validate_input_schema)
+#   ADV-002: control characters stripped from the prompt
+#   ADV-003: find -exec grep, never find output piped to xargs (spaces in paths)
+#
+# Always exits 0 with {"decision": "continue"}: memory search must never block
+# a Task.
+#
+# v2.50: The vectors source also feeds "fork_suggestions" (best-matching past
+# sessions), which `ralph fork-suggest` prints.
+
+set -uo pipefail
+umask 077
+
+VERSION="2.47.2"
+MAX_INPUT_BYTES=100000
+MAX_PROMPT_CHARS=2000
+MAX_KEYWORDS=8
+MAX_CACHE_ENTRIES=200
+
+RALPH_DIR="${HOME}/.ralph"
+HANDOFFS_DIR="${RALPH_DIR}/handoffs"
+LEDGERS_DIR="${RALPH_DIR}/ledgers"
+MEMVID_FILE="${RALPH_DIR}/memory/ralph-memory.mv2"
+CLAUDE_MEM_DIR="${HOME}/.claude-mem"
+# Search depths, shared with the cache freshness check (source_paths)
+CLAUDE_MEM_DEPTH=3
+HANDOFFS_DEPTH=2
+LEDGERS_DEPTH=1
+HANDOFF_GENERATOR="${HOME}/.claude/scripts/handoff-generator.py"
+MEMVID_CORE="${HOME}/.claude/scripts/memvid-core.py"
+VECTOR_INDEX="${HOME}/.claude/scripts/vector-index.py"
+INDEX_DIR="${RALPH_INDEX_DIR:-${RALPH_DIR}/index}"
+LOG_FILE="${RALPH_DIR}/logs/smart-memory-search.log"
+CACHE_ROOT="${RALPH_DIR}/cache/memory-search"
+
+SOURCES=(claude_mem memvid handoffs ledgers vectors)
+
+log() {
+    mkdir -p "${LOG_FILE%/*}" 2>/dev/null || return 0
+    echo "[$(date '+%Y-%m-%d %H:%M:%S')] $*" >> "$LOG_FILE" 2>/dev/null || true
+}
+
+# MESSAGE is always a literal from this script, never user input
+continue_and_exit() {
+    local MESSAGE="${1:-}"
+    if [ -n "$MESSAGE" ]; then
+        printf '{"decision": "continue", "message": "%s"}\n' "$MESSAGE"
+    else
+        echo '{"decision": "continue"}'
+    fi
+    exit 0
+}
+
+TMP_DIR=""
+cleanup() {
+    [ -n "$TMP_DIR" ] && rm -rf "$TMP_DIR" 2>/dev/null
+    return 0
+}
+trap cleanup EXIT
+
+# ADV-001: Validate input structure before touching any field
+validate_input_schema() {
+    local INPUT_JSON="$1"
+    [ -n "$INPUT_JSON" ] || return 1
+    echo "$INPUT_JSON" | jq empty 2>/dev/null || return 1
+    echo "$INPUT_JSON" | jq -e 'type == "object" and (.tool_name | type == "string")' >/dev/null 2>&1
+}
+
+# SECURITY-001: Escape regex metacharacters before building grep -E patterns
+escape_for_grep() {
+    printf '%s' "$1" | sed 's/[][\\.*^$?+(){}|/]/\\&/g'
+}
+
+# SECURITY-002: Resolve symlinks and require the file to stay inside BASE
+validate_file_path() {
+    local file="$1" base="$2"
+    local real_file real_base
+    real_file=$(realpath -e -- "$file" 2>/dev/null) || return 1
+    real_base=$(realpath -e -- "$base" 2>/dev/null) || return 1
+    case "$real_file" in
+        "$real_base"/*) [ -f "$real_file" ] && printf '%s\n' "$real_file" ;;
+        *) return 1 ;;
+    esac
+}
+
+# SECURITY-003: Create a file atomically, refusing pre-existing paths (symlink attacks)
+create_initial_file() {
+    local file="$1" content="$2"
+    [[ -e "$file" ]] && return 1
+    ( set -C; printf '%s\n' "$content" > "$file" ) 2>/dev/null
+}
+
+hash_str() {
+    if command -v sha256sum &>/dev/null; then
+        printf '%s' "$1" | sha256sum | cut -c1-16
+    else
+        printf '%s' "$1" | shasum -a 256 | cut -c1-16
+    fi
+}
+
+# Matching lines from a validated file as a JSON array of strings
+extract_snippets() {
+    local validated="$1"
+    grep -i -m 3 -h -E "$KEYWORDS_PATTERN" "$validated" 2>/dev/null \
+        | tr -d '[:cntrl:]' | cut -c1-200 \
+        | jq -R -s -c 'split("\n") | map(select(length > 0))'
+}
+
+# ============================================================================
+# Memory sources: each writes {"results": [...], "count": N} to $1
+# ============================================================================
+
+search_claude_mem() {
+    local OUT="$1" file validated RESULTS="[]"
+    [ -d "$CLAUDE_MEM_DIR" ] || return 0
+    while IFS= read -r file; do
+        validated=$(validate_file_path "$file" "$CLAUDE_MEM_DIR") || continue
+        RESULTS=$(jq -c --arg file "$validated" --argjson snippets "$(extract_snippets "$validated")" \
+            '. + [{file: $file, snippets: $snippets}]' <<< "$RESULTS")
+    done < <(find "$CLAUDE_MEM_DIR" -maxdepth "$CLAUDE_MEM_DEPTH" -type f \( -name "*.md" -o -name "*.json" -o -name "*.jsonl" \) \
+                -size -1024k -exec grep -l -i -E "$KEYWORDS_PATTERN" {} + 2>/dev/null | head -5)
+    jq -c '{results: ., count: length}' <<< "$RESULTS" > "$OUT"
+}
+
+search_memvid() {
+    local OUT="$1"
+    [ -f "$MEMVID_FILE" ] && [ -f "$MEMVID_CORE" ] || return 0
+    local RUNNER=()
+    command -v timeout &>/dev/null && RUNNER=(timeout 5)
+    ${RUNNER[@]+"${RUNNER[@]}"} python3 "$MEMVID_CORE" search "$KEYWORDS" 2>/dev/null \
+        | tr -d '[:cntrl:]' | head -20 | cut -c1-300 \
+        | jq -R -s -c 'split("\n") | map(select(length > 0)) | {results: ., count: length}' > "$OUT"
+}
+
+search_handoffs() {
+    local OUT="$1" file validated RESULTS="[]"
+    [ -d "$HANDOFFS_DIR" ] || return 0
+
+    # v2.50: Use handoff-generator's full-text index when available
+    if [ -f "$HANDOFF_GENERATOR" ] && command -v python3 &>/dev/null; then
+        if python3 "$HANDOFF_GENERATOR" --dir "$HANDOFFS_DIR" search --any --limit 5 --json \
+                "$KEYWORDS" 2>/dev/null \
+            | jq -c 'map({file: .path, session: .session_id, score, snippets: [.snippet]})
+                     | {results: ., count: length}' > "$OUT" 2>/dev/null; then
+            return 0
+        fi
+    fi
+
+    while IFS= read -r file; do
+        validated=$(validate_file_path "$file" "$HANDOFFS_DIR") || continue
+        RESULTS=$(jq -c --arg file "$validated" --argjson snippets "$(extract_snippets "$validated")" \
+            '. + [{file: $file, snippets: $snippets}]' <<< "$RESULTS")
+    done < <(find "$HANDOFFS_DIR" -maxdepth "$HANDOFFS_DEPTH" -name "handoff-*.md" -type f -mtime -30 \
+                -exec grep -l -i -E "$KEYWORDS_PATTERN" {} \; 2>/dev/null | head -5)
+    jq -c '{results: ., count: length}' <<< "$RESULTS" > "$OUT"
+}
+
+search_ledgers() {
+    local OUT="$1" file validated RESULTS="[]"
+    [ -d "$LEDGERS_DIR" ] || return 0
+    while IFS= read -r file; do
+        validated=$(validate_file_path "$file" "$LEDGERS_DIR") || continue
+        RESULTS=$(jq -c --arg file "$validated" --argjson snippets "$(extract_snippets "$validated")" \
+            '. + [{file: $file, snippets: $snippets}]' <<< "$RESULTS")
+    done < <(find "$LEDGERS_DIR" -maxdepth "$LEDGERS_DEPTH" -name "CONTINUITY_RALPH-*.md" -type f \
+                -exec grep -l -i -E "$KEYWORDS_PATTERN_LEDGER" {} + 2>/dev/null | head -3)
+    jq -c '{results: ., count: length}' <<< "$RESULTS" > "$OUT"
+}
+
+# v2.50: Top sessions by similarity from the shared vector index
+search_vectors() {
+    local OUT="$1"
+    [ -d "$INDEX_DIR" ] && [ -f "$VECTOR_INDEX" ] || return 0
+    python3 "$VECTOR_INDEX" --dir "$INDEX_DIR" search --sessions --limit 5 --json \
+            "$KEYWORDS" 2>/dev/null \
+        | jq -c 'map({session: .session_id, source, file: .path, score, updated,
+                      snippets: [.title | select(. != null and . != "")]})
+                 | {results: ., count: length}' > "$OUT" 2>/dev/null
+}
+
+# v2.50: Path whose modification invalidates a source's cached result, and
+# how deep its search looks (a write below that depth must count too). Sets
+# SRC_PATH and SRC_DEPTH without forking.
+source_paths() {
+    case "$1" in
+        claude_mem) SRC_PATH="$CLAUDE_MEM_DIR"; SRC_DEPTH=$CLAUDE_MEM_DEPTH ;;
+        memvid)     SRC_PATH="$MEMVID_FILE"; SRC_DEPTH=0 ;;
+        handoffs)   SRC_PATH="$HANDOFFS_DIR"; SRC_DEPTH=$HANDOFFS_DEPTH ;;
+        ledgers)    SRC_PATH="$LEDGERS_DIR"; SRC_DEPTH=$LEDGERS_DEPTH ;;
+        vectors)    SRC_PATH="$INDEX_DIR"; SRC_DEPTH=2 ;;
+    esac
+}
+
+# v2.50: A cached source result is fresh while nothing in its paths is newer
+source_is_fresh() {
+    local SOURCE="$1" CACHED="$2" SRC_PATH="" SRC_DEPTH=0
+    [ -s "$CACHED" ] || return 1
+    source_paths "$SOURCE"
+    [ -e "$SRC_PATH" ] || return 0
+    [ -z "$(find "$SRC_PATH" -maxdepth "$SRC_DEPTH" -newer "$CACHED" -print -quit 2>/dev/null)" ]
+}
+
+# v2.50: Latency budget per source in ms (RALPH_MEMORY_DEADLINE_<SOURCE>_MS
+# overrides one source, RALPH_MEMORY_DEADLINE_MS all of them). Sets
+# DEADLINE_MS without forking.
+source_deadline_ms() {
+    local SOURCE="$1" DEFAULT VAR
+    case "$SOURCE" in
+        claude_mem) DEFAULT=3000; VAR=CLAUDE_MEM ;;
+        memvid)     DEFAULT=3000; VAR=MEMVID ;;
+        handoffs)   DEFAULT=2000; VAR=HANDOFFS ;;
+        ledgers)    DEFAULT=1500; VAR=LEDGERS ;;
+        vectors)    DEFAULT=1000; VAR=VECTORS ;;
+        *)          DEFAULT=2000; VAR=DEFAULT ;;
+    esac
+    VAR="RALPH_MEMORY_DEADLINE_${VAR}_MS"
+    DEADLINE_MS="${!VAR:-${RALPH_MEMORY_DEADLINE_MS:-$DEFAULT}}"
+    [[ "$DEADLINE_MS" =~ ^[0-9]+$ ]] || DEADLINE_MS=2000
+}
+
+# Sets NOW_MS to the epoch time in ms (no fork on bash 5+)
+now_ms() {
+    if [ -n "${EPOCHREALTIME:-}" ]; then
+        local t="${EPOCHREALTIME/[.,]/}"
+        NOW_MS=$(( 10#$t / 1000 ))
+    else
+        NOW_MS=$(( $(date +%s) * 1000 ))
+    fi
+}
+
+# v2.50: Background worker for one source. Always writes the cache entry
+# (stamped with the worker's start time, so writes that land mid-search
+# still invalidate it), then hands the result to this hook run if it is
+# still waiting.
+run_source() {
+    local SOURCE="$1"
+    local WORK="$CACHE_DIR/.$SOURCE.$$.${BASHPID:-$RANDOM}"
+    local START_MS STATUS=ok
+    create_initial_file "$WORK.start" "" || return 0
+    now_ms
+    START_MS=$NOW_MS
+
+    "search_$SOURCE" "$WORK.partial"
+
+    if [ ! -s "$WORK.partial" ]; then
+        STATUS=unavailable
+    elif ! jq empty "$WORK.partial" 2>/dev/null; then
+        STATUS=error
+    fi
+    [ "$STATUS" = ok ] || printf '%s\n' "$EMPTY" > "$WORK.partial"
+
+    now_ms
+    if jq -c --arg status "$STATUS" --argjson latency "$(( NOW_MS - START_MS ))" \
+            '. + {status: $status, latency_ms: $latency}' "$WORK.partial" > "$WORK.json" 2>/dev/null; then
+        touch -r "$WORK.start" "$WORK.json"
+        mv -f "$WORK.json" "$CACHE_DIR/$SOURCE.json"
+        cp "$CACHE_DIR/$SOURCE.json" "$TMP_DIR/$SOURCE.json.tmp" 2>/dev/null \
+            && mv -f "$TMP_DIR/$SOURCE.json.tmp" "$TMP_DIR/$SOURCE.json" 2>/dev/null \
+            && : > "$TMP_DIR/$SOURCE.done" 2>/dev/null
+    fi
+    rm -f "$WORK.start" "$WORK.partial" "$WORK.json"
+}
+
+# ============================================================================
+# Main
+# ============================================================================
+
+# SMMS-005: bounded read so oversized input cannot stall the hook
+INPUT=$(head -c "$MAX_INPUT_BYTES" 2>/dev/null | tr -d '\000' || true)
+
+validate_input_schema "$INPUT" || continue_and_exit
+
+TOOL_NAME=$(echo "$INPUT" | jq -r '.tool_name // ""' 2>/dev/null || echo "")
+[ "$TOOL_NAME" = "Task" ] || continue_and_exit
+
+# One jq pass: session id on the first line, prompt after it
+FIELDS=$(echo "$INPUT" | jq -r '(.session_id // "unknown" | tostring),
+    (.tool_input.prompt // "" | tostring)' 2>/dev/null || true)
+SESSION_ID=$(printf '%s' "${FIELDS%%$'\n'*}" | tr -cd 'A-Za-z0-9_.-' | head -c 128 || true)
+# ADV-002: strip control characters; truncate to bound keyword extraction
+PROMPT=""
+[[ "$FIELDS" == *$'\n'* ]] && PROMPT=$(printf '%s' "${FIELDS#*$'\n'}" \
+    | tr -d '[:cntrl:]' | head -c "$MAX_PROMPT_CHARS" || true)
+
+# Normalized keyword set: lowercase, >= 4 chars, no stopwords. The first
+# MAX_KEYWORDS distinct words in prompt order are kept, then sorted so the
+# cache key does not depend on word order.
+KEYWORDS=$(printf '%s\n' "$PROMPT" | tr '[:upper:]' '[:lower:]' | tr -cs '[:alnum:]' '\n' \
+    | awk 'length >= 4' \
+    | grep -v -x -F -e this -e that -e with -e from -e have -e will -e should -e could \
+        -e would -e about -e into -e then -e than -e when -e what -e which -e there \
+        -e their -e these -e those -e make -e need -e please -e also -e just \
+    | awk '!seen[$0]++' | head -n "$MAX_KEYWORDS" | sort | tr '\n' ' ' | sed 's/ *$//' || true)
+
+[ -n "$KEYWORDS" ] || continue_and_exit
+
+# SECURITY-001: pattern built from escaped keywords only
+KEYWORDS_SAFE=""
+for word in $KEYWORDS; do
+    KEYWORDS_SAFE="${KEYWORDS_SAFE:+$KEYWORDS_SAFE|}$(escape_for_grep "$word")"
+done
+KEYWORDS_PATTERN="($KEYWORDS_SAFE)"
+KEYWORDS_PATTERN_LEDGER="$KEYWORDS_PATTERN"
+
+PROJECT_DIR=$(pwd)
+MEMORY_CONTEXT="$PROJECT_DIR/.claude/memory-context.json"
+mkdir -p "$PROJECT_DIR/.claude" 2>/dev/null || continue_and_exit
+
+# v2.50: Query-keyed cache entry for this project
+CACHE_DIR="$CACHE_ROOT/$(hash_str "$PROJECT_DIR")/$(hash_str "$KEYWORDS")"
+mkdir -p "$CACHE_DIR" 2>/dev/null && chmod 700 "$CACHE_ROOT" 2>/dev/null
+
+TMP_DIR=$(mktemp -d "${TMPDIR:-/tmp}/smart-memory.XXXXXX") || continue_and_exit
+chmod 700 "$TMP_DIR"
+
+CACHED=()
+STALE=()
+for source in "${SOURCES[@]}"; do
+    if [ "${RALPH_MEMORY_CACHE:-on}" != "off" ] && source_is_fresh "$source" "$CACHE_DIR/$source.json"; then
+        cp "$CACHE_DIR/$source.json" "$TMP_DIR/$source.json"
+        CACHED+=("$source")
+    else
+        STALE+=("$source")
+    fi
+done
+
+# Nothing changed since this query was last answered: reuse the aggregate,
+# stamped for this session and with every source marked as served from cache
+if [ "${#STALE[@]}" -eq 0 ] && [ -s "$CACHE_DIR/context.json" ] \
+    && jq --arg session "$SESSION_ID" \
+        '.timestamp = (now | todate) | .session_id = $session
+         | .sources |= map_values(.status = "cached" | .latency_ms = 0)
+         | .cached_sources = (.sources | length)' \
+        "$CACHE_DIR/context.json" > "$TMP_DIR/memory-context.json" 2>/dev/null \
+    && mv -f "$TMP_DIR/memory-context.json" "$MEMORY_CONTEXT"; then
+    log "cache hit session=$SESSION_ID keywords=[$KEYWORDS]"
+    continue_and_exit "Using cached memory context (.claude/memory-context.json)"
+fi
+
+# Every source starts from an empty result so aggregation never sees a missing file
+EMPTY='{"results": [], "count": 0}'
+for source in ${STALE[@]+"${STALE[@]}"}; do
+    case "$source" in
+        claude_mem) create_initial_file "$TMP_DIR/claude_mem.json" "$EMPTY" ;;
+        memvid)     create_initial_file "$TMP_DIR/memvid.json" "$EMPTY" ;;
+        handoffs)   create_initial_file "$TMP_DIR/handoffs.json" "$EMPTY" ;;
+        ledgers)    create_initial_file "$TMP_DIR/ledgers.json" "$EMPTY" ;;
+        vectors)    create_initial_file "$TMP_DIR/vectors.json" "$EMPTY" ;;
+    esac
+done
+
+# Run stale sources in parallel as detached background workers. Their output
+# goes to files only, so a late worker never holds the hook's stdout open.
+now_ms
+LAUNCH_MS=$NOW_MS
+for source in ${STALE[@]+"${STALE[@]}"}; do
+    run_source "$source" </dev/null >/dev/null 2>&1 &
+done
+
+# Wait for each source up to its own deadline instead of waiting for all.
+# Deadlines are resolved once up front ("<source> <ms>" entries), so a poll
+# is only a clock read and a few file tests.
+TIMED_OUT=()
+TIMED_OUT_MS=()
+PENDING=()
+for source in ${STALE[@]+"${STALE[@]}"}; do
+    source_deadline_ms "$source"
+    PENDING+=("$source $DEADLINE_MS")
+done
+while [ "${#PENDING[@]}" -gt 0 ]; do
+    now_ms
+    ELAPSED=$(( NOW_MS - LAUNCH_MS ))
+    NEXT=()
+    for entry in "${PENDING[@]}"; do
+        source="${entry% *}"
+        if [ -e "$TMP_DIR/$source.done" ]; then
+            continue
+        elif [ "$ELAPSED" -ge "${entry##* }" ]; then
+            TIMED_OUT+=("$source")
+            TIMED_OUT_MS+=("${entry##* }")
+        else
+            NEXT+=("$entry")
+        fi
+    done
+    PENDING=(${NEXT[@]+"${NEXT[@]}"})
+    [ "${#PENDING[@]}" -gt 0 ] && sleep 0.02
+done
+
+# Late workers keep writing into TMP_DIR until it is removed; aggregate from
+# a snapshot so the report matches the statuses decided above
+mkdir "$TMP_DIR/final" && chmod 700 "$TMP_DIR/final"
+for source in "${SOURCES[@]}"; do
+    cp "$TMP_DIR/$source.json" "$TMP_DIR/final/$source.json" 2>/dev/null \
+        || printf '%s\n' "$EMPTY" > "$TMP_DIR/final/$source.json"
+done
+for i in ${TIMED_OUT[@]+"${!TIMED_OUT[@]}"}; do
+    printf '{"results": [], "count": 0, "status": "timeout", "latency_ms": %d}\n' \
+        "${TIMED_OUT_MS[$i]}" > "$TMP_DIR/final/${TIMED_OUT[$i]}.json"
+done
+
+# Insights from matching snippets: outcomes worth repeating or avoiding
+ALL_SNIPPETS=$(jq -s -c '[.[].results[]? | (.snippets? // [.])[] | strings]' \
+    "$TMP_DIR"/final/claude_mem.json "$TMP_DIR"/final/memvid.json \
+    "$TMP_DIR"/final/handoffs.json "$TMP_DIR"/final/ledgers.json \
+    "$TMP_DIR"/final/vectors.json 2>/dev/null || echo "[]")
+past_successes=$(jq -c '[.[] | select(test("complet|success|fixed|resolved|passed|\\[x\\]"; "i"))] | unique | .[:5]' \
+    <<< "$ALL_SNIPPETS" 2>/dev/null || echo "[]")
+past_errors=$(jq -c '[.[] | select(test("error|fail|bug|broke|regression"; "i"))] | unique | .[:5]' \
+    <<< "$ALL_SNIPPETS" 2>/dev/null || echo "[]")
+
+if jq -n \
+    --arg version "$VERSION" \
+    --arg session "$SESSION_ID" \
+    --arg keywords "$KEYWORDS" \
+    --arg cached "${CACHED[*]:-}" \
+    --slurpfile claude_mem "$TMP_DIR/final/claude_mem.json" \
+    --slurpfile memvid "$TMP_DIR/final/memvid.json" \
+    --slurpfile handoffs "$TMP_DIR/final/handoffs.json" \
+    --slurpfile ledgers "$TMP_DIR/final/ledgers.json" \
+    --slurpfile vectors "$TMP_DIR/final/vectors.json" \
+    --argjson past_successes "$past_successes" \
+    --argjson past_errors "$past_errors" \
+    '($cached | split(" ") | map(select(length > 0))) as $cached_names
+    | def tag($name): . + {status: (.status // "ok"), latency_ms: (.latency_ms // 0)}
+        | if ($cached_names | index($name)) then .status = "cached" | .latency_ms = 0 else . end;
+    {
+        claude_mem: ($claude_mem[0] | tag("claude_mem")),
+        memvid: ($memvid[0] | tag("memvid")),
+        handoffs: ($handoffs[0] | tag("handoffs")),
+        ledgers: ($ledgers[0] | tag("ledgers")),
+        vectors: ($vectors[0] | tag("vectors"))
+    } as $sources
+    | {
+        version: $version,
+        timestamp: (now | todate),
+        session_id: $session,
+        keywords: $keywords,
+        cached_sources: ($cached_names | length),
+        partial: ([$sources[] | select(.status == "timeout")] | length > 0),
+        sources: $sources,
+        fork_suggestions: [$sources.vectors.results[] | select(.session != null) | {
+            session,
+            relevance: (if .score >= 0.5 then "HIGH" elif .score >= 0.25 then "MEDIUM" else "LOW" end),
+            score,
+            timestamp: (.updated | if type == "number" then floor | todate else null end)
+        }],
+        insights: {
+            past_successes: $past_successes,
+            past_errors: $past_errors,
+            total_hits: ([$sources[].count] | add)
+        }
+    }' > "$TMP_DIR/memory-context.json" 2>/dev/null; then
+    # A partial answer is not cached: the next call should pick up the
+    # backfilled sources instead of replaying the timeouts
+    if [ "${#TIMED_OUT[@]}" -eq 0 ]; then
+        cp "$TMP_DIR/memory-context.json" "$CACHE_DIR/context.json" 2>/dev/null
+    else
+        rm -f "$CACHE_DIR/context.json"
+    fi
+    mv -f "$TMP_DIR/memory-context.json" "$MEMORY_CONTEXT"
+fi
+
+# Keep the cache bounded: drop the least recently written query entries
+PROJECT_CACHE="${CACHE_DIR%/*}"
+ENTRY_COUNT=$(find "$PROJECT_CACHE" -mindepth 1 -maxdepth 1 -type d 2>/dev/null | wc -l | tr -d ' ')
+if [ "${ENTRY_COUNT:-0}" -gt "$MAX_CACHE_ENTRIES" ]; then
+    ls -1t "$PROJECT_CACHE" 2>/dev/null | tail -n +"$((MAX_CACHE_ENTRIES + 1))" \
+        | while IFS= read -r entry; do rm -rf "${PROJECT_CACHE:?}/$entry"; done
+fi
+
+log "searched [${STALE[*]}] timed out [${TIMED_OUT[*]:-}] session=$SESSION_ID keywords=[$KEYWORDS]"
+if [ "${#TIMED_OUT[@]}" -gt 0 ]; then
+    continue_and_exit "Partial memory context (.claude/memory-context.json); late sources will be cached"
+fi
+continue_and_exit "Memory context updated (.claude/memory-context.json)"
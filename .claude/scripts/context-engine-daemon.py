@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Context engine daemon (v2.50) - keeps ledger-manager.py and
+handoff-generator.py resident behind a Unix socket.
+
+Every `ralph ledger ...` / `ralph handoff ...` call and every SessionStart /
+PreCompact hook otherwise pays a Python cold start, re-imports both modules
+and re-scans ~/.ralph/ledgers and ~/.ralph/handoffs. The daemon loads the
+modules once, runs their CLI entry points in-process, and keeps an in-memory
+index of both directories: read-only commands (show/load/list/context/search)
+are answered from cache until a file in the indexed directory changes.
+
+Usage:
+    context-engine-daemon.py serve [--idle-timeout SECONDS]
+    context-engine-daemon.py run {ledger|handoff} [ARGS...]
+    context-engine-daemon.py status
+    context-engine-daemon.py stop
+
+`run` is a drop-in replacement for `python3 ledger-manager.py ARGS...` (and
+likewise for handoffs) that hooks can call: it talks to the daemon when the
+socket is up and otherwise execs the one-shot script, so output and exit
+codes are identical either way.
+
+Protocol: one JSON request line per connection, one JSON response line back.
+    {"op": "run", "tool": "ledger", "argv": ["list", "--limit", "5"], "cwd": "..."}
+    -> {"ok": true, "exit": 0, "stdout": "...", "stderr": "...", "cached": false}
+Other ops: ping, status, stop, index (file metadata for a tool's directory).
+With "raw": true a successful run is answered as "<exit> <n_out> <n_err>\\n"
+followed by the raw stdout and stderr bytes.
+"""
+
+import os
+import sys
+
+# Only os/sys at module level: `run` is on the hook hot path and must start
+# as fast as a bare interpreter. Everything else is imported where needed.
+RALPH_DIR = os.path.join(os.path.expanduser("~"), ".ralph")
+SOCKET_PATH = os.environ.get(
+    "RALPH_CONTEXT_ENGINE_SOCKET", os.path.join(RALPH_DIR, "run", "context-engine.sock")
+)
+SCRIPTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+TOOLS = {
+    "ledger": {
+        "script": "ledger-manager.py",
+        "data_dir": os.path.join(RALPH_DIR, "ledgers"),
+        "read_only": {"show", "load", "list", "context", "--help", "-h"},
+    },
+    "handoff": {
+        "script": "handoff-generator.py",
+        "data_dir": os.path.join(RALPH_DIR, "handoffs"),
+        "read_only": {"show", "load", "list", "search", "context", "--help", "-h"},
+    },
+}
+
+MAX_REQUEST_BYTES = 1024 * 1024
+CACHE_MAX_AGE = 300  # seconds; bounds staleness of time-dependent output
+CACHE_MAX_ENTRIES = 256  # least recently used read results are evicted first
+CLIENT_TIMEOUT = 30
+RESCAN_INTERVAL = 2.0  # seconds between full index rescans when no directory changed
+
+
+# =============================================================================
+# Client
+# =============================================================================
+
+def _json_str(value):
+    """Encode a str as a JSON string literal without importing json."""
+    out = ['"']
+    for ch in value:
+        if ch == '"' or ch == "\\":
+            out.append("\\" + ch)
+        elif ord(ch) < 0x20:
+            out.append("\\u%04x" % ord(ch))
+        else:
+            out.append(ch)
+    out.append('"')
+    return "".join(out)
+
+
+def _connect(timeout):
+    import _socket
+
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(SOCKET_PATH)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+
+def _exchange(payload_line, timeout, sock=None):
+    import _socket
+
+    if sock is None:
+        sock = _connect(timeout)
+    try:
+        sock.sendall(payload_line + b"\n")
+        sock.shutdown(_socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        sock.close()
+    return b"".join(chunks)
+
+
+def request(payload, timeout=CLIENT_TIMEOUT):
+    """Send one JSON request to the daemon. Raises OSError if it is not reachable."""
+    import json
+
+    return json.loads(_exchange(json.dumps(payload).encode(), timeout).decode())
+
+
+def client_run(tool, argv):
+    """Run a tool command via the daemon, falling back to the one-shot script.
+
+    Uses the framed ("raw") response so neither json nor socket is imported:
+    "<exit> <stdout bytes> <stderr bytes>\\n" followed by both payloads.
+
+    The fallback is only taken when the command cannot have run in the
+    daemon: the socket refused the connection, the daemon rejected the
+    request with a JSON error, or the command is read-only. A write that
+    times out or loses its connection mid-exchange may already have
+    happened, so it is reported instead of being run a second time.
+    """
+    if tool not in TOOLS:
+        sys.stderr.write("Unknown tool: %s (expected one of: %s)\n" % (tool, ", ".join(TOOLS)))
+        return 2
+
+    script = os.path.join(SCRIPTS_DIR, TOOLS[tool]["script"])
+    fallback = [sys.executable, script] + argv
+    try:
+        sock = _connect(CLIENT_TIMEOUT)
+    except OSError:
+        os.execv(sys.executable, fallback)
+
+    line = '{"op":"run","raw":true,"tool":%s,"cwd":%s,"argv":[%s]}' % (
+        _json_str(tool), _json_str(os.getcwd()), ",".join(_json_str(a) for a in argv)
+    )
+    try:
+        reply = _exchange(line.encode("utf-8", "surrogateescape"), CLIENT_TIMEOUT, sock)
+    except OSError as e:
+        reply, error = b"", e
+    else:
+        error = "malformed reply"
+
+    if reply.startswith(b"{"):
+        # A JSON error object: the daemon refused the request before running it
+        os.execv(sys.executable, fallback)
+    header, _, body = reply.partition(b"\n")
+    try:
+        code, out_len, err_len = (int(x) for x in header.split())
+    except ValueError:
+        if argv[:1] and argv[0] in TOOLS[tool]["read_only"]:
+            os.execv(sys.executable, fallback)
+        sys.stderr.write("context engine: %s %s: no reply from daemon (%s); "
+                         "not retrying a command that may have run\n"
+                         % (tool, " ".join(argv[:1]), error))
+        return 1
+
+    if out_len:
+        os.write(1, body[:out_len])
+    if err_len:
+        os.write(2, body[out_len:out_len + err_len])
+    return code
+
+
+# =============================================================================
+# Daemon
+# =============================================================================
+
+class DirIndex:
+    """Metadata snapshot of a data directory (two levels deep).
+
+    Only entry metadata (name, mtime, size) is held; comparing snapshots is
+    enough to tell whether any cached output may be stale. A refresh only
+    rescans when a directory mtime moved (files added, removed or renamed),
+    when forced after a write, or every RESCAN_INTERVAL seconds so in-place
+    rewrites by other processes are still picked up.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.entries = {}
+        self.dir_stamps = {}
+        self.scanned_at = 0.0
+        self.generation = 0
+        self.refresh(force=True)
+
+    def _scan(self):
+        entries, dirs = {}, {}
+        stack = [(self.root, 0)]
+        while stack:
+            directory, depth = stack.pop()
+            try:
+                dirs[directory] = os.stat(directory).st_mtime_ns
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            st = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            if depth < 1:
+                                stack.append((entry.path, depth + 1))
+                        else:
+                            rel = os.path.relpath(entry.path, self.root)
+                            entries[rel] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                dirs.setdefault(directory, None)
+                continue
+        return entries, dirs
+
+    def _dirs_changed(self):
+        for directory, stamp in self.dir_stamps.items():
+            try:
+                current = os.stat(directory).st_mtime_ns
+            except OSError:
+                current = None
+            if current != stamp:
+                return True
+        return False
+
+    def refresh(self, force=False):
+        """Rescan metadata if needed; bump the generation if anything changed."""
+        import time
+
+        now = time.monotonic()
+        if not force and now - self.scanned_at < RESCAN_INTERVAL and not self._dirs_changed():
+            return self.generation
+        entries, self.dir_stamps = self._scan()
+        self.scanned_at = now
+        if entries != self.entries:
+            self.entries = entries
+            self.generation += 1
+        return self.generation
+
+    def listing(self, limit=None):
+        items = sorted(self.entries.items(), key=lambda kv: kv[1][0], reverse=True)
+        if limit:
+            items = items[:limit]
+        return [
+            {"path": os.path.join(self.root, rel), "modified_ns": m, "size": s}
+            for rel, (m, s) in items
+        ]
+
+
+class ContextEngine:
+    def __init__(self):
+        import time
+        from collections import OrderedDict
+
+        self.modules = {}
+        self.indexes = {name: DirIndex(cfg["data_dir"]) for name, cfg in TOOLS.items()}
+        self.cache = OrderedDict()
+        self.started = time.time()
+        self.requests = 0
+        self.cache_hits = 0
+
+    def _module(self, tool):
+        """Load (or reload after an upgrade) the tool's module."""
+        import importlib.util
+
+        path = os.path.join(SCRIPTS_DIR, TOOLS[tool]["script"])
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.modules.get(tool)
+        if cached and cached[1] == mtime:
+            return cached[0], path
+
+        name = TOOLS[tool]["script"].replace("-", "_").rsplit(".", 1)[0]
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.modules[tool] = (module, mtime)
+        return module, path
+
+    def _invoke(self, tool, argv, cwd):
+        """Run the tool's CLI entry point in-process, capturing its output.
+
+        Raises ImportError if the tool's module cannot be loaded; run() turns
+        that into a JSON error so the client falls back to the script.
+        """
+        import io
+        import runpy
+        import traceback
+        from contextlib import redirect_stderr, redirect_stdout
+
+        try:
+            module, path = self._module(tool)
+        except Exception as e:
+            # A syntax/import error in an upgraded script must not kill the daemon
+            raise ImportError(f"cannot load {TOOLS[tool]['script']}: "
+                              f"{type(e).__name__}: {e}") from e
+        out, err = io.StringIO(), io.StringIO()
+        old_argv, old_cwd = sys.argv, os.getcwd()
+        code = 0
+        try:
+            if cwd and os.path.isdir(cwd):
+                os.chdir(cwd)
+            sys.argv = [path] + list(argv)
+            with redirect_stdout(out), redirect_stderr(err):
+                try:
+                    main = getattr(module, "main", None)
+                    if callable(main):
+                        rc = main()
+                        code = rc if isinstance(rc, int) else 0
+                    else:
+                        runpy.run_path(path, run_name="__main__")
+                except SystemExit as e:
+                    if e.code is None:
+                        code = 0
+                    elif isinstance(e.code, int):
+                        code = e.code
+                    else:
+                        print(e.code, file=sys.stderr)
+                        code = 1
+                except Exception:
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            sys.argv = old_argv
+            os.chdir(old_cwd)
+        return code, out.getvalue(), err.getvalue()
+
+    def run(self, tool, argv, cwd):
+        import time
+
+        if tool not in TOOLS:
+            return {"ok": False, "error": f"unknown tool: {tool}"}
+        if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+            return {"ok": False, "error": "argv must be a list of strings"}
+
+        index = self.indexes[tool]
+        generation = index.refresh()
+        read_only = bool(argv) and argv[0] in TOOLS[tool]["read_only"]
+        key = (tool, cwd, tuple(argv))
+
+        if read_only:
+            hit = self.cache.get(key)
+            if hit and hit["generation"] == generation and time.time() - hit["at"] < CACHE_MAX_AGE:
+                self.cache_hits += 1
+                self.cache.move_to_end(key)
+                return dict(hit["response"], cached=True)
+
+        try:
+            code, stdout, stderr = self._invoke(tool, argv, cwd)
+        except ImportError as e:
+            return {"ok": False, "error": str(e)}
+        response = {"ok": True, "exit": code, "stdout": stdout, "stderr": stderr, "cached": False}
+
+        if read_only and code == 0:
+            self.cache[key] = {"generation": generation, "at": time.time(), "response": response}
+            self.cache.move_to_end(key)
+            while len(self.cache) > CACHE_MAX_ENTRIES:
+                self.cache.popitem(last=False)
+        elif not read_only:
+            # Writes land on disk; pick them up now so the next read re-runs
+            index.refresh(force=True)
+        return response
+
+    def handle(self, payload):
+        import time
+
+        self.requests += 1
+        op = payload.get("op")
+        if op == "ping":
+            return {"ok": True}
+        if op == "run":
+            return self.run(payload.get("tool"), payload.get("argv") or [], payload.get("cwd"))
+        if op == "index":
+            tool = payload.get("tool")
+            if tool not in TOOLS:
+                return {"ok": False, "error": f"unknown tool: {tool}"}
+            self.indexes[tool].refresh(force=True)
+            return {"ok": True, "entries": self.indexes[tool].listing(payload.get("limit"))}
+        if op == "status":
+            return {
+                "ok": True,
+                "pid": os.getpid(),
+                "uptime_s": round(time.time() - self.started, 1),
+                "requests": self.requests,
+                "cache_hits": self.cache_hits,
+                "cache_entries": len(self.cache),
+                "modules_loaded": sorted(self.modules),
+                "indexed_files": {name: len(idx.entries) for name, idx in self.indexes.items()},
+            }
+        return {"ok": False, "error": f"unknown op: {op}"}
+
+
+def encode_response(payload, response):
+    """Frame a response: JSON by default, length-prefixed for raw run requests."""
+    import json
+
+    if payload.get("raw") and response.get("ok") and "exit" in response:
+        out = response["stdout"].encode("utf-8", "surrogateescape")
+        err = response["stderr"].encode("utf-8", "surrogateescape")
+        return b"%d %d %d\n" % (response["exit"], len(out), len(err)) + out + err
+    return json.dumps(response).encode() + b"\n"
+
+
+def _socket_alive():
+    try:
+        return bool(request({"op": "ping"}, timeout=1).get("ok"))
+    except (OSError, ValueError):
+        return False
+
+
+def serve(idle_timeout):
+    import json
+    import socket
+
+    os.umask(0o077)
+    os.makedirs(os.path.dirname(SOCKET_PATH), exist_ok=True)
+    os.chmod(os.path.dirname(SOCKET_PATH), 0o700)
+
+    if os.path.exists(SOCKET_PATH):
+        if _socket_alive():
+            print(f"Context engine already running on {SOCKET_PATH}", file=sys.stderr)
+            return 1
+        os.unlink(SOCKET_PATH)
+
+    engine = ContextEngine()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # Create the socket 0600 directly: a chmod after bind leaves a window in
+    # which clients that wait for the path can see other permissions
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(SOCKET_PATH)
+    finally:
+        os.umask(old_umask)
+    server.listen(16)
+    server.settimeout(idle_timeout if idle_timeout > 0 else None)
+
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break  # idle: exit so stale daemons do not linger
+            with conn:
+                conn.settimeout(CLIENT_TIMEOUT)
+                payload = {}
+                try:
+                    data = b""
+                    while b"\n" not in data and len(data) <= MAX_REQUEST_BYTES:
+                        chunk = conn.recv(65536)
+                        if not chunk:
+                            break
+                        data += chunk
+                    if len(data) > MAX_REQUEST_BYTES:
+                        response = {"ok": False, "error": "request too large"}
+                    else:
+                        payload = json.loads(data.decode("utf-8", "surrogateescape") or "{}")
+                        if not isinstance(payload, dict):
+                            raise ValueError("request must be a JSON object")
+                        if payload.get("op") == "stop":
+                            conn.sendall(encode_response(payload, {"ok": True}))
+                            break
+                        response = engine.handle(payload)
+                except ValueError as e:
+                    response = {"ok": False, "error": f"bad request: {e}"}
+                except OSError:
+                    continue
+                except Exception as e:
+                    # One bad request must not take the daemon down with it
+                    response = {"ok": False, "error": f"internal error: {type(e).__name__}: {e}"}
+                try:
+                    conn.sendall(encode_response(payload, response))
+                except OSError:
+                    pass
+    finally:
+        server.close()
+        try:
+            os.unlink(SOCKET_PATH)
+        except OSError:
+            pass
+    return 0
+
+
+def main():
+    args = sys.argv[1:]
+    cmd = args[0] if args else "--help"
+
+    if cmd == "run" and len(args) >= 2:
+        rest = args[2:]
+        if rest[:1] == ["--"]:
+            rest = rest[1:]
+        return client_run(args[1], rest)
+    if cmd == "serve":
+        idle = 3600
+        if "--idle-timeout" in args:
+            idle = int(args[args.index("--idle-timeout") + 1])
+        return serve(idle)
+    if cmd in ("status", "stop"):
+        import json
+
+        try:
+            response = request({"op": cmd}, timeout=5)
+        except (OSError, ValueError):
+            print(json.dumps({"ok": False, "running": False, "socket": SOCKET_PATH}))
+            return 1
+        print(json.dumps(dict(response, running=cmd == "status", socket=SOCKET_PATH)))
+        return 0
+
+    print(__doc__.strip())
+    return 0 if cmd in ("--help", "-h", "help") else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
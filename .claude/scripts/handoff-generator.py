@@ -0,0 +1,576 @@
+#!/usr/bin/env python3
+"""
+Handoff Generator (v2.35, search index v2.50) - Context transfer between sessions.
+
+Handoffs are markdown files under ~/.ralph/handoffs/<session>/handoff-*.md,
+written on compaction or on demand and loaded at session start.
+
+Since v2.50 every handoff is also recorded in an on-disk full-text index
+(.handoff-index.sqlite3 in the handoffs root): a `docs` table with session,
+path, size and mtime, plus an FTS5 inverted index (terms -> handoff ids with
+positions) over the body. `search` ranks with BM25 and supports "quoted
+phrase" queries without reading any markdown file. The index is updated by
+create/cleanup and reconciled for session directories whose mtime changed.
+Other tools (e.g. the smart-memory-search hook) can reuse it via
+`search QUERY --json` or by querying the SQLite file read-only. Created
+handoffs are also added to the shared vector index (vector-index.py).
+
+When the interpreter's SQLite lacks FTS5, search falls back to scanning the
+indexed files.
+
+Usage:
+    handoff-generator.py create --session ID [--trigger T] [--summary S ...] [--output PATH]
+    handoff-generator.py load [--session ID]
+    handoff-generator.py list [--session ID] [--limit N]
+    handoff-generator.py search QUERY [--limit N] [--json]
+    handoff-generator.py cleanup [--days N] [--keep-min N]
+    handoff-generator.py context [--max-tokens N]
+    handoff-generator.py reindex
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+HANDOFF_DIR = Path.home() / ".ralph" / "handoffs"
+INDEX_NAME = ".handoff-index.sqlite3"
+TRUNCATION_MARKER = "\n[... truncated]"
+SNIPPET_TOKENS = 24
+# BM25 is computed for every match, so very common queries are first ranked
+# over the newest RANK_WINDOW handoffs and only widened if that finds too few.
+RANK_WINDOW = 10000
+
+
+def safe_session_id(session_id):
+    """Reduce a session id to filesystem-safe characters (no separators, no dots)."""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", str(session_id)).strip("_")
+    return safe[:128] or "unnamed"
+
+
+def vector_index():
+    """The shared vector-index.py module next to this script, or None."""
+    return load_sibling(__file__, "vector-index.py", optional=True)
+
+
+def fts_query(query, any_term=False):
+    """Translate free text into an FTS5 MATCH expression.
+
+    "quoted text" becomes a phrase query; every other word is an AND-ed term
+    (OR-ed with any_term, for keyword lists such as the memory-search hook's).
+    Everything is emitted as quoted strings so user input can never be parsed
+    as FTS5 operators or column filters.
+    """
+    parts = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        tokens = re.findall(r"\w+", phrase or word)
+        if tokens:
+            parts.append('"' + " ".join(tokens) + '"')
+    return (" OR " if any_term else " ").join(parts)
+
+
+def index_text(body):
+    """Handoff text worth indexing: drops headings, the restore block and field labels.
+
+    The template boilerplate appears in every handoff, so indexing it only
+    lengthens posting lists without helping ranking.
+    """
+    kept, in_fence = [], False
+    for line in body.splitlines():
+        if line.startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence or line.startswith("#") or line.startswith("**Created**"):
+            continue
+        kept.append(re.sub(r"^\*\*\w+\*\*:\s*", "", line))
+    return "\n".join(kept).strip()
+
+
+class HandoffIndex:
+    """SQLite sidecar: handoff metadata plus an FTS5 inverted index."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS docs (
+            id         INTEGER PRIMARY KEY,
+            path       TEXT NOT NULL UNIQUE,
+            session_id TEXT NOT NULL,
+            size       INTEGER NOT NULL,
+            mtime      REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS docs_mtime ON docs (mtime DESC);
+        CREATE INDEX IF NOT EXISTS docs_session ON docs (session_id, mtime DESC);
+        CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns TEXT NOT NULL);
+    """
+
+    def __init__(self, handoff_dir):
+        self.handoff_dir = Path(handoff_dir)
+        self.path = self.handoff_dir / INDEX_NAME
+        fresh = not self.path.exists()
+        self.conn = sqlite3.connect(str(self.path), timeout=10)
+        if fresh:
+            os.chmod(self.path, 0o600)
+        # The index lives inside the directory it watches: a rollback journal
+        # that is created and deleted per transaction would bump the directory
+        # mtime and force a rescan on every open, so keep it in place.
+        self.conn.execute("PRAGMA journal_mode = PERSIST")
+        self.conn.executescript(self.SCHEMA)
+        try:
+            self.conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS handoff_fts USING fts5("
+                "body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._ensure_current()
+
+    # -- consistency ---------------------------------------------------------
+
+    def _ensure_current(self):
+        """Re-scan only the session directories whose mtime moved."""
+        stored = dict(self.conn.execute("SELECT path, mtime_ns FROM dirs"))
+        root = str(self.handoff_dir)
+        root_stamp = str(os.stat(self.handoff_dir).st_mtime_ns)
+        dirs = {p for p in stored if p != root}
+        if stored.get(root) != root_stamp:
+            # Session directories were added or removed
+            with os.scandir(self.handoff_dir) as it:
+                dirs.update(e.path for e in it if e.is_dir() and not e.name.startswith("."))
+
+        changed = []
+        for d in map(Path, sorted(dirs)):
+            try:
+                stamp = str(os.stat(d).st_mtime_ns)
+            except FileNotFoundError:
+                stamp = None
+            if stored.get(str(d)) != stamp:
+                changed.append((d, stamp))
+
+        if changed or stored.get(root) != root_stamp:
+            with self.conn:
+                for d, stamp in changed:
+                    self._rescan_dir(d, stamp)
+                self._store_stamp(self.handoff_dir, root_stamp)
+
+    def _store_stamp(self, directory, stamp=None):
+        if stamp is None:
+            stamp = str(os.stat(directory).st_mtime_ns)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns) VALUES (?, ?)", (str(directory), stamp)
+        )
+
+    def _rescan_dir(self, directory, stamp):
+        indexed = {
+            path: (doc_id, size, mtime)
+            for doc_id, path, size, mtime in self.conn.execute(
+                "SELECT id, path, size, mtime FROM docs WHERE session_id = ?", (directory.name,)
+            )
+        }
+        on_disk = {}
+        if stamp is not None:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.name.startswith("handoff-") and entry.name.endswith(".md"):
+                        st = entry.stat()
+                        on_disk[entry.path] = (st.st_size, st.st_mtime)
+
+        for path in indexed.keys() - on_disk.keys():
+            self._remove(indexed[path][0])
+        for path, (size, mtime) in on_disk.items():
+            if path in indexed and indexed[path][1:] == (size, mtime):
+                continue
+            try:
+                body = Path(path).read_text(errors="replace")
+            except OSError:
+                continue
+            self._add(path, directory.name, body, size, mtime)
+
+        if stamp is None:
+            self.conn.execute("DELETE FROM dirs WHERE path = ?", (str(directory),))
+        else:
+            self._store_stamp(directory, stamp)
+
+    def reconcile(self):
+        """Forget every stamp and re-scan all session directories."""
+        with self.conn:
+            self.conn.execute("DELETE FROM dirs")
+        self._ensure_current()
+
+    # -- writes (callers wrap these in a transaction) --------------------------
+
+    def _add(self, path, session_id, body, size, mtime):
+        row = self.conn.execute("SELECT id FROM docs WHERE path = ?", (str(path),)).fetchone()
+        if row:
+            self._remove(row[0])
+        cur = self.conn.execute(
+            "INSERT INTO docs (path, session_id, size, mtime) VALUES (?, ?, ?, ?)",
+            (str(path), session_id, size, mtime),
+        )
+        if self.fts:
+            self.conn.execute(
+                "INSERT INTO handoff_fts (rowid, body) VALUES (?, ?)",
+                (cur.lastrowid, index_text(body)),
+            )
+
+    def _remove(self, doc_id):
+        self.conn.execute("DELETE FROM docs WHERE id = ?", (doc_id,))
+        if self.fts:
+            self.conn.execute("DELETE FROM handoff_fts WHERE rowid = ?", (doc_id,))
+
+    def record_create(self, path, session_id, body):
+        st = os.stat(path)
+        with self.conn:
+            self._add(path, session_id, body, st.st_size, st.st_mtime)
+            self._store_stamp(path.parent)
+            self._store_stamp(self.handoff_dir)
+
+    def record_delete(self, paths):
+        with self.conn:
+            for path in paths:
+                row = self.conn.execute("SELECT id FROM docs WHERE path = ?", (str(path),)).fetchone()
+                if row:
+                    self._remove(row[0])
+            for directory in {Path(p).parent for p in paths}:
+                if directory.exists():
+                    self._store_stamp(directory)
+
+    # -- reads ---------------------------------------------------------------
+
+    def latest(self, limit=10, session_id=None):
+        sql = "SELECT id, path, session_id, size, mtime FROM docs"
+        params = []
+        if session_id:
+            sql += " WHERE session_id = ?"
+            params.append(session_id)
+        sql += " ORDER BY mtime DESC, id DESC LIMIT ?"
+        params.append(int(limit))
+        return self.conn.execute(sql, params).fetchall()
+
+    def search(self, query, limit=10, any_term=False):
+        """BM25-ranked matches as (path, session_id, mtime, score, snippet)."""
+        match = fts_query(query, any_term)
+        if not match:
+            return []
+        newest = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM docs").fetchone()[0]
+        ranked = []
+        if newest > RANK_WINDOW:
+            ranked = self._ranked(match, limit, newest - RANK_WINDOW)
+        if len(ranked) < limit:
+            ranked = self._ranked(match, limit, 0)
+
+        results = []
+        for doc_id, score in ranked:
+            row = self.conn.execute(
+                "SELECT d.path, d.session_id, d.mtime, "
+                "snippet(handoff_fts, 0, '', '', '...', ?) "
+                "FROM handoff_fts JOIN docs d ON d.id = handoff_fts.rowid "
+                "WHERE handoff_fts MATCH ? AND handoff_fts.rowid = ?",
+                (SNIPPET_TOKENS, match, doc_id),
+            ).fetchone()
+            if row:
+                results.append((row[0], row[1], row[2], score, " ".join(row[3].split())))
+        return results
+
+    def _ranked(self, match, limit, min_id):
+        # Snippets are built only for the final top-k, not for every match
+        return self.conn.execute(
+            "SELECT rowid, rank FROM handoff_fts WHERE handoff_fts MATCH ? AND rowid > ? "
+            "ORDER BY rank LIMIT ?",
+            (match, min_id, int(limit)),
+        ).fetchall()
+
+    def stats(self):
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM docs"
+        ).fetchone()
+        return {"count": count, "total_size": total, "fts": self.fts}
+
+    def close(self):
+        self.conn.close()
+
+
+class HandoffGenerator:
+    """Creates, loads, searches and prunes session handoffs."""
+
+    def __init__(self, handoff_dir=None):
+        self.handoff_dir = Path(handoff_dir) if handoff_dir else HANDOFF_DIR
+        self.handoff_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.index = HandoffIndex(self.handoff_dir)
+
+    @staticmethod
+    def render(session_id, trigger="manual", recent_changes=None, context_summary=None,
+               next_steps=None):
+        """Render a handoff as markdown."""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        lines = [
+            f"# RALPH HANDOFF: {session_id}",
+            "",
+            f"**Created**: {now}",
+            f"**Trigger**: {trigger}",
+            f"**Session**: {session_id}",
+            "",
+        ]
+        if recent_changes:
+            lines.append("## RECENT CHANGES")
+            lines += [f"- {c.get('type', 'MODIFIED')}: {c.get('file', '')}" for c in recent_changes]
+            lines.append("")
+        if context_summary:
+            lines.append("## CONTEXT SUMMARY")
+            lines += [f"- {s}" for s in context_summary]
+            lines.append("")
+        if next_steps:
+            lines.append("## NEXT STEPS")
+            lines += [f"{i}. {s}" for i, s in enumerate(next_steps, 1)]
+            lines.append("")
+        lines += [
+            "## RESTORE COMMAND",
+            "```bash",
+            f"ralph ledger show --session {session_id}",
+            f"ralph handoff show --session {session_id}",
+            "```",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def create(self, session_id, trigger="manual", output=None, **sections):
+        """Write a handoff atomically and add it to the search index. Returns its path."""
+        sid = safe_session_id(session_id)
+        content = self.render(sid, trigger, **sections)
+
+        if output:
+            path = Path(output)
+        else:
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+            path = self.handoff_dir / sid / f"handoff-{stamp}.md"
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".handoff-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        if not output:
+            self.index.record_create(path, sid, content)
+            vectors = vector_index()
+            if vectors:
+                summary = sections.get("context_summary") or [trigger]
+                changes = sections.get("recent_changes") or []
+                vectors.feed(vectors.handoff_key(path), vectors.document_text(content), "handoff",
+                             session_id=sid, path=str(path), title=summary[0],
+                             files=[c["file"] for c in changes if c.get("file")])
+        return path
+
+    def _entry(self, row):
+        _doc_id, path, session_id, size, mtime = row
+        return {
+            "session_id": session_id,
+            "path": path,
+            "size": size,
+            "created": datetime.fromtimestamp(mtime).isoformat(timespec="seconds"),
+        }
+
+    def load(self, session_id=None):
+        """Latest handoff content (for a session if given), or None."""
+        self.index._ensure_current()
+        rows = self.index.latest(1, safe_session_id(session_id) if session_id else None)
+        if not rows:
+            return None
+        try:
+            return Path(rows[0][1]).read_text()
+        except OSError:
+            return None
+
+    def list_handoffs(self, limit=10, session_id=None):
+        """Most recent handoffs first, as metadata dicts."""
+        self.index._ensure_current()
+        sid = safe_session_id(session_id) if session_id else None
+        return [self._entry(row) for row in self.index.latest(limit, sid)]
+
+    def search(self, query, limit=10, any_term=False):
+        """Search handoffs; BM25-ranked when FTS5 is available."""
+        self.index._ensure_current()
+        if self.index.fts:
+            return [
+                {
+                    "session_id": session_id,
+                    "path": path,
+                    "created": datetime.fromtimestamp(mtime).isoformat(timespec="seconds"),
+                    "score": round(-score, 4),
+                    "snippet": snippet,
+                }
+                for path, session_id, mtime, score, snippet in self.index.search(query, limit, any_term)
+            ]
+        return self._scan_search(query, limit, any_term)
+
+    def _scan_search(self, query, limit, any_term=False):
+        """Fallback for SQLite builds without FTS5: all (or any) terms, newest first."""
+        terms = [t.lower() for t in re.findall(r"\w+", query)]
+        if not terms:
+            return []
+        results = []
+        for row in self.index.latest(-1):
+            try:
+                body = Path(row[1]).read_text(errors="replace")
+            except OSError:
+                continue
+            lowered = body.lower()
+            hits = [t for t in terms if t in lowered]
+            if hits and (any_term or len(hits) == len(terms)):
+                pos = lowered.find(hits[0])
+                entry = self._entry(row)
+                entry["snippet"] = body[max(0, pos - 80):pos + 120].replace("\n", " ")
+                results.append(entry)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def cleanup_old(self, days=7, keep_min=20):
+        """Delete handoffs older than `days`, keeping the newest `keep_min` per session."""
+        self.index._ensure_current()
+        cutoff = time.time() - days * 86400
+        doomed = []
+        sessions = [r[0] for r in self.index.conn.execute("SELECT DISTINCT session_id FROM docs")]
+        for sid in sessions:
+            for _doc_id, path, _sid, _size, mtime in self.index.latest(-1, sid)[keep_min:]:
+                if mtime < cutoff:
+                    doomed.append(path)
+
+        deleted = []
+        for path in doomed:
+            try:
+                os.unlink(path)
+                deleted.append(path)
+            except FileNotFoundError:
+                deleted.append(path)
+            except OSError:
+                continue
+        if deleted:
+            self.index.record_delete(deleted)
+            vectors = vector_index()
+            if vectors:
+                vectors.forget([vectors.handoff_key(path) for path in deleted])
+        return len(deleted)
+
+    def get_context_for_injection(self, max_tokens=300, session_id=None):
+        """Latest handoff trimmed to roughly max_tokens (4 chars per token)."""
+        content = self.load(session_id)
+        if not content:
+            return ""
+        max_chars = max_tokens * 4
+        if len(content) <= max_chars:
+            return content
+        return content[:max(0, max_chars - len(TRUNCATION_MARKER))] + TRUNCATION_MARKER
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Context transfer between Ralph sessions (handoff documents)"
+    )
+    parser.add_argument("--dir", help="Handoff directory (default: ~/.ralph/handoffs)")
+    sub = parser.add_subparsers(dest="command")
+
+    p_create = sub.add_parser("create", help="Create a handoff")
+    p_create.add_argument("--session", required=True)
+    p_create.add_argument("--trigger", default="manual")
+    p_create.add_argument("--summary", action="append", help="Context summary line (repeatable)")
+    p_create.add_argument("--next", action="append", dest="next_steps", help="Next step (repeatable)")
+    p_create.add_argument("--output", help="Write to this path instead of the handoff directory")
+
+    p_load = sub.add_parser("load", aliases=["show"], help="Show the latest handoff")
+    p_load.add_argument("--session")
+
+    p_list = sub.add_parser("list", help="List recent handoffs")
+    p_list.add_argument("--session")
+    p_list.add_argument("--limit", type=int, default=10)
+    p_list.add_argument("--json", action="store_true")
+
+    p_search = sub.add_parser("search", help="Full-text search (BM25, \"phrase\" queries)")
+    p_search.add_argument("query", nargs="+")
+    p_search.add_argument("--limit", type=int, default=10)
+    p_search.add_argument("--any", action="store_true", help="Match any term instead of all")
+    p_search.add_argument("--json", action="store_true")
+
+    p_cleanup = sub.add_parser("cleanup", help="Delete old handoffs")
+    p_cleanup.add_argument("--days", type=int, default=7)
+    p_cleanup.add_argument("--keep-min", type=int, default=20)
+
+    p_context = sub.add_parser("context", help="Latest handoff sized for context injection")
+    p_context.add_argument("--max-tokens", type=int, default=300)
+    p_context.add_argument("--session")
+
+    sub.add_parser("reindex", help="Rebuild the search index from disk")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    generator = HandoffGenerator(args.dir)
+    try:
+        return _run(args, generator)
+    finally:
+        generator.index.close()
+
+
+def _run(args, generator):
+    if args.command == "create":
+        path = generator.create(
+            args.session, args.trigger, output=args.output,
+            context_summary=args.summary, next_steps=args.next_steps,
+        )
+        print(f"Handoff created: {path}")
+    elif args.command in ("load", "show"):
+        content = generator.load(args.session)
+        if content is None:
+            print("No handoff found", file=sys.stderr)
+            return 1
+        print(content)
+    elif args.command == "list":
+        handoffs = generator.list_handoffs(args.limit, args.session)
+        if args.json:
+            print(json.dumps(handoffs, indent=2))
+        elif not handoffs:
+            print("No handoffs found")
+        else:
+            for entry in handoffs:
+                print(f"{entry['created']}  {entry['session_id']:<32} {entry['path']}")
+    elif args.command == "search":
+        results = generator.search(" ".join(args.query), args.limit, args.any)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        elif not results:
+            print("No matches")
+        else:
+            for entry in results:
+                print(f"{entry['created']}  {entry['session_id']}  {entry['path']}")
+                print(f"    {entry['snippet']}")
+    elif args.command == "cleanup":
+        deleted = generator.cleanup_old(args.days, args.keep_min)
+        print(f"Deleted {deleted} handoff(s)")
+    elif args.command == "context":
+        print(generator.get_context_for_injection(args.max_tokens, args.session))
+    elif args.command == "reindex":
+        generator.index.reconcile()
+        print(json.dumps(generator.index.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/bin/bash
+# hook-timer.sh - Opt-in hook profiler (v2.50)
+#
+# `ralph hooks profile on` rewrites each hook command in ~/.claude/settings.json
+# from
+#     <command>
+# to
+#     ${HOME}/.claude/scripts/hook-timer.sh <Event> -- <command>
+# and `ralph hooks profile off` strips the prefix again. For a simple command
+# the shell that Claude Code starts has already split <command> into words,
+# so "$@" runs exactly what it would have run. Commands the shell would parse
+# differently behind a prefix (assignments, `a && b`, pipes, redirections,
+# `;`, $(...)) are wrapped as `<Event> --sh '<command>'` instead and run
+# through `bash -c`.
+#
+# Per call, one JSON line is appended to
+# ~/.ralph/metrics/hooks/YYYY-MM-DD.jsonl (one file per day; `ralph hooks
+# profile` drops files past the retention window):
+#     {"ts", "event", "hook", "tool", "us", "exit", "bytes"}
+#
+# The hook's stdin, stdout, stderr and exit code pass through unchanged. The
+# wrapper itself uses only builtins (EPOCHREALTIME, read, printf) on bash 5,
+# so it adds no process start-ups of its own to what it measures; older
+# shells (macOS /bin/bash 3.2) fall back to `date`. Recording never changes
+# the hook's exit code.
+
+set -uo pipefail
+umask 077
+
+EVENT="${1:-unknown}"
+shift || true
+case "${1:-}" in
+    --)   shift ;;
+    --sh) set -- bash -c "${2:-}" ;;
+esac
+[ $# -gt 0 ] || exit 0
+
+METRICS_DIR="${RALPH_METRICS_DIR:-${HOME}/.ralph/metrics}/hooks"
+
+INPUT=""
+IFS= read -r -d '' INPUT || true
+
+# Sets NOW_US to the epoch time in microseconds (no fork on bash 5+)
+now_us() {
+    if [ -n "${EPOCHREALTIME:-}" ]; then
+        NOW_US="${EPOCHREALTIME/[.,]/}"
+    else
+        NOW_US="$(date +%s 2>/dev/null)000000"
+    fi
+}
+
+now_us
+START="$NOW_US"
+OUTPUT=$("$@" <<< "$INPUT")
+RC=$?
+now_us
+END="$NOW_US"
+
+[ -n "$OUTPUT" ] && printf '%s\n' "$OUTPUT"
+
+record() {
+    local LC_ALL=C
+    local US=0 BYTES=${#OUTPUT}
+    local HOOK="" TOOL="" DAY=""
+
+    # Validated before any arithmetic: a bad expansion would abort the shell
+    [[ "$START" =~ ^[0-9]+$ ]] && [[ "$END" =~ ^[0-9]+$ ]] || return 0
+    US=$(( 10#$END - 10#$START ))
+
+    # Hook name: first *.sh/*.py word of the command, else the command itself
+    if [[ "$*" =~ ([^/[:space:]]+\.(sh|py))([[:space:]]|$) ]]; then
+        HOOK="${BASH_REMATCH[1]}"
+    else
+        HOOK="${1##*/}"
+    fi
+    if [[ "$INPUT" =~ \"tool_name\"[[:space:]]*:[[:space:]]*\"([^\"]*)\" ]]; then
+        TOOL="${BASH_REMATCH[1]}"
+    fi
+    HOOK="${HOOK//[^A-Za-z0-9._-]/}"
+    TOOL="${TOOL//[^A-Za-z0-9._:-]/}"
+    EVENT="${EVENT//[^A-Za-z0-9]/}"
+
+    [ -d "$METRICS_DIR" ] || mkdir -p "$METRICS_DIR" 2>/dev/null || return 0
+    # printf %(...)T needs bash 4.2+
+    if [ "${BASH_VERSINFO[0]}" -gt 4 ] || { [ "${BASH_VERSINFO[0]}" -eq 4 ] && [ "${BASH_VERSINFO[1]}" -ge 2 ]; }; then
+        printf -v DAY '%(%Y-%m-%d)T' -1
+    else
+        DAY=$(date +%Y-%m-%d 2>/dev/null) || return 0
+    fi
+    [[ "$DAY" =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]] || return 0
+    # One short write with O_APPEND: lines from concurrent hooks never interleave
+    printf '{"ts":%s,"event":"%s","hook":"%s","tool":"%s","us":%d,"exit":%d,"bytes":%d}\n' \
+        "$(( 10#$START / 1000000 ))" "$EVENT" "$HOOK" "$TOOL" "$US" "$RC" "$BYTES" \
+        >> "$METRICS_DIR/$DAY.jsonl" 2>/dev/null || true
+}
+record "$@" || true
+
+exit "$RC"
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Ledger Manager (v2.35, indexed store v2.50) - Context preservation across sessions.
+
+One CONTINUITY_RALPH-<session>.md file per session lives in ~/.ralph/ledgers.
+Since v2.50 a SQLite sidecar index (.ledger-index.sqlite3 in the same
+directory) holds session id, project, goal, size and mtime for every ledger,
+so `list`, `show` (latest) and `context` are index lookups instead of
+globbing and stat-ing the whole directory. The index is updated in the same
+step as every save/delete and reconciled against the directory whenever the
+directory itself changed behind our back (files copied in, removed by hand)
+or a ledger a lookup returned no longer matches its indexed mtime and size
+(rewritten in place).
+Saved ledgers are also added to the shared vector index (vector-index.py).
+
+Usage:
+    ledger-manager.py save --session ID --goal "..." [--project NAME] [--output PATH]
+    ledger-manager.py show [--session ID]
+    ledger-manager.py list [--limit N] [--json]
+    ledger-manager.py delete --session ID
+    ledger-manager.py context [--max-tokens N]
+    ledger-manager.py stats
+    ledger-manager.py reindex
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+LEDGER_DIR = Path.home() / ".ralph" / "ledgers"
+LEDGER_PREFIX = "CONTINUITY_RALPH-"
+INDEX_NAME = ".ledger-index.sqlite3"
+TRUNCATION_MARKER = "\n[... truncated]"
+
+
+def safe_session_id(session_id):
+    """Reduce a session id to filesystem-safe characters (no separators, no dots)."""
+    safe = re.sub(r"[^A-Za-z0-9_-]", "_", str(session_id)).strip("_")
+    return safe[:128] or "unnamed"
+
+
+def vector_index():
+    """The shared vector-index.py module next to this script, or None."""
+    return load_sibling(__file__, "vector-index.py", optional=True)
+
+
+def _goal_from_content(content):
+    """First line of the CURRENT GOAL section, for index rows built by a rescan."""
+    match = re.search(r"^## CURRENT GOAL\s*\n+(.+)$", content, re.MULTILINE)
+    return match.group(1).strip()[:500] if match else ""
+
+
+def _project_from_content(content):
+    match = re.search(r"\*\*Project\*\*: ([^|\n]+)", content)
+    return match.group(1).strip() if match else ""
+
+
+class LedgerIndex:
+    """SQLite sidecar index over a ledger directory."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ledgers (
+            session_id TEXT PRIMARY KEY,
+            path       TEXT NOT NULL,
+            project    TEXT NOT NULL DEFAULT '',
+            goal       TEXT NOT NULL DEFAULT '',
+            size       INTEGER NOT NULL,
+            mtime      REAL NOT NULL,
+            mtime_ns   INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS ledgers_mtime ON ledgers (mtime DESC);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, ledger_dir):
+        self.ledger_dir = Path(ledger_dir)
+        self.path = self.ledger_dir / INDEX_NAME
+        fresh = not self.path.exists()
+        self.conn = sqlite3.connect(str(self.path), timeout=10)
+        if fresh:
+            os.chmod(self.path, 0o600)
+        # The index lives inside the directory it watches: a rollback journal
+        # that is created and deleted per transaction would bump the directory
+        # mtime and force a rescan on every open, so keep it in place.
+        self.conn.execute("PRAGMA journal_mode = PERSIST")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(ledgers)")}
+        if "mtime_ns" not in columns:
+            # Index from before per-file checks: add the column, force a reconcile
+            with self.conn:
+                self.conn.execute(
+                    "ALTER TABLE ledgers ADD COLUMN mtime_ns INTEGER NOT NULL DEFAULT 0"
+                )
+                self.conn.execute("DELETE FROM meta WHERE key = 'dir_mtime'")
+        self._ensure_current()
+
+    # -- consistency ---------------------------------------------------------
+
+    def _dir_stamp(self):
+        return str(os.stat(self.ledger_dir).st_mtime_ns)
+
+    def _stored_stamp(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dir_mtime'").fetchone()
+        return row[0] if row else None
+
+    def _store_stamp(self):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('dir_mtime', ?)", (self._dir_stamp(),)
+        )
+
+    def _ensure_current(self):
+        """Reconcile only when the directory changed since we last touched it."""
+        if self._stored_stamp() != self._dir_stamp():
+            self.reconcile()
+
+    def reconcile(self):
+        """Bring the index in line with the files on disk."""
+        on_disk = {}
+        with os.scandir(self.ledger_dir) as it:
+            for entry in it:
+                name = entry.name
+                if name.startswith(LEDGER_PREFIX) and name.endswith(".md") and entry.is_file():
+                    st = entry.stat()
+                    on_disk[name[len(LEDGER_PREFIX):-3]] = (entry.path, st)
+
+        indexed = {
+            sid: (size, mtime_ns)
+            for sid, size, mtime_ns in self.conn.execute(
+                "SELECT session_id, size, mtime_ns FROM ledgers"
+            )
+        }
+        with self.conn:
+            for sid in indexed.keys() - on_disk.keys():
+                self.conn.execute("DELETE FROM ledgers WHERE session_id = ?", (sid,))
+            for sid, (path, st) in on_disk.items():
+                if indexed.get(sid) == (st.st_size, st.st_mtime_ns):
+                    continue
+                try:
+                    content = Path(path).read_text(errors="replace")
+                except OSError:
+                    continue
+                self._upsert(sid, path, _project_from_content(content),
+                             _goal_from_content(content), st)
+            self._store_stamp()
+
+    # -- writes (callers wrap these in a transaction) --------------------------
+
+    def _upsert(self, session_id, path, project, goal, st):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ledgers "
+            "(session_id, path, project, goal, size, mtime, mtime_ns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (session_id, str(path), project, goal, st.st_size, st.st_mtime, st.st_mtime_ns),
+        )
+
+    def record_save(self, session_id, path, project, goal):
+        st = os.stat(path)
+        with self.conn:
+            self._upsert(session_id, path, project, goal[:500], st)
+            self._store_stamp()
+
+    def record_delete(self, session_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM ledgers WHERE session_id = ?", (session_id,))
+            self._store_stamp()
+
+    # -- reads ---------------------------------------------------------------
+
+    @staticmethod
+    def _rows_current(rows):
+        for row in rows:
+            try:
+                st = os.stat(row[1])
+            except OSError:
+                return False
+            if (st.st_size, st.st_mtime_ns) != (row[4], row[6]):
+                return False
+        return True
+
+    def _verified(self, sql, params):
+        """Run a lookup; if a returned ledger changed on disk, reconcile and re-run.
+
+        The directory mtime misses files rewritten in place, so the rows a
+        lookup returns (and only those) are stat-checked before use.
+        """
+        rows = self.conn.execute(sql, params).fetchall()
+        if not self._rows_current(rows):
+            self.reconcile()
+            rows = self.conn.execute(sql, params).fetchall()
+        return [row[:6] for row in rows]
+
+    def latest(self, limit=1):
+        return self._verified(
+            "SELECT session_id, path, project, goal, size, mtime, mtime_ns FROM ledgers "
+            "ORDER BY mtime DESC, rowid DESC LIMIT ?",
+            (int(limit),),
+        )
+
+    def get(self, session_id):
+        rows = self._verified(
+            "SELECT session_id, path, project, goal, size, mtime, mtime_ns FROM ledgers "
+            "WHERE session_id = ?",
+            (session_id,),
+        )
+        return rows[0] if rows else None
+
+    def stats(self):
+        count, total = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM ledgers"
+        ).fetchone()
+        return {"count": count, "total_size": total}
+
+    def close(self):
+        self.conn.close()
+
+
+class LedgerManager:
+    """Saves, loads and lists session ledgers."""
+
+    def __init__(self, ledger_dir=None):
+        self.ledger_dir = Path(ledger_dir) if ledger_dir else LEDGER_DIR
+        self.ledger_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.index = LedgerIndex(self.ledger_dir)
+
+    def _path_for(self, session_id):
+        return self.ledger_dir / f"{LEDGER_PREFIX}{safe_session_id(session_id)}.md"
+
+    @staticmethod
+    def render(session_id, goal, project="", constraints=None, completed_work=None,
+               pending_work=None, decisions=None, agents_used=None, custom_sections=None):
+        """Render a ledger as markdown."""
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        lines = [f"# CONTINUITY_RALPH: {session_id}", ""]
+        lines.append(f"**Saved**: {now} | **Project**: {project or 'unknown'}")
+        lines += ["", "## CURRENT GOAL", goal or "(not set)", ""]
+
+        if constraints:
+            lines.append("## CONSTRAINTS")
+            lines += [f"- {c}" for c in constraints]
+            lines.append("")
+
+        def work_line(item, box):
+            where = item.get("file", "")
+            if item.get("lines"):
+                where = f"{where}:{item['lines']}"
+            desc = item.get("description", "")
+            return f"- [{box}] {where} - {desc}" if where else f"- [{box}] {desc}"
+
+        if completed_work:
+            lines.append("## COMPLETED WORK")
+            lines += [work_line(w, "x") for w in completed_work]
+            lines.append("")
+
+        if pending_work:
+            lines.append("## PENDING WORK")
+            lines += [work_line(w, " ") for w in pending_work]
+            lines.append("")
+
+        if decisions:
+            lines.append("## KEY DECISIONS")
+            lines += [f"- {d}" for d in decisions]
+            lines.append("")
+
+        if agents_used:
+            lines += ["## AGENTS USED", "| Agent | Status | Action |", "|-------|--------|--------|"]
+            lines += [
+                f"| {a.get('agent', '')} | {a.get('status', '')} | {a.get('action', '')} |"
+                for a in agents_used
+            ]
+            lines.append("")
+
+        for title, body in (custom_sections or {}).items():
+            lines += [f"## {title}", str(body), ""]
+
+        return "\n".join(lines)
+
+    def save(self, session_id, goal, project=None, output=None, **sections):
+        """Write a ledger atomically and record it in the index. Returns its path."""
+        project = project if project is not None else Path.cwd().name
+        content = self.render(session_id, goal, project=project, **sections)
+
+        path = Path(output) if output else self._path_for(session_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=".ledger-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        if path.parent.resolve() == self.ledger_dir.resolve() and path.name.startswith(LEDGER_PREFIX):
+            sid = path.name[len(LEDGER_PREFIX):-3]
+            self.index.record_save(sid, path, project, goal or "")
+            vectors = vector_index()
+            if vectors:
+                work = (sections.get("completed_work") or []) + (sections.get("pending_work") or [])
+                vectors.feed(vectors.ledger_key(sid), vectors.document_text(content), "ledger",
+                             session_id=sid, project=project, path=str(path), title=goal or "",
+                             files=[w["file"] for w in work if w.get("file")])
+        return path
+
+    def load(self, session_id=None):
+        """Return ledger content for a session (latest if None), or None."""
+        self.index._ensure_current()
+        if session_id is None:
+            rows = self.index.latest(1)
+            row = rows[0] if rows else None
+        else:
+            row = self.index.get(safe_session_id(session_id))
+        if not row:
+            return None
+        try:
+            return Path(row[1]).read_text()
+        except OSError:
+            # Removed behind our back between stat and read: resync once
+            self.index.reconcile()
+            return None
+
+    def list_ledgers(self, limit=10):
+        """Most recent ledgers first, as metadata dicts."""
+        self.index._ensure_current()
+        return [
+            {
+                "session_id": sid,
+                "path": path,
+                "project": project,
+                "goal": goal,
+                "size": size,
+                "modified": datetime.fromtimestamp(mtime).isoformat(timespec="seconds"),
+            }
+            for sid, path, project, goal, size, mtime in self.index.latest(limit)
+        ]
+
+    def delete(self, session_id):
+        """Delete a ledger. Returns True if one was removed."""
+        sid = safe_session_id(session_id)
+        path = self._path_for(sid)
+        if not path.exists():
+            return False
+        path.unlink()
+        self.index.record_delete(sid)
+        vectors = vector_index()
+        if vectors:
+            vectors.forget([vectors.ledger_key(sid)])
+        return True
+
+    def get_context_for_injection(self, max_tokens=500):
+        """Latest ledger trimmed to roughly max_tokens (4 chars per token)."""
+        content = self.load()
+        if not content:
+            return ""
+        max_chars = max_tokens * 4
+        if len(content) <= max_chars:
+            return content
+        return content[:max(0, max_chars - len(TRUNCATION_MARKER))] + TRUNCATION_MARKER
+
+    def stats(self):
+        self.index._ensure_current()
+        return dict(self.index.stats(), path=str(self.ledger_dir))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Context preservation ledgers for Ralph sessions (CONTINUITY_RALPH)"
+    )
+    parser.add_argument("--dir", help="Ledger directory (default: ~/.ralph/ledgers)")
+    sub = parser.add_subparsers(dest="command")
+
+    p_save = sub.add_parser("save", help="Save a ledger")
+    p_save.add_argument("--session", required=True)
+    p_save.add_argument("--goal", default="")
+    p_save.add_argument("--project")
+    p_save.add_argument("--output", help="Write to this path instead of the ledger directory")
+
+    p_show = sub.add_parser("show", help="Show a ledger (latest if no session)")
+    p_show.add_argument("--session")
+
+    p_list = sub.add_parser("list", help="List recent ledgers")
+    p_list.add_argument("--limit", type=int, default=10)
+    p_list.add_argument("--json", action="store_true")
+
+    p_delete = sub.add_parser("delete", help="Delete a ledger")
+    p_delete.add_argument("--session", required=True)
+
+    p_context = sub.add_parser("context", help="Latest ledger sized for context injection")
+    p_context.add_argument("--max-tokens", type=int, default=500)
+
+    sub.add_parser("stats", help="Ledger count and total size (JSON)")
+    sub.add_parser("reindex", help="Rebuild the sidecar index from disk")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    manager = LedgerManager(args.dir)
+    try:
+        return _run(args, manager)
+    finally:
+        manager.index.close()
+
+
+def _run(args, manager):
+    if args.command == "save":
+        path = manager.save(args.session, args.goal, project=args.project, output=args.output)
+        print(f"Ledger saved: {path}")
+    elif args.command == "show":
+        content = manager.load(args.session)
+        if content is None:
+            print("No ledger found", file=sys.stderr)
+            return 1
+        print(content)
+    elif args.command == "list":
+        ledgers = manager.list_ledgers(args.limit)
+        if args.json:
+            print(json.dumps(ledgers, indent=2))
+        elif not ledgers:
+            print("No ledgers found")
+        else:
+            for entry in ledgers:
+                goal = entry["goal"][:50]
+                print(f"{entry['modified']}  {entry['session_id']:<32} {entry['size']:>7}B  {goal}")
+    elif args.command == "delete":
+        if not manager.delete(args.session):
+            print(f"Ledger not found: {args.session}", file=sys.stderr)
+            return 1
+        print(f"Deleted ledger: {args.session}")
+    elif args.command == "context":
+        print(manager.get_context_for_injection(args.max_tokens))
+    elif args.command == "stats":
+        print(json.dumps(manager.stats()))
+    elif args.command == "reindex":
+        manager.index.reconcile()
+        print(json.dumps(manager.stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
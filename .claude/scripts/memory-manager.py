@@ -0,0 +1,788 @@
+#!/usr/bin/env python3
+"""
+Memory Manager (v2.49, segment store v2.50) - Semantic, episodic and procedural memory.
+
+    semantic    facts and preferences      ~/.ralph/memory/semantic.json
+    episodic    experiences per session    ~/.ralph/episodes/YYYY-MM/
+    procedural  learned rules              ~/.ralph/procedural/rules.json
+
+Configuration lives in ~/.ralph/config/memory-config.json (created with
+defaults on first use; a malformed file falls back to the defaults).
+
+Since v2.50 episodes are stored in append-only JSONL segments, one set per
+month, instead of one JSON file per episode:
+
+    episodes/YYYY-MM/segment-0001.jsonl   one episode per line
+    episodes/YYYY-MM/segment-0001.idx     "episode_id<TAB>offset<TAB>length<TAB>ts" per line
+    episodes/YYYY-MM/manifest.json        per-segment header: count, bytes, first/last ts
+
+Appends take a per-month flock. `stats` reads only manifests, search and
+context skip whole segments by their time range (and drop older episodes
+from the segments they do read), and `get` seeks straight to an episode via
+the offset index of the month encoded in its id (ep-YYYYMMDD...). An episode can be replaced (the cold
+path keeps one per session): the new version is appended under the same
+episode_id and timestamp, readers only see the newest one, and the
+manifest counts the stale copy as superseded until compaction drops it. `compact` enforces episodic.ttl_days. It
+deletes expired segments without reading them, rewrites segments that
+straddle the cutoff, and folds legacy one-file-per-episode JSON into
+segments. It runs in the background, at most once per
+lifecycle.compact_interval_hours, when writes or stats notice it is due.
+
+Usage:
+    memory-manager.py write semantic --content TEXT [--category C] [--importance 1-10] [--tags a,b]
+    memory-manager.py write episodic --task TEXT [--context TEXT] [--failure] [--tags a,b]
+                                     [--learning TEXT ...] [--session ID]
+    memory-manager.py search QUERY [--limit N]
+    memory-manager.py context TASK [--limit N]
+    memory-manager.py get EPISODE_ID
+    memory-manager.py stats
+    memory-manager.py compact [--quiet]
+"""
+
+import argparse
+import fcntl
+import heapq
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+RALPH_DIR = Path.home() / ".ralph"
+CONFIG_FILE = RALPH_DIR / "config" / "memory-config.json"
+SEMANTIC_FILE = RALPH_DIR / "memory" / "semantic.json"
+EPISODES_DIR = RALPH_DIR / "episodes"
+PROCEDURAL_FILE = RALPH_DIR / "procedural" / "rules.json"
+
+DEFAULT_CONFIG = {
+    "version": "2.50",
+    "hot_path": {
+        "enabled": True,
+        "auto_triggers": ["remember", "note", "don't forget", "keep in mind"],
+    },
+    "cold_path": {
+        "enabled": True,
+        "reflection_on_stop": True,
+        "pattern_detection_threshold": 3,
+    },
+    "semantic": {"max_facts": 1000},
+    "episodic": {"ttl_days": 30, "segment_max_bytes": 4 * 1024 * 1024},
+    "procedural": {"min_confidence": 0.8, "max_rules_injected": 5},
+    "lifecycle": {"auto_compact": True, "compact_interval_hours": 24},
+}
+
+SEGMENT_PREFIX = "segment-"
+MANIFEST_NAME = "manifest.json"
+COMPACT_STAMP = ".last-compact"
+# Legacy per-episode files younger than this are left alone by compaction:
+# their writer (or a test) may still be working with them
+LEGACY_GRACE_SECONDS = 3600
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+
+def _warn(message):
+    print(f"memory-manager: {message}", file=sys.stderr)
+
+
+def _load_json(path, default):
+    """Parse a JSON file, or return `default` when it is missing or malformed (MM-001)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, json.JSONDecodeError) as e:
+        _warn(f"ignoring unreadable {path}: {e}")
+        return default
+
+
+def _write_json_atomic(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def load_config(path=None):
+    """Defaults overlaid with memory-config.json, section by section (SEC-005).
+
+    A missing file is created with the defaults; a malformed one is reported
+    and ignored rather than breaking every memory hook.
+    """
+    path = Path(path) if path else CONFIG_FILE
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    if not path.exists():
+        try:
+            _write_json_atomic(path, config)
+        except OSError:
+            pass
+        return config
+    loaded = _load_json(path, {})
+    if not isinstance(loaded, dict):
+        _warn(f"ignoring {path}: expected a JSON object")
+        return config
+    for section, values in loaded.items():
+        if isinstance(values, dict) and isinstance(config.get(section), dict):
+            config[section].update(values)
+        else:
+            config[section] = values
+    return config
+
+
+def terms(text):
+    """Lowercase search terms (3+ characters)."""
+    return {t for t in re.findall(r"[a-z0-9_]{3,}", str(text).lower())}
+
+
+def _score(query_terms, *fields):
+    haystack = " ".join(str(f) for f in fields if f).lower()
+    return sum(1 for t in query_terms if t in haystack)
+
+
+def _parse_ts(value):
+    """Epoch seconds from an ISO timestamp or number; None when unparseable."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.astimezone()
+    return dt.timestamp()
+
+
+def _is_since(episode, since):
+    """True if the episode's timestamp is at or after `since` (epoch)."""
+    ts = _parse_ts(episode.get("timestamp"))
+    return ts is not None and ts >= since
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def vector_index():
+    """The shared vector-index.py module next to this script, or None."""
+    return load_sibling(__file__, "vector-index.py", optional=True)
+
+
+# =============================================================================
+# Episodic store
+# =============================================================================
+
+class _DirLock:
+    """Exclusive flock on a directory's .lock file (one writer per month / store)."""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / ".lock"
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+
+class EpisodicStore:
+    """Month-partitioned, append-only JSONL segments with an offset index."""
+
+    def __init__(self, root=None, segment_max_bytes=None):
+        self.root = Path(root) if root else EPISODES_DIR
+        self.root.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.segment_max_bytes = segment_max_bytes or DEFAULT_CONFIG["episodic"]["segment_max_bytes"]
+
+    # -- layout ----------------------------------------------------------------
+
+    def months(self, newest_first=False):
+        names = [e.name for e in os.scandir(self.root)
+                 if e.is_dir() and re.fullmatch(r"\d{4}-\d{2}", e.name)]
+        return sorted(names, reverse=newest_first)
+
+    def _manifest(self, month):
+        manifest = _load_json(self.root / month / MANIFEST_NAME, {})
+        segments = manifest.get("segments") if isinstance(manifest, dict) else None
+        return segments if isinstance(segments, dict) else {}
+
+    def _save_manifest(self, month, segments):
+        _write_json_atomic(self.root / month / MANIFEST_NAME, {"version": 1, "segments": segments})
+
+    def _legacy_files(self, month):
+        month_dir = self.root / month
+        return sorted(
+            e.path for e in os.scandir(month_dir)
+            if e.is_file() and e.name.endswith(".json") and e.name != MANIFEST_NAME
+        )
+
+    # -- writes ----------------------------------------------------------------
+
+    def append(self, episode, replace=False):
+        """Store one episode; fills in episode_id/timestamp. Returns the episode id.
+
+        With replace=True the episode supersedes the stored one with the same
+        episode_id; pass its original timestamp so both land in one month.
+        """
+        return self.append_many([episode], replace)[0]
+
+    def append_many(self, episodes, replace=False):
+        by_month = {}
+        ids = []
+        for episode in episodes:
+            episode = dict(episode)
+            episode.setdefault("timestamp", _now_iso())
+            ts = _parse_ts(episode["timestamp"]) or time.time()
+            stamp = datetime.fromtimestamp(ts)
+            month = stamp.strftime("%Y-%m")
+            # The id starts with the partition's date, so get() goes straight to it
+            episode.setdefault("episode_id", f"ep-{stamp:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}")
+            by_month.setdefault(month, []).append((episode, ts))
+            ids.append(episode["episode_id"])
+        for month, batch in by_month.items():
+            self._append_month(month, batch, replace)
+        return ids
+
+    def _append_month(self, month, batch, replace=False):
+        month_dir = self.root / month
+        month_dir.mkdir(exist_ok=True, mode=0o700)
+        with _DirLock(month_dir):
+            segments = self._manifest(month)
+            name = max(segments) if segments else None
+            for episode, ts in batch:
+                if replace:
+                    stale = self._locate(month, episode["episode_id"])
+                    if stale and stale[0] in segments:
+                        header = segments[stale[0]]
+                        header["superseded"] = header.get("superseded", 0) + 1
+                line = (json.dumps(episode, separators=(",", ":")) + "\n").encode()
+                if name is None or segments[name]["bytes"] + len(line) > self.segment_max_bytes:
+                    number = int(name[len(SEGMENT_PREFIX):]) + 1 if name else 1
+                    name = f"{SEGMENT_PREFIX}{number:04d}"
+                    segments[name] = {"count": 0, "bytes": 0, "first_ts": ts, "last_ts": ts}
+                offset = self._append_line(month_dir / f"{name}.jsonl", line)
+                self._append_line(month_dir / f"{name}.idx",
+                                  f"{episode['episode_id']}\t{offset}\t{len(line)}\t{ts:.3f}\n".encode())
+                header = segments[name]
+                header["count"] += 1
+                header["bytes"] = offset + len(line)
+                header["first_ts"] = min(header["first_ts"], ts)
+                header["last_ts"] = max(header["last_ts"], ts)
+            self._save_manifest(month, segments)
+
+    @staticmethod
+    def _append_line(path, line):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            offset = os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, line)
+            return offset
+        finally:
+            os.close(fd)
+
+    # -- reads -----------------------------------------------------------------
+
+    def _read_segment_lines(self, month, name):
+        """(offset, episode) for each complete line of a segment."""
+        try:
+            with open(self.root / month / f"{name}.jsonl", "rb") as f:
+                data = f.read()
+        except OSError:
+            return []
+        episodes, offset = [], 0
+        for raw in data.splitlines(keepends=True):
+            try:
+                episodes.append((offset, json.loads(raw)))
+            except ValueError:
+                pass  # torn write at the tail of an active segment
+            offset += len(raw)
+        return episodes
+
+    def _read_segment(self, month, name):
+        return [episode for _offset, episode in self._read_segment_lines(month, name)]
+
+    def _latest_versions(self, month):
+        """episode_id -> (segment, offset) of its newest version in a month."""
+        latest = {}
+        for idx_path in sorted((self.root / month).glob(f"{SEGMENT_PREFIX}*.idx")):
+            with open(idx_path) as idx:
+                for line in idx:
+                    eid, offset, _length, _ts = line.rstrip("\n").split("\t")
+                    latest[eid] = (idx_path.stem, int(offset))
+        return latest
+
+    def _locate(self, month, episode_id):
+        """(segment, offset, length) of an episode's newest version in a month, or None."""
+        for idx_path in sorted((self.root / month).glob(f"{SEGMENT_PREFIX}*.idx"), reverse=True):
+            found = None
+            with open(idx_path) as idx:
+                for line in idx:
+                    eid, offset, length, _ts = line.rstrip("\n").split("\t")
+                    if eid == episode_id:
+                        found = (idx_path.stem, int(offset), int(length))
+            if found:
+                return found
+        return None
+
+    def _month_episodes(self, month, since):
+        """A month's segment episodes, newest first, one (the newest) version per id."""
+        segments = self._manifest(month)
+        seen = set()
+        for name in sorted(segments, reverse=True):
+            if since is not None and segments[name]["last_ts"] < since:
+                continue
+            for _offset, episode in reversed(self._read_segment_lines(month, name)):
+                episode_id = episode.get("episode_id")
+                if episode_id in seen:
+                    continue
+                if episode_id is not None:
+                    seen.add(episode_id)
+                if since is None or _is_since(episode, since):
+                    yield episode
+
+    def iter_episodes(self, since=None, newest_first=True):
+        """Episodes (dicts) from `since` (epoch) on; older segments are not read."""
+        for month in self.months(newest_first):
+            episodes = self._month_episodes(month, since)
+            yield from (episodes if newest_first else reversed(list(episodes)))
+            for path in self._legacy_files(month):
+                episode = _load_json(path, None)
+                if isinstance(episode, dict) and (since is None or _is_since(episode, since)):
+                    yield episode
+
+    def get(self, episode_id):
+        """One episode via the offset index (no segment scan).
+
+        Only the month encoded in the id is searched; ids that do not encode
+        one (or whose month does not have them) fall back to every month.
+        """
+        match = re.match(r"ep-(\d{4})(\d{2})\d{8}-", episode_id)
+        months = self.months(newest_first=True)
+        if match and f"{match[1]}-{match[2]}" in months:
+            home = f"{match[1]}-{match[2]}"
+            months = [home] + [m for m in months if m != home]
+        for month in months:
+            found = self._locate(month, episode_id)
+            if found:
+                name, offset, length = found
+                with open(self.root / month / f"{name}.jsonl", "rb") as seg:
+                    seg.seek(offset)
+                    try:
+                        return json.loads(seg.read(length))
+                    except ValueError:
+                        return None
+            legacy = self.root / month / f"{episode_id}.json"
+            if legacy.exists():
+                return _load_json(legacy, None)
+        return None
+
+    def search(self, query, limit=10, since=None):
+        query_terms = terms(query)
+        if not query_terms:
+            return []
+        scored = []
+        for n, episode in enumerate(self.iter_episodes(since=since)):
+            score = _score(query_terms, episode.get("task"), episode.get("context"),
+                           " ".join(map(str, episode.get("tags") or [])),
+                           " ".join(map(str, episode.get("learnings") or [])))
+            if score:
+                # newest first on equal scores: n grows as episodes get older
+                scored.append((score, -n, episode))
+        return [dict(e, score=s) for s, _n, e in heapq.nlargest(limit, scored, key=lambda x: x[:2])]
+
+    def stats(self):
+        """Counts and time range from segment headers; legacy files are only listed."""
+        count = size = segments = legacy = 0
+        first = last = None
+        for month in self.months():
+            for header in self._manifest(month).values():
+                segments += 1
+                count += header["count"] - header.get("superseded", 0)
+                size += header["bytes"]
+                first = header["first_ts"] if first is None else min(first, header["first_ts"])
+                last = header["last_ts"] if last is None else max(last, header["last_ts"])
+            legacy += len(self._legacy_files(month))
+
+        def iso(ts):
+            return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if ts else None
+
+        return {"episodes": count + legacy, "segments": segments, "segment_bytes": size,
+                "legacy_files": legacy, "oldest": iso(first), "newest": iso(last)}
+
+    # -- compaction ------------------------------------------------------------
+
+    def compact(self, ttl_days, now=None):
+        """Drop expired episodes and fold legacy files into segments."""
+        now = now or time.time()
+        cutoff = now - ttl_days * 86400
+        result = {"expired": 0, "superseded": 0, "segments_deleted": 0,
+                  "segments_rewritten": 0, "migrated": 0}
+        for month in self.months():
+            month_dir = self.root / month
+            with _DirLock(month_dir):
+                segments = self._manifest(month)
+                stale = any(h.get("superseded") for h in segments.values())
+                latest = self._latest_versions(month) if stale else None
+                for name in sorted(segments):
+                    header = segments[name]
+                    superseded = header.get("superseded", 0)
+                    if header["last_ts"] < cutoff:
+                        result["expired"] += header["count"] - superseded
+                        result["superseded"] += superseded
+                        result["segments_deleted"] += 1
+                        self._remove_segment(month_dir, name)
+                        del segments[name]
+                    elif header["first_ts"] < cutoff or superseded:
+                        kept = self._rewrite_segment(month_dir, name, cutoff, latest)
+                        result["expired"] += header["count"] - superseded - len(kept)
+                        result["superseded"] += superseded
+                        result["segments_rewritten"] += 1
+                        if kept:
+                            segments[name] = {
+                                "count": len(kept),
+                                "bytes": (month_dir / f"{name}.jsonl").stat().st_size,
+                                "first_ts": min(ts for _e, ts in kept),
+                                "last_ts": max(ts for _e, ts in kept),
+                            }
+                        else:
+                            self._remove_segment(month_dir, name)
+                            del segments[name]
+                self._save_manifest(month, segments)
+
+            migrate = []
+            for path in self._legacy_files(month):
+                try:
+                    if now - os.stat(path).st_mtime < LEGACY_GRACE_SECONDS:
+                        continue
+                except OSError:
+                    continue
+                episode = _load_json(path, None)
+                ts = _parse_ts(episode.get("timestamp")) if isinstance(episode, dict) else None
+                if ts is not None and ts >= cutoff:
+                    migrate.append((path, episode))
+                else:
+                    result["expired"] += 1
+                    os.unlink(path)
+            if migrate:
+                self.append_many(e for _p, e in migrate)
+                for path, _e in migrate:
+                    os.unlink(path)
+                result["migrated"] += len(migrate)
+
+            remaining = [e.name for e in os.scandir(month_dir) if e.name != ".lock"]
+            if remaining in ([], [MANIFEST_NAME]) and month != datetime.now().strftime("%Y-%m"):
+                for name in (MANIFEST_NAME, ".lock"):
+                    try:
+                        (month_dir / name).unlink()
+                    except FileNotFoundError:
+                        pass
+                try:
+                    month_dir.rmdir()
+                except OSError:
+                    pass
+        (self.root / COMPACT_STAMP).touch()
+        return result
+
+    @staticmethod
+    def _remove_segment(month_dir, name):
+        for suffix in (".jsonl", ".idx"):
+            try:
+                (month_dir / f"{name}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+    def _rewrite_segment(self, month_dir, name, cutoff, latest=None):
+        """Rewrite a segment (and its index) keeping episodes at/after cutoff.
+
+        With `latest` (see _latest_versions) superseded versions are dropped too.
+        """
+        kept = []
+        for offset, episode in self._read_segment_lines(month_dir.name, name):
+            episode_id = episode.get("episode_id", "")
+            if latest and latest.get(episode_id, (name, offset)) != (name, offset):
+                continue
+            ts = _parse_ts(episode.get("timestamp"))
+            if ts is not None and ts >= cutoff:
+                kept.append((episode, ts))
+        if not kept:
+            return kept
+        body, index, offset = [], [], 0
+        for episode, ts in kept:
+            line = (json.dumps(episode, separators=(",", ":")) + "\n").encode()
+            body.append(line)
+            index.append(f"{episode.get('episode_id', '')}\t{offset}\t{len(line)}\t{ts:.3f}\n")
+            offset += len(line)
+        for suffix, data in ((".jsonl", b"".join(body)), (".idx", "".join(index).encode())):
+            fd, tmp = tempfile.mkstemp(dir=str(month_dir), prefix=f".{name}-", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, month_dir / f"{name}{suffix}")
+        return kept
+
+    def compaction_due(self, interval_hours):
+        try:
+            age = time.time() - (self.root / COMPACT_STAMP).stat().st_mtime
+        except FileNotFoundError:
+            return True
+        return age >= interval_hours * 3600
+
+
+# =============================================================================
+# Memory manager
+# =============================================================================
+
+class MemoryManager:
+    """Facade over the three memory types, as used by the CLI and hooks."""
+
+    def __init__(self, config=None, episodes_dir=None, semantic_file=None, procedural_file=None):
+        self.config = config or load_config()
+        self.episodes = EpisodicStore(episodes_dir,
+                                      self.config["episodic"].get("segment_max_bytes"))
+        self.semantic_file = Path(semantic_file) if semantic_file else SEMANTIC_FILE
+        self.procedural_file = Path(procedural_file) if procedural_file else PROCEDURAL_FILE
+        self.procedural_file.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+
+    # -- semantic --------------------------------------------------------------
+
+    def _facts(self):
+        data = _load_json(self.semantic_file, {})
+        facts = data.get("facts") if isinstance(data, dict) else None
+        return facts if isinstance(facts, list) else []
+
+    def write_semantic(self, content, category="general", importance=5, tags=None):
+        fact = {
+            "fact_id": f"sem-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}",
+            "content": content,
+            "category": category,
+            "importance": max(1, min(10, int(importance))),
+            "tags": list(tags or []),
+            "created": _now_iso(),
+        }
+        self.semantic_file.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        with _DirLock(self.semantic_file.parent):
+            facts = self._facts() + [fact]
+            limit = int(self.config["semantic"].get("max_facts", 1000))
+            if len(facts) > limit:
+                # keep the most important; newest first among equals
+                facts = sorted(facts, key=lambda f: (f.get("importance", 5), f.get("created", "")),
+                               reverse=True)[:limit]
+            _write_json_atomic(self.semantic_file, {"facts": facts})
+        vectors = vector_index()
+        if vectors:
+            vectors.feed(f"semantic:{fact['fact_id']}", content, "semantic",
+                         title=content[:200])
+        return fact
+
+    # -- episodic --------------------------------------------------------------
+
+    def write_episode(self, episode, replace=False):
+        episode_id = self.episodes.append(episode, replace)
+        vectors = vector_index()
+        if vectors:
+            text = "\n".join([str(episode.get("task", "")), str(episode.get("context", ""))]
+                             + [str(x) for x in episode.get("learnings") or []])
+            vectors.feed(f"episode:{episode_id}", text, "episode",
+                         session_id=episode.get("session_id"), project=episode.get("project"),
+                         title=str(episode.get("task", ""))[:200])
+        self.schedule_compaction()
+        return episode_id
+
+    def _episodic_since(self):
+        return time.time() - float(self.config["episodic"].get("ttl_days", 30)) * 86400
+
+    def schedule_compaction(self):
+        """Start `compact` detached when it is due; never waits for it."""
+        lifecycle = self.config.get("lifecycle", {})
+        if not lifecycle.get("auto_compact", True):
+            return False
+        if not self.episodes.compaction_due(float(lifecycle.get("compact_interval_hours", 24))):
+            return False
+        (self.episodes.root / COMPACT_STAMP).touch()  # claim it before spawning
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "compact", "--quiet",
+             "--episodes-dir", str(self.episodes.root)],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        return True
+
+    def compact(self):
+        return self.episodes.compact(float(self.config["episodic"].get("ttl_days", 30)))
+
+    # -- procedural ------------------------------------------------------------
+
+    def rules(self):
+        data = _load_json(self.procedural_file, {})
+        rules = data.get("rules") if isinstance(data, dict) else None
+        return [r for r in rules if isinstance(r, dict)] if isinstance(rules, list) else []
+
+    # -- queries ---------------------------------------------------------------
+
+    def search(self, query, limit=10):
+        query_terms = terms(query)
+        semantic = sorted(
+            (dict(f, score=s) for f in self._facts()
+             if (s := _score(query_terms, f.get("content"), f.get("category"),
+                             " ".join(map(str, f.get("tags") or []))))),
+            key=lambda f: (f["score"], f.get("importance", 5)), reverse=True,
+        )[:limit]
+        procedural = sorted(
+            (dict(r, score=s) for r in self.rules()
+             if (s := _score(query_terms, r.get("trigger"), r.get("behavior")))),
+            key=lambda r: (r["score"], r.get("confidence", 0)), reverse=True,
+        )[:limit]
+        episodic = self.episodes.search(query, limit, since=self._episodic_since())
+        return {"query": query, "semantic": semantic, "episodic": episodic,
+                "procedural": procedural}
+
+    def context(self, task, limit=5):
+        """Markdown block of memory relevant to a task, for prompt injection."""
+        found = self.search(task, limit)
+        min_conf = float(self.config["procedural"].get("min_confidence", 0.8))
+        rules = [r for r in found["procedural"] if float(r.get("confidence", 0)) >= min_conf]
+        lines = []
+        if found["semantic"]:
+            lines.append("## Known facts")
+            lines += [f"- {f.get('content', '')}" for f in found["semantic"]]
+        if found["episodic"]:
+            lines.append("## Past experiences")
+            for e in found["episodic"]:
+                outcome = "succeeded" if e.get("success", True) else "failed"
+                lines.append(f"- {e.get('task', '')} ({outcome})")
+                lines += [f"  - {l}" for l in (e.get("learnings") or [])[:3]]
+        if rules:
+            lines.append("## Learned rules")
+            lines += [f"- When {r.get('trigger', '')}: {r.get('behavior', '')} "
+                      f"(confidence {float(r.get('confidence', 0)):.2f})" for r in rules]
+        return "\n".join(lines)
+
+    def stats(self):
+        episodic = self.episodes.stats()
+        return {
+            "semantic_count": len(self._facts()),
+            "episodic_count": episodic["episodes"],
+            "procedural_count": len(self.rules()),
+            "episodic": episodic,
+            "ttl_days": self.config["episodic"].get("ttl_days"),
+        }
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def _tags(value):
+    return [t.strip() for t in (value or "").split(",") if t.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ralph memory: semantic facts, episodic experiences, procedural rules"
+    )
+    parser.add_argument("--episodes-dir", help=argparse.SUPPRESS)
+    sub = parser.add_subparsers(dest="command")
+
+    p_write = sub.add_parser("write", help="Store a memory")
+    p_write.add_argument("type", choices=["semantic", "episodic"])
+    p_write.add_argument("--content", help="Fact text (semantic)")
+    p_write.add_argument("--category", default="general")
+    p_write.add_argument("--importance", type=int, default=5)
+    p_write.add_argument("--tags", help="Comma-separated tags")
+    p_write.add_argument("--task", help="What was attempted (episodic)")
+    p_write.add_argument("--context", default="")
+    p_write.add_argument("--failure", action="store_true", help="Episode did not succeed")
+    p_write.add_argument("--learning", action="append", dest="learnings")
+    p_write.add_argument("--session")
+    p_write.add_argument("--project")
+
+    p_search = sub.add_parser("search", help="Search all memory types (JSON)")
+    p_search.add_argument("query", nargs="+")
+    p_search.add_argument("--limit", type=int, default=10)
+
+    p_context = sub.add_parser("context", help="Relevant memory for a task (markdown)")
+    p_context.add_argument("task", nargs="+")
+    p_context.add_argument("--limit", type=int, default=5)
+
+    p_get = sub.add_parser("get", help="Show one episode (JSON)")
+    p_get.add_argument("episode_id")
+
+    sub.add_parser("stats", help="Memory counts (JSON)")
+
+    p_compact = sub.add_parser("compact", help="Enforce episodic TTL and migrate legacy files")
+    p_compact.add_argument("--quiet", action="store_true")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    manager = MemoryManager(episodes_dir=args.episodes_dir)
+    return _run(args, manager)
+
+
+def _run(args, manager):
+    if args.command == "write":
+        if args.type == "semantic":
+            if not args.content:
+                print("write semantic requires --content", file=sys.stderr)
+                return 2
+            fact = manager.write_semantic(args.content, args.category, args.importance,
+                                          _tags(args.tags))
+            print(json.dumps({"success": True, "fact_id": fact["fact_id"]}))
+        else:
+            if not args.task:
+                print("write episodic requires --task", file=sys.stderr)
+                return 2
+            episode = {"task": args.task, "context": args.context, "success": not args.failure,
+                       "tags": _tags(args.tags), "learnings": args.learnings or []}
+            if args.session:
+                episode["session_id"] = args.session
+            if args.project:
+                episode["project"] = args.project
+            print(json.dumps({"success": True, "episode_id": manager.write_episode(episode)}))
+    elif args.command == "search":
+        print(json.dumps(manager.search(" ".join(args.query), args.limit), indent=2))
+    elif args.command == "context":
+        print(manager.context(" ".join(args.task), args.limit))
+    elif args.command == "get":
+        episode = manager.episodes.get(args.episode_id)
+        if episode is None:
+            print(f"Episode not found: {args.episode_id}", file=sys.stderr)
+            return 1
+        print(json.dumps(episode, indent=2))
+    elif args.command == "stats":
+        manager.schedule_compaction()
+        print(json.dumps(manager.stats(), indent=2))
+    elif args.command == "compact":
+        result = manager.compact()
+        if not args.quiet:
+            print(json.dumps(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+"""
+Plan Drift Engine (v2.50) - Incremental drift detection for plan-state steps.
+
+Drift used to be recomputed per hook call by re-reading the specs and every
+file they name. This engine keeps an index in .claude/plan-drift.json:
+
+    files      path -> owning steps, stat stamp, content hash and the file's
+               exported interface {symbol: normalized declaration}
+    baselines  step -> {path: interface} captured when the step completed;
+               the contract downstream steps were specified against
+    drift      step -> {path: [items]} for the step's own files
+
+A step declares `file` (or a `files` list), optionally
+`symbols` it promises to provide, and `depends_on` step ids. On a
+PostToolUse Edit/Write, `hook` looks the edited path up in the index: files
+no step declared cost one dict lookup. For a declared file it re-stats,
+re-hashes and re-extracts that one file, compares the interface with the
+owning steps' baselines (removed or changed exports, declared symbols gone;
+new exports and body-only edits are not drift), then propagates through the
+reverse dependency graph: every transitive dependent of a drifted step -
+plus any step that names a changed symbol in `symbols` - is flagged
+`drift.needs_patch` with the upstream items. Only steps whose drift changed
+are written, as plan-state.py `update` records (append-only).
+
+Interfaces are extracted with per-language declaration patterns (Python,
+TypeScript/JavaScript, Go, Rust, Solidity, shell); other files are
+fingerprinted by content hash alone.
+
+Usage:
+    plan-drift.py baseline [--step ID]     # snapshot completed steps' interfaces
+    plan-drift.py check FILE...            # re-fingerprint FILEs, propagate drift
+    plan-drift.py scan                     # re-stat every declared file
+    plan-drift.py hook                     # PostToolUse JSON on stdin
+    plan-drift.py report [--json]          # drifted steps + downstream specs to patch
+
+All commands take --dir DIR (default: ./.claude).
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+INDEX_FILE = "plan-drift.json"
+INDEX_VERSION = 1
+LOCK_FILE = ".plan-drift.lock"
+MAX_FILE_BYTES = 2 * 1024 * 1024
+MAX_ITEMS = 20
+BASELINE_STATUSES = ("completed", "verified")
+WATCHED_TOOLS = ("Edit", "Write", "MultiEdit", "NotebookEdit")
+
+# (extensions, declaration pattern, exported(name, match) predicate)
+# Each pattern's group "name" is the symbol; the whole match, whitespace
+# collapsed, is its declaration ("signature").
+INTERFACE_PATTERNS = [
+    ((".py",),
+     re.compile(r"^(?:async\s+)?(?:def|class)\s+(?P<name>[A-Za-z_]\w*)\s*(?:\([^)]*\))?[^:\n]*:", re.M),
+     lambda name, m: not name.startswith("_")),
+    ((".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs"),
+     re.compile(r"^export\s+(?:default\s+)?(?:declare\s+)?(?:async\s+)?"
+                r"(?:function\*?|class|const|let|var|interface|type|enum|abstract\s+class)\s+"
+                r"(?P<name>[A-Za-z_$][\w$]*)[^\n{=;]*", re.M),
+     lambda name, m: True),
+    ((".go",),
+     re.compile(r"^(?:func(?:\s+\([^)]*\))?|type|var|const)\s+(?P<name>[A-Za-z_]\w*)[^\n{]*", re.M),
+     lambda name, m: name[:1].isupper()),
+    ((".rs",),
+     re.compile(r"^\s*pub(?:\([^)]*\))?\s+(?:async\s+)?(?:unsafe\s+)?"
+                r"(?:fn|struct|enum|trait|type|const|static|mod)\s+(?P<name>[A-Za-z_]\w*)[^\n{;]*", re.M),
+     lambda name, m: True),
+    ((".sol",),
+     re.compile(r"^\s*(?:function\s+(?P<name>[A-Za-z_]\w*)\s*\([^)]*\)[^{;\n]*|"
+                r"(?:contract|interface|library|event|struct)\s+(?P<type>[A-Za-z_]\w*)[^{;\n]*)", re.M),
+     lambda name, m: bool(m.group("type")) or not re.search(r"\b(?:private|internal)\b", m.group(0))),
+    ((".sh", ".bash"),
+     re.compile(r"^(?:function\s+)?(?P<name>[A-Za-z_][\w-]*)\s*\(\)", re.M),
+     lambda name, m: True),
+]
+
+
+def _warn(message):
+    print(f"plan-drift: {message}", file=sys.stderr)
+
+
+def plan_state_module():
+    """The plan-state.py module next to this script."""
+    return load_sibling(__file__, "plan-state.py")
+
+
+def interface(path, text):
+    """{symbol: declaration} of what `path` exports; {} for unknown languages."""
+    suffix = Path(path).suffix.lower()
+    for extensions, pattern, exported in INTERFACE_PATTERNS:
+        if suffix not in extensions:
+            continue
+        symbols = {}
+        for m in pattern.finditer(text):
+            name = m.groupdict().get("name") or m.groupdict().get("type")
+            if name and exported(name, m):
+                symbols[name] = " ".join(m.group(0).split())
+        return symbols
+    return {}
+
+
+def fingerprint(path):
+    """{stamp, hash, exports} of a file, or None when it does not exist."""
+    try:
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            data = f.read(MAX_FILE_BYTES + 1)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    text = data[:MAX_FILE_BYTES].decode("utf-8", errors="replace")
+    return {
+        "stamp": [st.st_mtime_ns, st.st_size],
+        "hash": hashlib.sha256(data).hexdigest()[:16],
+        "exports": interface(path, text),
+    }
+
+
+def step_files(step):
+    return plan_state_module().step_files(step)
+
+
+def compare(baseline, current, declared):
+    """Drift items for one file: the baseline interface against the current one."""
+    if current is None:
+        return ["file deleted"]
+    items = []
+    now = current["exports"]
+    for name, decl in sorted(baseline.get("exports", {}).items()):
+        if name not in now:
+            items.append(f"export removed: {name}")
+        elif now[name] != decl:
+            items.append(f"signature changed: {name}: {decl} -> {now[name]}")
+    for name in declared:
+        if name in baseline.get("exports", {}) or name in now:
+            continue
+        if baseline.get("exports") or now:
+            items.append(f"declared symbol missing: {name}")
+    return items[:MAX_ITEMS]
+
+
+class DriftEngine:
+    """Drift index of one project (.claude/plan-drift.json) over its plan-state."""
+
+    def __init__(self, directory=None):
+        self.dir = Path(directory) if directory else Path.cwd() / ".claude"
+        self.root = self.dir.parent
+        self.index_file = self.dir / INDEX_FILE
+        self.plan_state = plan_state_module().PlanState(self.dir)
+
+    # -- index -------------------------------------------------------------------
+
+    def _load_index(self):
+        try:
+            with open(self.index_file, encoding="utf-8") as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                return index
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {"version": INDEX_VERSION, "plan_id": None, "files": {}, "baselines": {}, "drift": {}}
+
+    def _save_index(self, index):
+        # Paths stay unescaped UTF-8 so the hook's substring test sees them
+        # exactly as they arrive in the PostToolUse payload
+        plan_state_module()._write_atomic(
+            self.index_file, json.dumps(index, separators=(",", ":"), ensure_ascii=False)
+        )
+
+    def _locked(self):
+        fd = os.open(self.dir / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return fd
+
+    def _sync_plan(self, index, plan):
+        """Re-derive file ownership from the plan; reset the index for a new plan."""
+        if index.get("plan_id") != plan.get("plan_id"):
+            index.update(plan_id=plan.get("plan_id"), files={}, baselines={}, drift={})
+        owners = {}
+        for step in plan.get("steps") or []:
+            for path in step_files(step):
+                owners.setdefault(path, []).append(step["id"])
+        files = index["files"]
+        for path in list(files):
+            if path not in owners:
+                del files[path]
+        for path, ids in owners.items():
+            files.setdefault(path, {})["owners"] = ids
+
+    def relpath(self, path):
+        """Project-relative path of `path`, or None when it is outside the project."""
+        absolute = os.path.abspath(path if os.path.isabs(path) else self.root / path)
+        rel = os.path.relpath(absolute, os.path.abspath(self.root))
+        return None if rel.startswith("..") else os.path.normpath(rel)
+
+    def _refresh(self, index, path):
+        """Re-fingerprint one file if its stat stamp moved. True when it changed."""
+        entry = index["files"][path]
+        try:
+            st = os.stat(self.root / path)
+            stamp = [st.st_mtime_ns, st.st_size]
+        except OSError:
+            stamp = None
+        if "stamp" in entry and entry["stamp"] == stamp:
+            return False
+        fp = fingerprint(self.root / path)
+        changed = (fp or {}).get("hash") != entry.get("hash")
+        entry.update(fp or {"stamp": None, "hash": None, "exports": {}})
+        return changed
+
+    # -- operations --------------------------------------------------------------
+
+    def baseline(self, step_id=None):
+        """Snapshot the interface of completed steps (or one step) as their contract."""
+        plan = self.plan_state._require_plan()
+        fd = self._locked()
+        try:
+            index = self._load_index()
+            self._sync_plan(index, plan)
+            baselined = set()
+            for step in plan.get("steps") or []:
+                if step_id is not None and step.get("id") != step_id:
+                    continue
+                if step_id is None and (step.get("status") not in BASELINE_STATUSES
+                                        or step["id"] in index["baselines"]):
+                    continue
+                contract = {}
+                for path in step_files(step):
+                    self._refresh(index, path)
+                    entry = index["files"][path]
+                    contract[path] = {"hash": entry.get("hash"), "exports": entry.get("exports", {})}
+                index["baselines"][step["id"]] = contract
+                index["drift"].pop(step["id"], None)
+                baselined.add(step["id"])
+            updates = self._propagate(index, plan, baselined) if baselined else {}
+            self._save_index(index)
+        finally:
+            os.close(fd)
+        self._publish(updates)
+        return len(baselined)
+
+    def check(self, paths, plan=None):
+        """Re-fingerprint the given files and propagate drift. Returns changed step drifts."""
+        plan = plan or self.plan_state.plan()
+        if not plan:
+            return {}
+        fd = self._locked()
+        try:
+            index = self._load_index()
+            self._sync_plan(index, plan)
+            steps = {s["id"]: s for s in plan.get("steps") or []}
+            touched = set()
+            for path in paths:
+                if path not in index["files"] or not self._refresh(index, path):
+                    continue
+                for owner in index["files"][path]["owners"]:
+                    contract = index["baselines"].get(owner)
+                    if contract is None or path not in contract:
+                        continue
+                    items = compare(contract[path], self._current(index, path),
+                                    steps.get(owner, {}).get("symbols") or [])
+                    step_drift = index["drift"].setdefault(owner, {})
+                    if items:
+                        step_drift[path] = items
+                    else:
+                        step_drift.pop(path, None)
+                    touched.add(owner)
+            updates = self._propagate(index, plan, touched) if touched else {}
+            self._save_index(index)
+        finally:
+            os.close(fd)
+        self._publish(updates)
+        return updates
+
+    def scan(self):
+        """Re-stat every declared file; only files whose stamp moved are re-read.
+
+        Steps completed without `baseline` (e.g. by an older hook) are
+        baselined first.
+        """
+        plan = self.plan_state.plan()
+        if not plan:
+            return {}
+        self.baseline()
+        plan = self.plan_state.plan()
+        paths = {p for s in plan.get("steps") or [] for p in step_files(s)}
+        return self.check(sorted(paths), plan)
+
+    def _current(self, index, path):
+        entry = index["files"][path]
+        return None if entry.get("hash") is None else entry
+
+    def _propagate(self, index, plan, touched):
+        """Recompute drift objects for touched steps and their dependents.
+
+        Returns {step_id: drift} for steps whose drift in the plan changed.
+        """
+        steps = {s["id"]: s for s in plan.get("steps") or []}
+        dependents = {}
+        for step in steps.values():
+            for dep in step.get("depends_on") or []:
+                dependents.setdefault(dep, []).append(step["id"])
+
+        affected = set(touched)
+        stack = list(touched)
+        while stack:
+            for child in dependents.get(stack.pop(), []):
+                if child not in affected:
+                    affected.add(child)
+                    stack.append(child)
+        # Steps naming a symbol of a drifted file consume it directly
+        changed_symbols = {}
+        for owner, files in index["drift"].items():
+            for items in files.values():
+                for item in items:
+                    m = re.match(r"(?:export removed|signature changed|declared symbol missing): (\w+)", item)
+                    if m:
+                        changed_symbols.setdefault(m.group(1), set()).add(owner)
+        for step in steps.values():
+            published = step.get("drift") or {}
+            if set(step.get("symbols") or []) & set(changed_symbols) \
+                    or set(published.get("upstream") or []) & affected:
+                affected.add(step["id"])
+
+        # Upstream items reach every transitive dependent
+        ancestors = {}
+
+        def upstream(step_id, seen=()):
+            if step_id not in ancestors:
+                result = set()
+                for dep in steps.get(step_id, {}).get("depends_on") or []:
+                    if dep in steps and dep not in seen:
+                        result |= {dep} | upstream(dep, seen + (step_id,))
+                ancestors[step_id] = result
+            return ancestors[step_id]
+
+        updates = {}
+        for step_id in sorted(affected):
+            if step_id not in steps:
+                continue
+            own = [f"{path}: {item}" for path, items in sorted(index["drift"].get(step_id, {}).items())
+                   for item in items]
+            sources = {a for a in upstream(step_id) if index["drift"].get(a)}
+            for name, owners in changed_symbols.items():
+                if name in (steps[step_id].get("symbols") or []):
+                    sources |= owners - {step_id}
+            inherited = [f"upstream {src}: {path}: {item}" for src in sorted(sources)
+                         for path, items in sorted(index["drift"][src].items()) for item in items]
+            drift = {"detected": bool(own or inherited), "items": (own + inherited)[:MAX_ITEMS]}
+            if sources:
+                drift["needs_patch"] = True
+                drift["upstream"] = sorted(sources)
+            if (steps[step_id].get("drift") or {"detected": False, "items": []}) != drift:
+                updates[step_id] = drift
+        return updates
+
+    def _publish(self, updates):
+        for step_id, drift in updates.items():
+            self.plan_state.update({"drift": drift}, step_id)
+
+    def report(self):
+        plan = self.plan_state._require_plan()
+        drifted, downstream = [], []
+        for step in plan.get("steps") or []:
+            drift = step.get("drift") or {}
+            if not drift.get("detected"):
+                continue
+            entry = {"id": step["id"], "title": step.get("title"), "items": drift.get("items", [])}
+            if drift.get("needs_patch"):
+                downstream.append({**entry, "upstream": drift.get("upstream", [])})
+            else:
+                drifted.append(entry)
+        return {"drifted": drifted, "needs_patch": downstream}
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def hook(engine, payload):
+    """PostToolUse: re-check the edited file. Returns the hook JSON output."""
+    tool_input = payload.get("tool_input") or {}
+    path = tool_input.get("file_path") or tool_input.get("notebook_path")
+    if payload.get("tool_name") not in WATCHED_TOOLS or not isinstance(path, str):
+        return {"decision": "continue"}
+    rel = engine.relpath(path)
+    index = engine._load_index()
+    if rel is None or rel not in index["files"]:
+        return {"decision": "continue"}
+    updates = engine.check([rel])
+    patch = sorted(s for s, d in updates.items() if d.get("needs_patch"))
+    own = sorted(s for s, d in updates.items() if d["detected"] and not d.get("needs_patch"))
+    if not own and not patch:
+        return {"decision": "continue"}
+    message = f"Plan drift: {rel} changed the interface of step(s) {', '.join(own) or '-'}"
+    if patch:
+        message += f"; downstream spec(s) to patch: {', '.join(patch)} (ralph plan sync)"
+    return {"decision": "continue",
+            "hookSpecificOutput": {"hookEventName": "PostToolUse", "additionalContext": message}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental drift detection for plan-state steps")
+    parser.add_argument("--dir", help="Plan directory (default: ./.claude)")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("baseline", help="Snapshot completed steps' interfaces").add_argument("--step")
+    sub.add_parser("check", help="Re-fingerprint files and propagate drift").add_argument("files", nargs="+")
+    sub.add_parser("scan", help="Re-check every declared file")
+    sub.add_parser("hook", help="PostToolUse hook (JSON on stdin)")
+    sub.add_parser("report", help="Drifted steps and downstream specs").add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    engine = DriftEngine(args.dir)
+    if args.command == "hook":
+        try:
+            payload = json.loads(sys.stdin.read(1024 * 1024) or "{}")
+            output = hook(engine, payload) if isinstance(payload, dict) else {"decision": "continue"}
+        except Exception as e:  # a drift check must never break the edit
+            _warn(str(e))
+            output = {"decision": "continue"}
+        print(json.dumps(output))
+        return 0
+
+    try:
+        if args.command == "baseline":
+            print(f"{engine.baseline(args.step)} step(s) baselined")
+        elif args.command in ("check", "scan"):
+            paths = [p for p in (engine.relpath(f) for f in args.files) if p] \
+                if args.command == "check" else None
+            updates = engine.check(paths) if paths is not None else engine.scan()
+            print(json.dumps(updates, indent=2))
+        elif args.command == "report":
+            result = engine.report()
+            if args.json:
+                print(json.dumps(result, indent=2))
+            else:
+                for entry in result["drifted"]:
+                    print(f"  • {entry['id']}: {len(entry['items'])} drift items")
+                    for item in entry["items"]:
+                        print(f"      {item}")
+                for entry in result["needs_patch"]:
+                    print(f"  • {entry['id']} ({entry['title']}): patch spec - "
+                          f"upstream {', '.join(entry['upstream'])}")
+    except plan_state_module().PlanStateError as e:
+        _warn(str(e))
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
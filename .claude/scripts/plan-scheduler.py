@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Plan Scheduler (v2.50) - Run plan-state steps as a dependency DAG.
+
+`ralph plan start/complete/verify` walks the plan one step at a time even
+when the classifier routed the task PARALLEL_CHUNKS. `plan-scheduler.py run`
+treats the plan as a DAG instead:
+
+    depends_on   step ids that must be completed/verified first
+    file, files  paths the step owns; two steps whose sets overlap never run
+                 at the same time. A step that declares no files owns the
+                 whole tree and runs alone.
+
+Up to --jobs ready steps run at once, longest remaining dependency chain
+first (list scheduling on the critical path), so wall-clock time tracks the
+DAG's critical path rather than its step count. Every transition goes
+through plan-state.py (in_progress, completed, failed: append-only
+records), and a completed step is baselined for the drift engine.
+
+Workers:
+    default      `codex exec --full-auto -C WORKDIR PROMPT` per step
+    --worker CMD a shell command run per step; the step reaches it only
+                 through the environment (never interpolated into CMD):
+                 RALPH_STEP_ID, RALPH_STEP_TITLE, RALPH_STEP_DESCRIPTION,
+                 RALPH_STEP_FILES (one per line), RALPH_STEP_PROMPT,
+                 RALPH_STEP_WORKDIR, RALPH_PLAN_DIR
+    --worktrees  each step runs in its own git worktree branched from the
+                 current HEAD (which already holds its dependencies' work);
+                 on success the worktree is committed and merged back
+                 (--no-ff), serialized in the scheduler. A merge conflict
+                 fails the step.
+
+A failed step is retried up to --retries times. After that it is marked
+failed, its transitive dependents are set aside (`blocked_by`, left
+pending for the next run) and the rest of the DAG is re-planned around it.
+A later `run` picks up pending, failed and interrupted (in_progress) steps.
+
+Usage:
+    plan-scheduler.py run [--jobs N] [--worker CMD] [--worktrees]
+                          [--retries N] [--timeout S] [--dry-run] [--json]
+
+All commands take --dir DIR (default: ./.claude).
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+RUNS_DIR = Path.home() / ".ralph" / "plans" / "runs"
+DONE_STATUSES = ("completed", "verified", "skipped")
+MAX_JOBS = 64
+DEFAULT_TIMEOUT = 3600
+TIMEOUT_EXIT = 124
+
+
+def plan_state_module():
+    """The plan-state.py module next to this script."""
+    return load_sibling(__file__, "plan-state.py")
+
+
+def drift_engine(directory):
+    """plan-drift.py's engine for `directory`, or None when it is not installed."""
+    if not Path(__file__).resolve().with_name("plan-drift.py").exists():
+        return None
+    return load_sibling(__file__, "plan-drift.py").DriftEngine(directory)
+
+
+# =============================================================================
+# DAG
+# =============================================================================
+
+def build_graph(plan):
+    """{id: step} in plan order; raises PlanStateError on unknown deps or cycles."""
+    error = plan_state_module().PlanStateError
+    steps = {s["id"]: s for s in plan.get("steps") or [] if isinstance(s, dict) and s.get("id")}
+    for step in steps.values():
+        for dep in step.get("depends_on") or []:
+            if dep not in steps:
+                raise error(f"Step {step['id']} depends on unknown step {dep}")
+    state = {}
+
+    def visit(step_id, path):
+        if state.get(step_id) == "done":
+            return
+        if state.get(step_id) == "visiting":
+            cycle = path[path.index(step_id):] + [step_id]
+            raise error(f"Dependency cycle: {' -> '.join(cycle)}")
+        state[step_id] = "visiting"
+        for dep in steps[step_id].get("depends_on") or []:
+            visit(dep, path + [step_id])
+        state[step_id] = "done"
+
+    for step_id in steps:
+        visit(step_id, [])
+    return steps
+
+
+def chain_lengths(steps, ids):
+    """Longest chain of not-yet-done steps from each step to a sink (itself included)."""
+    dependents = {}
+    for step in steps.values():
+        for dep in step.get("depends_on") or []:
+            dependents.setdefault(dep, []).append(step["id"])
+    lengths = {}
+
+    def length(step_id):
+        if step_id not in lengths:
+            lengths[step_id] = 1 + max((length(c) for c in dependents.get(step_id, []) if c in ids),
+                                       default=0)
+        return lengths[step_id]
+
+    for step_id in ids:
+        length(step_id)
+    return lengths
+
+
+def critical_path(steps, ids):
+    lengths = chain_lengths(steps, ids)
+    dependents = {}
+    for step in steps.values():
+        for dep in step.get("depends_on") or []:
+            if step["id"] in ids:
+                dependents.setdefault(dep, []).append(step["id"])
+    roots = [i for i in steps if i in ids and not any(d in ids for d in steps[i].get("depends_on") or [])]
+    path, current = [], max(roots, key=lambda i: lengths[i], default=None)
+    while current is not None:
+        path.append(current)
+        current = max(dependents.get(current, []), key=lambda i: lengths[i], default=None)
+    return path
+
+
+def conflicts(files, running_files):
+    """True when a step owning `files` cannot run beside the running steps."""
+    if not running_files:
+        return False
+    if not files or any(not other for other in running_files):
+        return True
+    return any(files & other for other in running_files)
+
+
+def waves(steps, todo, done, jobs):
+    """Dry run: the rounds the scheduler would dispatch with unit-time steps."""
+    steps_files = {i: set(plan_state_module().step_files(steps[i])) for i in todo}
+    order = list(steps)
+    lengths = chain_lengths(steps, set(todo))
+    remaining, finished, rounds = set(todo), set(done), []
+    while remaining:
+        ready = sorted((i for i in remaining if all(d in finished for d in steps[i].get("depends_on") or [])),
+                       key=lambda i: (-lengths[i], order.index(i)))
+        batch, batch_files = [], []
+        for step_id in ready:
+            if len(batch) >= jobs:
+                break
+            if not conflicts(steps_files[step_id], batch_files):
+                batch.append(step_id)
+                batch_files.append(steps_files[step_id])
+        if not batch:
+            break
+        rounds.append(batch)
+        remaining -= set(batch)
+        finished |= set(batch)
+    return rounds, sorted(remaining, key=order.index)
+
+
+# =============================================================================
+# Scheduler
+# =============================================================================
+
+def step_prompt(step, plan):
+    files = plan_state_module().step_files(step)
+    lines = [f"Implement step {step['id']} of plan {plan.get('plan_id')}: {step.get('title', '')}",
+             f"Overall task: {plan.get('task', '')}"]
+    if step.get("description"):
+        lines += ["", step["description"]]
+    if files:
+        lines += ["", "Files owned by this step (other steps run concurrently; do not modify other files):"]
+        lines += [f"- {f}" for f in files]
+    if step.get("symbols"):
+        lines += ["", f"Symbols this step must provide: {', '.join(step['symbols'])}"]
+    return "\n".join(lines)
+
+
+class Scheduler:
+    """Dispatch ready, non-conflicting steps to up to `jobs` workers."""
+
+    def __init__(self, state, jobs, worker=None, worktrees=False, retries=1,
+                 timeout=DEFAULT_TIMEOUT, log=None):
+        self.state = state
+        self.root = state.dir.parent
+        self.jobs = jobs
+        self.worker = worker
+        self.worktrees = worktrees
+        self.retries = retries
+        self.timeout = timeout
+        self.log = log or (lambda message: print(message, flush=True))
+        self.results = queue.Queue()
+        self.procs = {}
+        self.lock = threading.Lock()
+
+    # -- git worktrees -----------------------------------------------------------
+
+    def _git(self, *args, cwd=None):
+        return subprocess.run(["git", *args], cwd=str(cwd or self.root), capture_output=True,
+                              text=True, timeout=120)
+
+    def _branch(self, plan, step_id):
+        return re.sub(r"[^A-Za-z0-9._/-]", "-", f"ralph/plan/{plan.get('plan_id', 'plan')}/{step_id}")
+
+    def _worktree_path(self, step_id):
+        return self.root / ".worktrees" / f"plan-{step_id}"
+
+    def _create_worktree(self, plan, step_id):
+        path, branch = self._worktree_path(step_id), self._branch(plan, step_id)
+        self._remove_worktree(plan, step_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        result = self._git("worktree", "add", "-q", "-b", branch, str(path), "HEAD")
+        if result.returncode != 0:
+            raise RuntimeError(f"git worktree add failed: {result.stderr.strip()}")
+        return path
+
+    def _remove_worktree(self, plan, step_id):
+        path = self._worktree_path(step_id)
+        if path.exists():
+            self._git("worktree", "remove", "--force", str(path))
+            shutil.rmtree(path, ignore_errors=True)
+            self._git("worktree", "prune")
+        self._git("branch", "-q", "-D", self._branch(plan, step_id))
+
+    def _merge_worktree(self, plan, step):
+        """Commit the step's worktree and merge it into the current branch. Error text or None."""
+        path, branch = self._worktree_path(step["id"]), self._branch(plan, step["id"])
+        try:
+            self._git("add", "-A", cwd=path)
+            if self._git("diff", "--cached", "--quiet", cwd=path).returncode != 0:
+                commit = self._git("commit", "-q", "-m", f"plan {step['id']}: {step.get('title', '')}",
+                                   cwd=path)
+                if commit.returncode != 0:
+                    return f"commit failed: {commit.stderr.strip()}"
+            merge = self._git("merge", "-q", "--no-ff", "--no-edit", branch)
+            if merge.returncode != 0:
+                self._git("merge", "--abort")
+                return f"merge failed: {(merge.stderr or merge.stdout).strip()}"
+        except subprocess.TimeoutExpired as e:
+            try:
+                self._git("merge", "--abort")
+            except subprocess.TimeoutExpired:
+                pass
+            return f"git {e.cmd[1]} timed out after {e.timeout:g}s"
+        try:
+            self._remove_worktree(plan, step["id"])
+        except subprocess.TimeoutExpired:
+            self.log(f"  [warn]  {step['id']}: merged, but removing its worktree timed out")
+        return None
+
+    # -- workers -----------------------------------------------------------------
+
+    def _execute(self, step_id, cmd, workdir, env, log_path):
+        start = time.monotonic()
+        rc = 1
+        try:
+            with open(log_path, "wb") as log:
+                proc = subprocess.Popen(cmd, cwd=str(workdir), stdin=subprocess.DEVNULL, stdout=log,
+                                        stderr=subprocess.STDOUT, env=env, start_new_session=True)
+                with self.lock:
+                    self.procs[step_id] = proc
+                try:
+                    rc = proc.wait(timeout=self.timeout)
+                except subprocess.TimeoutExpired:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                    proc.wait()
+                    rc = TIMEOUT_EXIT
+        except OSError as e:
+            with open(log_path, "a") as log:
+                log.write(f"cannot start worker: {e}\n")
+        finally:
+            with self.lock:
+                self.procs.pop(step_id, None)
+        self.results.put((step_id, rc, time.monotonic() - start))
+
+    def _dispatch(self, plan, step, attempt, run_dir):
+        files = plan_state_module().step_files(step)
+        workdir = self._create_worktree(plan, step["id"]) if self.worktrees else self.root
+        prompt = step_prompt(step, plan)
+        env = {**os.environ,
+               "RALPH_STEP_ID": step["id"],
+               "RALPH_STEP_TITLE": str(step.get("title") or ""),
+               "RALPH_STEP_DESCRIPTION": str(step.get("description") or ""),
+               "RALPH_STEP_FILES": "\n".join(files),
+               "RALPH_STEP_PROMPT": prompt,
+               "RALPH_STEP_WORKDIR": str(workdir),
+               "RALPH_PLAN_DIR": str(self.state.dir)}
+        if self.worker:
+            cmd = ["bash", "-c", self.worker]
+        else:
+            cmd = ["codex", "exec", "--full-auto", "-C", str(workdir), prompt]
+        log_path = run_dir / f"{step['id']}.{attempt}.log"
+        self.state.set_status(step["id"], "in_progress")
+        threading.Thread(target=self._execute, args=(step["id"], cmd, workdir, env, log_path),
+                         daemon=True).start()
+        return log_path
+
+    def stop(self):
+        with self.lock:
+            for proc in self.procs.values():
+                try:
+                    os.killpg(proc.pid, signal.SIGTERM)
+                except OSError:
+                    pass
+
+    # -- main loop ---------------------------------------------------------------
+
+    def run(self, dry_run=False):
+        plan = self.state._require_plan()
+        steps = build_graph(plan)
+        order = list(steps)
+        done = {i for i, s in steps.items() if s.get("status") in DONE_STATUSES}
+        todo = [i for i in order if i not in done]
+        files = {i: set(plan_state_module().step_files(steps[i])) for i in steps}
+
+        if dry_run:
+            rounds, stuck = waves(steps, todo, done, self.jobs)
+            return {"dry_run": True, "jobs": self.jobs, "waves": rounds, "unschedulable": stuck,
+                    "critical_path": critical_path(steps, set(todo))}
+
+        if self.worktrees and self._git("rev-parse", "--is-inside-work-tree").returncode != 0:
+            raise plan_state_module().PlanStateError("--worktrees needs a git repository")
+        if not self.worker and not shutil.which("codex"):
+            raise plan_state_module().PlanStateError("codex not found; pass --worker CMD")
+
+        run_dir = RUNS_DIR / re.sub(r"[^A-Za-z0-9._-]", "-", str(plan.get("plan_id", "plan"))) \
+            / time.strftime("%Y%m%d-%H%M%S")
+        run_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        drift = drift_engine(self.state.dir)
+
+        pending = set(todo)
+        running, attempts, timings = {}, {}, {}
+        failed, blocked = [], {}
+        critical = critical_path(steps, pending)
+        lengths = chain_lengths(steps, pending)
+        started = time.monotonic()
+        self.log(f"Scheduling {len(pending)} step(s) on {self.jobs} worker(s); "
+                 f"critical path {len(critical)}: {' -> '.join(critical) or '-'}")
+
+        while pending or running:
+            ready = sorted((i for i in pending - set(running)
+                            if all(d in done for d in steps[i].get("depends_on") or [])),
+                           key=lambda i: (-lengths[i], order.index(i)))
+            for step_id in ready:
+                if len(running) >= self.jobs:
+                    break
+                if conflicts(files[step_id], [files[r] for r in running]):
+                    continue
+                attempts[step_id] = attempts.get(step_id, 0) + 1
+                try:
+                    log_path = self._dispatch(plan, steps[step_id], attempts[step_id], run_dir)
+                except (RuntimeError, OSError, subprocess.TimeoutExpired) as e:
+                    self.log(f"  [fail]  {step_id}: {e}")
+                    self._fail(steps, step_id, pending, failed, blocked, str(e))
+                    continue
+                running[step_id] = log_path
+                self.log(f"  [start] {step_id}: {steps[step_id].get('title', '')}"
+                         + (f" (attempt {attempts[step_id]})" if attempts[step_id] > 1 else ""))
+
+            if not running:
+                break  # everything left waits on a failed or blocked step
+
+            step_id, rc, elapsed = self.results.get()
+            log_path = running.pop(step_id)
+            timings[step_id] = timings.get(step_id, 0) + elapsed
+            error = None if rc == 0 else f"exit {rc}, log {log_path}"
+            if error is None and self.worktrees:
+                error = self._merge_worktree(plan, steps[step_id])
+            if error is None:
+                pending.discard(step_id)
+                done.add(step_id)
+                self.state.set_status(step_id, "completed")
+                values = {"run": {"attempts": attempts[step_id], "seconds": round(elapsed, 2),
+                                  "log": str(log_path)}}
+                if steps[step_id].get("blocked_by"):
+                    values["blocked_by"] = []  # left over from the run that set it aside
+                self.state.update(values, step_id)
+                if drift is not None:
+                    drift.baseline(step_id)
+                self.log(f"  [done]  {step_id} ({elapsed:.1f}s)")
+            elif attempts[step_id] <= self.retries:
+                self.log(f"  [retry] {step_id}: {error}")
+            else:
+                self.log(f"  [fail]  {step_id}: {error}")
+                self._fail(steps, step_id, pending, failed, blocked, error)
+                # Re-plan: the critical path of what is still runnable
+                lengths = chain_lengths(steps, pending)
+
+        for step_id in sorted(pending - set(blocked), key=order.index):
+            blocked[step_id] = [d for d in steps[step_id].get("depends_on") or [] if d not in done]
+        for step_id, reasons in blocked.items():
+            self.state.update({"blocked_by": reasons}, step_id)
+        self.state.materialize()
+
+        wall = time.monotonic() - started
+        return {"dry_run": False, "jobs": self.jobs, "wall_seconds": round(wall, 2),
+                "busy_seconds": round(sum(timings.values()), 2),
+                "completed": [i for i in order if i in done and i in timings],
+                "failed": failed, "blocked": blocked, "critical_path": critical,
+                "logs": str(run_dir)}
+
+    def _fail(self, steps, step_id, pending, failed, blocked, error):
+        pending.discard(step_id)
+        failed.append(step_id)
+        self.state.set_status(step_id, "failed")
+        self.state.update({"run": {"error": error[:500]}}, step_id)
+        dependents = {}
+        for step in steps.values():
+            for dep in step.get("depends_on") or []:
+                dependents.setdefault(dep, []).append(step["id"])
+        stack = [step_id]
+        while stack:
+            for child in dependents.get(stack.pop(), []):
+                if child in pending:
+                    pending.discard(child)
+                    blocked.setdefault(child, []).append(step_id)
+                    stack.append(child)
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Run plan-state steps as a dependency DAG")
+    parser.add_argument("--dir", help="Plan directory (default: ./.claude)")
+    sub = parser.add_subparsers(dest="command")
+    p_run = sub.add_parser("run", help="Run pending steps in parallel")
+    p_run.add_argument("--jobs", "-j", type=int, default=min(os.cpu_count() or 4, MAX_JOBS))
+    p_run.add_argument("--worker", help="Shell command per step (step data in RALPH_STEP_* env)")
+    p_run.add_argument("--worktrees", action="store_true", help="One git worktree per step, merged on success")
+    p_run.add_argument("--retries", type=int, default=1)
+    p_run.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT, help="Seconds per step attempt")
+    p_run.add_argument("--dry-run", action="store_true", help="Show the waves without running anything")
+    p_run.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+    if not 1 <= args.jobs <= MAX_JOBS:
+        print(f"plan-scheduler: --jobs must be 1-{MAX_JOBS}", file=sys.stderr)
+        return 1
+    if not 0 <= args.retries <= 10 or args.timeout < 1:
+        print("plan-scheduler: --retries must be 0-10 and --timeout positive", file=sys.stderr)
+        return 1
+
+    state = plan_state_module().PlanState(args.dir)
+    log = (lambda message: print(message, file=sys.stderr, flush=True)) if args.json else None
+    scheduler = Scheduler(state, args.jobs, args.worker, args.worktrees, args.retries, args.timeout, log)
+    signal.signal(signal.SIGTERM, lambda *_: (scheduler.stop(), sys.exit(143)))
+    try:
+        result = scheduler.run(dry_run=args.dry_run)
+    except plan_state_module().PlanStateError as e:
+        print(f"plan-scheduler: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        scheduler.stop()
+        return 130
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    elif result["dry_run"]:
+        for n, batch in enumerate(result["waves"], 1):
+            print(f"  wave {n}: {', '.join(batch)}")
+        if result["unschedulable"]:
+            print(f"  unschedulable: {', '.join(result['unschedulable'])}")
+        print(f"Critical path: {' -> '.join(result['critical_path']) or '-'} "
+              f"({len(result['waves'])} wave(s) with --jobs {result['jobs']})")
+    else:
+        print(f"Completed {len(result['completed'])}, failed {len(result['failed'])}, "
+              f"blocked {len(result['blocked'])} in {result['wall_seconds']:.1f}s "
+              f"(step time {result['busy_seconds']:.1f}s)")
+        for step_id, reasons in result["blocked"].items():
+            print(f"  blocked: {step_id} (waits on {', '.join(reasons)})")
+        print(f"Logs: {result['logs']}")
+    return 1 if result.get("failed") or result.get("blocked") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+Plan-State Engine (v2.50) - Operation log behind .claude/plan-state.json.
+
+plan-state-init.sh, auto-plan-state.sh and plan-sync-post-step.sh used to
+read the whole plan-state.json with jq and rewrite it on every step
+transition and tool call: cost grew with the plan, and two hooks firing
+together could overwrite each other's update. The plan now lives in three
+files under the project's .claude/ directory:
+
+    plan-state.log      append-only operation log, one JSON record per line
+    plan-state.json     materialized view (the v2.45 document, unchanged for
+                        existing readers) = snapshot of the log up to
+                        metadata.oplog.offset
+    plan-state.current  current step pointer, one tab-separated line:
+                        "<step_id>\\t<status>\\t<title>"
+
+Writers never rewrite anything: each operation is a single write(2) on an
+O_APPEND descriptor, so concurrent hooks append whole records without a
+lock. Records are ASCII-only JSON (non-ASCII and control characters
+escaped), so a record never contains a raw newline; a torn trailing line
+from a crashed writer is ignored until it is completed.
+
+Reading the plan = the view + the log tail past its offset. The tail is
+mmap'ed and replayed in place, so a read costs the operations since the
+last snapshot, not the size of the log. The view (and the pointer) are
+rematerialized under a flock - immediately after step transitions, which
+other tools read, and every SNAPSHOT_EVERY_OPS operations or
+SNAPSHOT_EVERY_BYTES of tail for the frequent per-tool-call `update`s.
+Readers that only need the current step read plan-state.current: one small
+file, independent of plan size (bash: IFS=$'\\t' read -r ID STATUS TITLE).
+
+A plan-state.json without a log (written by an older hook) is adopted: the
+first operation logs it as an `import` record. If a legacy writer edits the
+view in place, its edits become the base the log tail is replayed onto.
+
+Usage:
+    plan-state.py init TASK [COMPLEXITY] [MODEL]
+    plan-state.py add-step ID TITLE [FILE] [ACTION] [DESCRIPTION]
+                           [--depends-on IDS] [--symbols NAMES] [--files PATHS]
+    plan-state.py start|complete|verify ID
+    plan-state.py update [--step ID] JSON       # merge keys into a step / the plan
+    plan-state.py status [--json]
+    plan-state.py current [--json]
+    plan-state.py show                          # full JSON view, tail applied
+    plan-state.py materialize [--force]
+    plan-state.py clear
+
+All commands take --dir DIR (default: ./.claude).
+"""
+
+import argparse
+import fcntl
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+STATE_FILE = "plan-state.json"
+LOG_FILE = "plan-state.log"
+CURRENT_FILE = "plan-state.current"
+LOCK_FILE = ".plan-state.lock"
+
+SCHEMA_REF = "plan-state-v2.json"
+SNAPSHOT_EVERY_OPS = 32
+SNAPSHOT_EVERY_BYTES = 64 * 1024
+MAX_RECORD_BYTES = 1024 * 1024
+
+STEP_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+STEP_STATUSES = ("pending", "in_progress", "completed", "verified", "failed", "skipped")
+DONE_STATUSES = ("completed", "verified", "skipped")
+TRANSITIONS = {"start": "in_progress", "complete": "completed", "verify": "verified"}
+TIMESTAMP_FIELDS = {"in_progress": "started_at", "completed": "completed_at", "verified": "verified_at"}
+STATUS_MARKS = {"pending": " ", "in_progress": ">", "completed": "+", "verified": "✓",
+                "failed": "✗", "skipped": "-"}
+
+
+class PlanStateError(Exception):
+    """Invalid operation for the current plan (unknown step, no plan, ...)."""
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _write_atomic(path, text):
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def new_plan(task, complexity=5, model="sonnet", plan_id=None):
+    """An empty v2.45/v2.46 plan-state document."""
+    now = _now_iso()
+    return {
+        "$schema": SCHEMA_REF,
+        "plan_id": plan_id or datetime.now(timezone.utc).strftime("plan-%Y%m%d-%H%M%S"),
+        "task": task,
+        "classification": {
+            "complexity": complexity,
+            "model_routing": model,
+            "adversarial_required": complexity >= 7,
+        },
+        "current_step": None,
+        "steps": [],
+        "loop_state": {"current_iteration": 0, "max_iterations": 25},
+        "metadata": {"created_at": now, "updated_at": now, "version": "2.50"},
+    }
+
+
+def apply(plan, record):
+    """Apply one log record to a plan document (in place). Unknown ops are ignored."""
+    op = record.get("op")
+    ts = record.get("ts") or _now_iso()
+    if op in ("init", "import"):
+        plan.clear()
+        plan.update(json.loads(json.dumps(record.get("plan") or {})))
+        plan.setdefault("steps", [])
+        plan.setdefault("metadata", {})
+        return plan
+    if not plan:
+        return plan
+    steps = plan.setdefault("steps", [])
+    if op == "add_step":
+        step = dict(record.get("step") or {})
+        existing = _find(plan, step.get("id"))
+        if existing is not None:
+            existing.update(step)
+        else:
+            step.setdefault("status", "pending")
+            step.setdefault("drift", {"detected": False, "items": []})
+            steps.append(step)
+    elif op == "status":
+        step = _find(plan, record.get("id"))
+        status = record.get("status")
+        if step is None or status not in STEP_STATUSES:
+            return plan
+        step["status"] = status
+        if status in TIMESTAMP_FIELDS:
+            step[TIMESTAMP_FIELDS[status]] = ts
+        if status == "in_progress":
+            plan["current_step"] = step.get("id")
+        elif plan.get("current_step") == step.get("id") and status in DONE_STATUSES:
+            plan["current_step"] = None
+    elif op == "update":
+        values = record.get("set")
+        if not isinstance(values, dict):
+            return plan
+        target = _find(plan, record["id"]) if record.get("id") else plan
+        if target is not None:
+            target.update(values)
+    plan.setdefault("metadata", {})["updated_at"] = ts
+    return plan
+
+
+def _find(plan, step_id):
+    for step in plan.get("steps") or []:
+        if isinstance(step, dict) and step.get("id") == step_id:
+            return step
+    return None
+
+
+def step_files(step):
+    """Files a step owns: `file` plus the `files` list, normalized."""
+    files = [step.get("file")] + list(step.get("files") or [])
+    return [os.path.normpath(f) for f in files if isinstance(f, str) and f.strip()]
+
+
+def current_step(plan):
+    """The step being worked on: the explicit current step while it is open,
+    else the first in-progress step, else the first pending one."""
+    steps = [s for s in plan.get("steps") or [] if isinstance(s, dict)]
+    step = _find(plan, plan.get("current_step"))
+    if step is not None and step.get("status") not in DONE_STATUSES:
+        return step
+    for wanted in ("in_progress", "pending"):
+        for step in steps:
+            if step.get("status", "pending") == wanted:
+                return step
+    return None
+
+
+def iter_records(path, offset):
+    """(end_offset, record) for each complete line of the log past `offset`.
+
+    The tail is mmap'ed rather than read, so replaying a few records at the
+    end of a long log touches only those pages. A trailing line without a
+    newline (a write in progress or a torn record) is not returned.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= offset:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buf:
+            pos = offset
+            while pos < size:
+                end = buf.find(b"\n", pos)
+                if end < 0:
+                    return
+                line = buf[pos:end]
+                pos = end + 1
+                if not line.strip() or len(line) > MAX_RECORD_BYTES:
+                    continue
+                try:
+                    record = json.loads(line)
+                except (ValueError, UnicodeDecodeError):
+                    continue
+                if isinstance(record, dict):
+                    yield pos, record
+
+
+class PlanState:
+    """The plan of one project directory (.claude/), backed by the op log."""
+
+    def __init__(self, directory=None):
+        self.dir = Path(directory) if directory else Path.cwd() / ".claude"
+        self.state_file = self.dir / STATE_FILE
+        self.log_file = self.dir / LOG_FILE
+        self.current_file = self.dir / CURRENT_FILE
+
+    # -- writing ---------------------------------------------------------------
+
+    def append(self, record):
+        """Log one operation: a single O_APPEND write, no lock, no rewrite.
+
+        The exception is the first operation on a project whose legacy
+        plan-state.json has no log yet: the emptiness check, the import of
+        that plan and the operation itself run under the materialize flock,
+        so two first writers cannot both import it.
+        """
+        self.dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        record = {"ts": _now_iso(), **record}
+        data = (json.dumps(record, ensure_ascii=True, separators=(",", ":")) + "\n").encode("ascii")
+        if len(data) > MAX_RECORD_BYTES:
+            raise PlanStateError(f"operation too large ({len(data)} bytes)")
+        if record["op"] in ("init", "import") or self._log_size():
+            self._write(data)
+            return record
+        lock_fd = os.open(self.dir / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            if not self._log_size():
+                self._adopt_legacy()
+            self._write(data)
+        finally:
+            os.close(lock_fd)
+        return record
+
+    def _write(self, data):
+        fd = os.open(self.log_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _adopt_legacy(self):
+        """Import plan-state.json into the empty log (caller holds the flock)."""
+        plan = self._read_view()
+        if plan:
+            plan.get("metadata", {}).pop("oplog", None)
+            self.append({"op": "import", "plan": plan})
+
+    def _log_size(self):
+        try:
+            return self.log_file.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    # -- reading ---------------------------------------------------------------
+
+    def _read_view(self):
+        try:
+            with open(self.state_file) as f:
+                plan = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return plan if isinstance(plan, dict) else None
+
+    def load(self):
+        """(plan, log offset applied, tail records applied). Plan is None without a plan."""
+        plan = self._read_view()
+        try:
+            st = self.log_file.stat()
+        except FileNotFoundError:
+            return plan, 0, 0
+        oplog = ((plan or {}).get("metadata") or {}).get("oplog") or {}
+        offset = oplog.get("offset", 0)
+        if oplog.get("inode") != st.st_ino or not isinstance(offset, int) or offset > st.st_size:
+            plan, offset = {}, 0  # log replaced or view not ours: replay from the start
+        plan = plan or {}
+        applied = 0
+        for offset, record in iter_records(self.log_file, offset):
+            apply(plan, record)
+            applied += 1
+        return (plan or None), offset, applied
+
+    def plan(self):
+        return self.load()[0]
+
+    # -- materializing -----------------------------------------------------------
+
+    def materialize(self, force=False, wait=True):
+        """Fold the log tail into plan-state.json and refresh the pointer.
+
+        Returns the plan. With wait=False the flock is only tried, and a
+        concurrent materializer is left to do the work.
+        """
+        if not self.dir.is_dir():
+            return None
+        lock_fd = os.open(self.dir / LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return None
+            plan, offset, applied = self.load()
+            if plan is None:
+                return None
+            if applied or force:
+                metadata = plan.setdefault("metadata", {})
+                metadata["oplog"] = {"offset": offset, "inode": self._log_inode()}
+                _write_atomic(self.state_file, json.dumps(plan, indent=2) + "\n")
+            self._write_current(plan)
+            return plan
+        finally:
+            os.close(lock_fd)
+
+    def _log_inode(self):
+        try:
+            return self.log_file.stat().st_ino
+        except FileNotFoundError:
+            return None
+
+    def _write_current(self, plan):
+        step = current_step(plan)
+        if step is None:
+            line = ""
+        else:
+            fields = (step.get("id"), step.get("status", "pending"), step.get("title"))
+            line = "\t".join(re.sub(r"[\t\r\n]+", " ", str(v or "")) for v in fields) + "\n"
+        try:
+            if self.current_file.read_text() == line:
+                return
+        except OSError:
+            pass
+        _write_atomic(self.current_file, line)
+
+    def maybe_materialize(self):
+        """Rematerialize once the unapplied tail is long enough (never blocks)."""
+        plan = self._read_view() or {}
+        oplog = (plan.get("metadata") or {}).get("oplog") or {}
+        tail = self._log_size() - oplog.get("offset", 0)
+        if tail >= SNAPSHOT_EVERY_BYTES or oplog.get("inode") != self._log_inode():
+            return self.materialize(wait=False)
+        if sum(1 for _ in iter_records(self.log_file, oplog.get("offset", 0))) >= SNAPSHOT_EVERY_OPS:
+            return self.materialize(wait=False)
+        return None
+
+    # -- operations -------------------------------------------------------------
+
+    def init(self, task, complexity=5, model="sonnet"):
+        """Start a new plan. The previous log is replaced, not appended to."""
+        self.dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        plan = new_plan(task, complexity, model)
+        record = {"ts": _now_iso(), "op": "init", "plan": plan}
+        fd, tmp = tempfile.mkstemp(dir=str(self.dir), prefix=f".{LOG_FILE}-", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(record, ensure_ascii=True, separators=(",", ":")) + "\n")
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.log_file)
+        self.materialize()
+        return plan["plan_id"]
+
+    def _require_plan(self):
+        plan = self.plan()
+        if not plan:
+            raise PlanStateError("No plan state found. Run 'ralph plan init' first.")
+        return plan
+
+    def add_step(self, step_id, title, file="", action="create", description="",
+                 depends_on=None, symbols=None, files=None):
+        """Add a step. depends_on (step ids) and symbols (names the step
+        declares in its file) feed the drift engine, plan-drift.py; depends_on
+        and files (paths the step owns besides `file`) feed the scheduler,
+        plan-scheduler.py."""
+        if not STEP_ID_RE.match(step_id or ""):
+            raise PlanStateError(f"Invalid step id: {step_id!r}")
+        plan = self._require_plan()
+        for dep in depends_on or []:
+            if dep == step_id or _find(plan, dep) is None:
+                raise PlanStateError(f"Unknown dependency for {step_id}: {dep}")
+        step = {"id": step_id, "title": title, "file": file, "action": action or "create",
+                "description": description}
+        if depends_on:
+            step["depends_on"] = list(depends_on)
+        if symbols:
+            step["symbols"] = list(symbols)
+        if files:
+            step["files"] = list(files)
+        self.append({"op": "add_step", "step": step})
+        return self.materialize()
+
+    def transition(self, verb, step_id):
+        return self.set_status(step_id, TRANSITIONS[verb])
+
+    def set_status(self, step_id, status):
+        if status not in STEP_STATUSES:
+            raise PlanStateError(f"Invalid status: {status}")
+        plan = self._require_plan()
+        if _find(plan, step_id) is None:
+            raise PlanStateError(f"Unknown step: {step_id}")
+        self.append({"op": "status", "id": step_id, "status": status})
+        return self.materialize()
+
+    def update(self, values, step_id=None):
+        """Merge keys into a step (or the plan). Append-only; the view catches up later."""
+        if not isinstance(values, dict) or not values:
+            raise PlanStateError("update needs a non-empty JSON object")
+        if step_id is not None and not STEP_ID_RE.match(step_id):
+            raise PlanStateError(f"Invalid step id: {step_id!r}")
+        record = {"op": "update", "set": values}
+        if step_id:
+            record["id"] = step_id
+        self.append(record)
+        self.maybe_materialize()
+
+    def clear(self):
+        removed = 0
+        for path in (self.log_file, self.current_file, self.state_file, self.dir / LOCK_FILE):
+            try:
+                path.unlink()
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def summary(plan):
+    steps = [s for s in plan.get("steps") or [] if isinstance(s, dict)]
+    counts = {}
+    for step in steps:
+        status = step.get("status", "pending")
+        counts[status] = counts.get(status, 0) + 1
+    step = current_step(plan)
+    return {
+        "plan_id": plan.get("plan_id"),
+        "task": plan.get("task"),
+        "total": len(steps),
+        "counts": counts,
+        "drift": sum(1 for s in steps if (s.get("drift") or {}).get("detected")),
+        "current": {k: step.get(k) for k in ("id", "status", "title")} if step else None,
+    }
+
+
+def print_status(plan):
+    info = summary(plan)
+    counts = info["counts"]
+    print(f"Plan:     {info['plan_id']}")
+    print(f"Task:     {info['task']}")
+    print(f"Progress: {counts.get('verified', 0)} verified, {counts.get('completed', 0)} completed, "
+          f"{counts.get('in_progress', 0)} in progress, {counts.get('pending', 0)} pending "
+          f"(of {info['total']})")
+    if info["drift"]:
+        print(f"Drift:    {info['drift']} step(s)")
+    current = info["current"]
+    print(f"Current:  {current['id']} [{current['status']}] {current['title']}" if current
+          else "Current:  none")
+    if plan.get("steps"):
+        print("")
+    for step in plan.get("steps") or []:
+        status = step.get("status", "pending")
+        print(f"  [{STATUS_MARKS.get(status, '?')}] {step.get('id')}: {step.get('title')} ({status})")
+
+
+def _csv(value):
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ralph plan-state engine (op log + materialized view)")
+    parser.add_argument("--dir", help="Plan directory (default: ./.claude)")
+    sub = parser.add_subparsers(dest="command")
+
+    p_init = sub.add_parser("init", help="Start a new plan")
+    p_init.add_argument("task")
+    p_init.add_argument("complexity", nargs="?", type=int, default=5)
+    p_init.add_argument("model", nargs="?", default="sonnet")
+
+    p_add = sub.add_parser("add-step", help="Add (or redefine) a step")
+    p_add.add_argument("id")
+    p_add.add_argument("title")
+    p_add.add_argument("file", nargs="?", default="")
+    p_add.add_argument("action", nargs="?", default="create")
+    p_add.add_argument("description", nargs="?", default="")
+    p_add.add_argument("--depends-on", default="", help="Comma-separated step ids")
+    p_add.add_argument("--symbols", default="", help="Comma-separated symbols the step declares")
+    p_add.add_argument("--files", default="", help="Comma-separated paths the step owns besides FILE")
+
+    for verb in TRANSITIONS:
+        sub.add_parser(verb, help=f"Mark a step {TRANSITIONS[verb]}").add_argument("id")
+
+    p_update = sub.add_parser("update", help="Merge a JSON object into a step or the plan")
+    p_update.add_argument("--step")
+    p_update.add_argument("values")
+
+    for name in ("status", "current"):
+        sub.add_parser(name).add_argument("--json", action="store_true")
+    sub.add_parser("show", help="Print the plan (log tail applied) as JSON")
+    sub.add_parser("materialize", help="Fold the log into plan-state.json").add_argument(
+        "--force", action="store_true")
+    sub.add_parser("clear", help="Remove the plan, its log and pointer")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    state = PlanState(args.dir)
+    try:
+        if args.command == "init":
+            print(state.init(args.task, args.complexity, args.model))
+        elif args.command == "add-step":
+            state.add_step(args.id, args.title, args.file, args.action, args.description,
+                           _csv(args.depends_on), _csv(args.symbols), _csv(args.files))
+        elif args.command in TRANSITIONS:
+            state.transition(args.command, args.id)
+        elif args.command == "update":
+            try:
+                values = json.loads(args.values)
+            except ValueError as e:
+                raise PlanStateError(f"invalid JSON: {e}")
+            state.update(values, args.step)
+        elif args.command == "materialize":
+            plan = state.materialize(force=args.force)
+            if plan is None:
+                raise PlanStateError("No plan state found")
+        elif args.command == "clear":
+            print(f"{state.clear()} file(s) removed")
+        else:
+            plan = state._require_plan()
+            if args.command == "show":
+                print(json.dumps(plan, indent=2))
+            elif args.command == "status":
+                if args.json:
+                    print(json.dumps(summary(plan), indent=2))
+                else:
+                    print_status(plan)
+            else:
+                step = current_step(plan)
+                if args.json:
+                    print(json.dumps(step))
+                elif step:
+                    print(f"{step.get('id')}\t{step.get('status', 'pending')}\t{step.get('title')}")
+    except PlanStateError as e:
+        print(f"plan-state: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Procedural Matcher (v2.50) - Compiled matcher for learned procedural rules.
+
+procedural-inject.sh (PreToolUse:Task) used to reload rules.json and test
+every rule against the prompt on each Task call. Rules are now compiled into
+~/.ralph/procedural/rules.compiled.json whenever rules.json or
+memory-config.json changes:
+
+    - rules below procedural.min_confidence are dropped at compile time
+    - each trigger is reduced to its keywords (same tokenizer as memory search)
+    - an inverted index maps keyword -> rules that use it
+
+Matching tokenizes the prompt once and looks each token up in the index, so
+its cost depends on the prompt, not on how many rules exist. A rule matches
+when at least MATCH_RATIO of its trigger keywords occur in the prompt; hits
+rank by confidence x matched ratio and the best procedural.max_rules_injected
+are returned. Staleness is checked with two stat() calls per match; the
+first match after a change recompiles (written atomically).
+
+Usage:
+    procedural-matcher.py compile [--force]
+    procedural-matcher.py match TEXT [--limit N] [--json]
+    procedural-matcher.py hook            # PreToolUse input on stdin, hook JSON out
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+COMPILED_FILE = Path.home() / ".ralph" / "procedural" / "rules.compiled.json"
+COMPILED_VERSION = 1
+MATCH_RATIO = 0.5
+MAX_PROMPT_CHARS = 8000
+
+
+def memory_manager():
+    """The memory-manager.py module next to this script."""
+    return load_sibling(__file__, "memory-manager.py")
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+class Matcher:
+    """Inverted keyword index over the rules that pass the confidence threshold."""
+
+    def __init__(self, rules_file=None, config_file=None, compiled_file=None):
+        mm = memory_manager()
+        self.rules_file = Path(rules_file) if rules_file else mm.PROCEDURAL_FILE
+        self.config_file = Path(config_file) if config_file else mm.CONFIG_FILE
+        self.compiled_file = Path(compiled_file) if compiled_file else COMPILED_FILE
+        self.compiled = None
+
+    def _sources(self):
+        return {"rules": _stamp(self.rules_file), "config": _stamp(self.config_file)}
+
+    def compile(self):
+        """Build and store the artifact from rules.json and the current config."""
+        mm = memory_manager()
+        config = mm.load_config(self.config_file)  # creates a missing config first
+        sources = self._sources()  # before reading rules, so a concurrent edit forces a rebuild
+        min_conf = float(config["procedural"].get("min_confidence", 0.8))
+        data = mm._load_json(self.rules_file, {})
+        raw = data.get("rules") if isinstance(data, dict) else None
+        rules, index, skipped = [], {}, 0
+        for rule in raw if isinstance(raw, list) else []:
+            if not isinstance(rule, dict):
+                skipped += 1
+                continue
+            try:
+                confidence = float(rule.get("confidence", 0))
+            except (TypeError, ValueError):
+                confidence = 0.0
+            keywords = sorted(mm.terms(rule.get("trigger", "")))
+            if confidence < min_conf or not keywords or not rule.get("behavior"):
+                skipped += 1
+                continue
+            for keyword in keywords:
+                index.setdefault(keyword, []).append(len(rules))
+            rules.append([str(rule.get("rule_id", "")), str(rule["behavior"]), confidence,
+                          len(keywords)])
+        self.compiled = {
+            "version": COMPILED_VERSION,
+            "sources": sources,
+            "min_confidence": min_conf,
+            "max_rules": int(config["procedural"].get("max_rules_injected", 5)),
+            "skipped": skipped,
+            "rules": rules,
+            "index": index,
+        }
+        mm._write_json_atomic(self.compiled_file, self.compiled)
+        return self.compiled
+
+    def load(self, force=False):
+        """The compiled artifact, rebuilt first if a source changed since."""
+        if not force:
+            compiled = memory_manager()._load_json(self.compiled_file, None)
+            if (isinstance(compiled, dict) and compiled.get("version") == COMPILED_VERSION
+                    and compiled.get("sources") == self._sources()):
+                self.compiled = compiled
+                return compiled
+        return self.compile()
+
+    def match(self, text, limit=None):
+        compiled = self.compiled or self.load()
+        index, rules = compiled["index"], compiled["rules"]
+        hits = {}
+        for token in memory_manager().terms(str(text)[:MAX_PROMPT_CHARS]):
+            for i in index.get(token, ()):
+                hits[i] = hits.get(i, 0) + 1
+        found = []
+        for i, count in hits.items():
+            rule_id, behavior, confidence, n_keywords = rules[i]
+            ratio = count / n_keywords
+            if ratio >= MATCH_RATIO:
+                found.append({"rule_id": rule_id, "behavior": behavior,
+                              "confidence": confidence, "score": round(confidence * ratio, 4)})
+        found.sort(key=lambda r: (-r["score"], -r["confidence"], r["rule_id"]))
+        return found[:compiled["max_rules"] if limit is None else limit]
+
+
+def hook_output(hook_input, matcher):
+    """PreToolUse response for a Task call: learned rules as additionalContext."""
+    tool_input = hook_input.get("tool_input") if isinstance(hook_input, dict) else None
+    if hook_input.get("tool_name") != "Task" or not isinstance(tool_input, dict):
+        return {"decision": "continue"}
+    text = " ".join(str(tool_input.get(k) or "") for k in ("description", "prompt", "subagent_type"))
+    rules = matcher.match(text)
+    if not rules:
+        return {"decision": "continue"}
+    lines = ["Based on past experience:"]
+    lines += [f"- {r['behavior']} (confidence {r['confidence']:.2f})" for r in rules]
+    return {
+        "decision": "continue",
+        "hookSpecificOutput": {"hookEventName": "PreToolUse", "additionalContext": "\n".join(lines)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and match procedural rules")
+    sub = parser.add_subparsers(dest="command")
+    p_compile = sub.add_parser("compile", help="Rebuild the compiled matcher")
+    p_compile.add_argument("--force", action="store_true", help="Rebuild even if up to date")
+    p_match = sub.add_parser("match", help="Rules matching a text")
+    p_match.add_argument("text", nargs="+")
+    p_match.add_argument("--limit", type=int)
+    p_match.add_argument("--json", action="store_true")
+    sub.add_parser("hook", help="Answer a PreToolUse hook call (JSON on stdin)")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    matcher = Matcher()
+    if args.command == "compile":
+        compiled = matcher.load(force=args.force)
+        print(json.dumps({"rules": len(compiled["rules"]), "skipped": compiled["skipped"],
+                          "keywords": len(compiled["index"]),
+                          "min_confidence": compiled["min_confidence"]}))
+    elif args.command == "match":
+        rules = matcher.match(" ".join(args.text), args.limit)
+        if args.json:
+            print(json.dumps(rules, indent=2))
+        else:
+            for r in rules:
+                print(f"[{r['score']:.2f}] {r['behavior']}")
+    elif args.command == "hook":
+        try:
+            hook_input = json.loads(sys.stdin.read(100000) or "{}")
+        except json.JSONDecodeError:
+            hook_input = {}
+        print(json.dumps(hook_output(hook_input if isinstance(hook_input, dict) else {}, matcher)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+ralph-hookd (v2.50) - One hook command per event, fanning out to handlers.
+
+settings.json used to register every hook as its own command, so a single
+Task PreToolUse started fast-path-check.sh, smart-memory-search.sh,
+procedural-inject.sh, inject-session-context.sh and lsa-pre-step.sh, each
+re-parsing the same stdin JSON. `install` moves the command hooks into a
+registry (~/.ralph/config/hookd.json) and registers this dispatcher once per
+event instead:
+
+    python3 ${HOME}/.claude/scripts/ralph-hookd.py run PreToolUse
+
+For each call the dispatcher:
+    1. parses the event JSON once and drops handlers whose matcher does not
+       apply (tool_name for Pre/PostToolUse, source for SessionStart,
+       trigger for PreCompact), so they are never started
+    2. runs the rest in registration order, batching consecutive handlers
+       that are independent ("parallel": true, the default) and running
+       each batch concurrently; a handler marked "parallel": false runs alone
+    3. merges the outputs into one response, following Claude Code's own
+       precedence: exit 2 blocks (stderr is returned), deny > ask > allow,
+       block > approve, "continue": false wins, and additionalContext,
+       systemMessage and reasons are concatenated in registration order.
+       A block stops later batches.
+
+Handler failures other than exit 2 (crash, timeout, bad JSON) are logged to
+~/.ralph/logs/hookd.log and never fail the event. Per-event latency becomes
+roughly that of the slowest handler rather than the sum of all start-ups.
+
+Usage:
+    ralph-hookd.py run EVENT            # hook entry point (event JSON on stdin)
+    ralph-hookd.py install [--settings FILE]
+    ralph-hookd.py uninstall [--settings FILE]
+    ralph-hookd.py status
+"""
+
+import argparse
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SETTINGS_FILE = Path.home() / ".claude" / "settings.json"
+REGISTRY_FILE = Path.home() / ".ralph" / "config" / "hookd.json"
+LOG_FILE = Path.home() / ".ralph" / "logs" / "hookd.log"
+DISPATCH_COMMAND = "python3 ${HOME}/.claude/scripts/ralph-hookd.py run "
+DISPATCH_MARKER = "ralph-hookd.py run "
+# `ralph hooks profile on` prefix: "<...>/hook-timer.sh <Event> -- cmd" or
+# "<...>/hook-timer.sh <Event> --sh 'cmd'"
+TIMER_PREFIX_RE = re.compile(r"^\S*hook-timer\.sh [A-Za-z]+ (--sh |-- )")
+
+DEFAULT_TIMEOUT = 60
+MAX_INPUT_BYTES = 10 * 1024 * 1024
+# Field each event's matcher is tested against; events not listed match always
+MATCH_FIELDS = {
+    "PreToolUse": "tool_name",
+    "PostToolUse": "tool_name",
+    "SessionStart": "source",
+    "PreCompact": "trigger",
+}
+# Plain (non-JSON) stdout becomes context for these events, as with direct hooks
+PLAIN_CONTEXT_EVENTS = {"UserPromptSubmit", "SessionStart"}
+PERMISSION_RANK = {"allow": 1, "ask": 2, "deny": 3}
+DECISION_RANK = {"continue": 1, "approve": 2, "block": 3}
+
+
+def log(message):
+    try:
+        LOG_FILE.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        with open(LOG_FILE, "a") as f:
+            f.write(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] {message}\n")
+    except OSError:
+        pass
+
+
+def _load_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except (OSError, json.JSONDecodeError) as e:
+        log(f"ignoring unreadable {path}: {e}")
+        return default
+
+
+def _write_json_atomic(path, data):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def unwrap_timer(command):
+    """The hook command without a hook-timer.sh profiling prefix."""
+    match = TIMER_PREFIX_RE.match(command)
+    if not match:
+        return command
+    rest = command[match.end():]
+    if match.group(1) == "--sh ":
+        try:
+            words = shlex.split(rest)
+        except ValueError:
+            return rest
+        return words[0] if len(words) == 1 else rest
+    return rest
+
+
+def handler_name(command):
+    command = unwrap_timer(command)
+    match = re.search(r"([^/\s]+\.(?:sh|py))(?:\s|$)", command)
+    return match.group(1) if match else command.split()[0] if command.split() else "?"
+
+
+# =============================================================================
+# Dispatch
+# =============================================================================
+
+def matches(handler, event, payload):
+    """Claude Code matcher semantics: empty or "*" matches all, else a regex."""
+    pattern = handler.get("matcher") or ""
+    field = MATCH_FIELDS.get(event)
+    if pattern in ("", "*") or field is None:
+        return True
+    value = str(payload.get(field) or "")
+    try:
+        return re.fullmatch(pattern, value) is not None
+    except re.error:
+        return pattern == value
+
+
+def batches(handlers):
+    """Consecutive parallel-safe handlers share a batch; others run alone."""
+    batch = []
+    for handler in handlers:
+        if handler.get("parallel", True):
+            batch.append(handler)
+            continue
+        if batch:
+            yield batch
+            batch = []
+        yield [handler]
+    if batch:
+        yield batch
+
+
+def run_handler(handler, raw_input):
+    """Run one handler through the shell, as Claude Code would; never raises."""
+    command = handler["command"]
+    timeout = float(handler.get("timeout") or DEFAULT_TIMEOUT)
+    start = time.monotonic()
+    try:
+        proc = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, start_new_session=True)
+    except OSError as e:
+        return {"handler": handler, "exit": 1, "stdout": b"", "stderr": str(e).encode(), "ms": 0}
+    try:
+        stdout, stderr = proc.communicate(raw_input, timeout=timeout)
+        code = proc.returncode
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        stdout, stderr = proc.communicate()
+        code = None
+    return {"handler": handler, "exit": code, "stdout": stdout, "stderr": stderr,
+            "ms": round((time.monotonic() - start) * 1000, 1)}
+
+
+def merge(event, results, quiet=False):
+    """One hook response from many, in registration order.
+
+    Returns (exit_code, output_dict_or_None, stderr_text, stop), where stop
+    says later batches should not run.
+    """
+    blocking = [r for r in results if r["exit"] == 2]
+    if blocking:
+        return 2, None, "\n".join(r["stderr"].decode(errors="replace").strip() for r in blocking), True
+
+    merged, contexts, messages, reasons, stop_reasons = {}, [], [], {}, []
+    specific = {}
+    for r in results:
+        name = handler_name(r["handler"]["command"])
+        if r["exit"] != 0:
+            status = "timed out" if r["exit"] is None else f"exit {r['exit']}"
+            if not quiet:
+                log(f"{event} {name}: {status}: {r['stderr'].decode(errors='replace').strip()[:500]}")
+            continue
+        text = r["stdout"].decode(errors="replace").strip()
+        if not text:
+            continue
+        try:
+            output = json.loads(text)
+        except json.JSONDecodeError:
+            output = None
+        if not isinstance(output, dict):
+            if event in PLAIN_CONTEXT_EVENTS:
+                contexts.append(text)
+            continue
+
+        decision = output.get("decision")
+        if decision in DECISION_RANK:
+            if DECISION_RANK[decision] > DECISION_RANK.get(merged.get("decision"), 0):
+                merged["decision"] = decision
+            if output.get("reason"):
+                reasons.setdefault(decision, []).append(str(output["reason"]))
+        if output.get("continue") is False:
+            merged["continue"] = False
+            if output.get("stopReason"):
+                stop_reasons.append(str(output["stopReason"]))
+        if output.get("suppressOutput"):
+            merged["suppressOutput"] = True
+        if output.get("systemMessage"):
+            messages.append(str(output["systemMessage"]))
+
+        hso = output.get("hookSpecificOutput")
+        if isinstance(hso, dict):
+            if hso.get("additionalContext"):
+                contexts.append(str(hso["additionalContext"]))
+            permission = hso.get("permissionDecision")
+            if permission in PERMISSION_RANK:
+                current = specific.get("permissionDecision")
+                if PERMISSION_RANK[permission] > PERMISSION_RANK.get(current, 0):
+                    specific["permissionDecision"] = permission
+                    specific["permissionDecisionReason"] = hso.get("permissionDecisionReason", "")
+            for key, value in hso.items():
+                if key not in ("additionalContext", "permissionDecision", "permissionDecisionReason"):
+                    specific.setdefault(key, value)
+        for key, value in output.items():
+            if key not in ("decision", "reason", "continue", "stopReason", "suppressOutput",
+                           "systemMessage", "hookSpecificOutput"):
+                merged.setdefault(key, value)
+
+    if merged.get("decision") in reasons:
+        merged["reason"] = "\n".join(reasons[merged["decision"]])
+    if stop_reasons:
+        merged["stopReason"] = "\n".join(stop_reasons)
+    if messages:
+        merged["systemMessage"] = "\n".join(messages)
+    if contexts:
+        specific["additionalContext"] = "\n\n".join(contexts)
+    if specific:
+        specific.setdefault("hookEventName", event)
+        merged["hookSpecificOutput"] = specific
+    stopped = (merged.get("decision") == "block" or merged.get("continue") is False
+               or specific.get("permissionDecision") == "deny")
+    return 0, (merged or None), "", stopped
+
+
+def dispatch(event, raw_input, registry):
+    """Run the event's applicable handlers; returns (exit_code, stdout, stderr)."""
+    try:
+        payload = json.loads(raw_input or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        payload = {}
+    if not isinstance(payload, dict):
+        payload = {}
+    handlers = [h for h in registry.get("events", {}).get(event, [])
+                if isinstance(h, dict) and h.get("command") and not is_dispatcher(h)
+                and matches(h, event, payload)]
+    results = []
+    for batch in batches(handlers):
+        if len(batch) == 1:
+            batch_results = [run_handler(batch[0], raw_input)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(batch)) as pool:
+                batch_results = list(pool.map(lambda h: run_handler(h, raw_input), batch))
+        results += batch_results
+        if merge(event, results, quiet=True)[3]:
+            break
+    code, output, stderr, _stop = merge(event, results)
+    return code, (json.dumps(output) if output else ""), stderr
+
+
+# =============================================================================
+# settings.json migration
+# =============================================================================
+
+def is_dispatcher(hook):
+    """True for a dispatcher entry, profiled (hook-timer.sh-wrapped) or not."""
+    return isinstance(hook, dict) and DISPATCH_MARKER in unwrap_timer(str(hook.get("command", "")))
+
+
+def install(settings_file=SETTINGS_FILE, registry_file=REGISTRY_FILE):
+    """Move command hooks into the registry; one dispatcher entry per event.
+
+    Safe to re-run: hooks added to settings.json since are appended to the
+    registry. Non-command hooks (e.g. "prompt") stay in settings.json.
+    """
+    settings = _load_json(settings_file, None)
+    if not isinstance(settings, dict):
+        raise ValueError(f"cannot read {settings_file}")
+    registry = _load_json(registry_file, {}) or {}
+    events = registry.setdefault("events", {})
+    registry["version"] = 1
+    # The dispatcher is never one of its own handlers (it would recurse)
+    for event in list(events):
+        events[event] = [h for h in events[event] if not is_dispatcher(h)]
+    moved = 0
+    for event, groups in (settings.get("hooks") or {}).items():
+        kept = []
+        for group in groups if isinstance(groups, list) else []:
+            rest = []
+            for hook in group.get("hooks", []) if isinstance(group, dict) else []:
+                if is_dispatcher(hook):
+                    continue
+                if not (isinstance(hook, dict) and hook.get("type") == "command"):
+                    rest.append(hook)
+                    continue
+                entry = {"matcher": group.get("matcher", ""), "command": hook["command"]}
+                if "timeout" in hook:
+                    entry["timeout"] = hook["timeout"]
+                events.setdefault(event, []).append(entry)
+                moved += 1
+            if rest:
+                kept.append(dict(group, hooks=rest))
+        if events.get(event):
+            kept.append({"hooks": [{"type": "command", "command": DISPATCH_COMMAND + event,
+                                    "timeout": dispatcher_timeout(events[event])}]})
+        settings["hooks"][event] = kept
+    _write_json_atomic(registry_file, registry)
+    _write_json_atomic(settings_file, settings)
+    return moved
+
+
+def dispatcher_timeout(handlers):
+    """Worst case: the slowest handler of each batch, one batch after another."""
+    total = sum(max(float(h.get("timeout") or DEFAULT_TIMEOUT) for h in batch)
+                for batch in batches(handlers))
+    return int(total) + 5
+
+
+def uninstall(settings_file=SETTINGS_FILE, registry_file=REGISTRY_FILE):
+    """Put registry handlers back into settings.json as individual hooks."""
+    settings = _load_json(settings_file, None)
+    registry = _load_json(registry_file, None)
+    if not isinstance(settings, dict) or not isinstance(registry, dict):
+        raise ValueError("dispatcher is not installed")
+    hooks = settings.setdefault("hooks", {})
+    restored = 0
+    for event, handlers in registry.get("events", {}).items():
+        groups = []
+        for group in hooks.get(event, []):
+            rest = [h for h in group.get("hooks", []) if not is_dispatcher(h)]
+            if rest:
+                groups.append(dict(group, hooks=rest))
+        for handler in handlers:
+            if is_dispatcher(handler):
+                continue
+            hook = {"type": "command", "command": handler["command"]}
+            if "timeout" in handler:
+                hook["timeout"] = handler["timeout"]
+            matcher = handler.get("matcher", "")
+            if groups and groups[-1].get("matcher", "") == matcher:
+                groups[-1]["hooks"].append(hook)
+            else:
+                groups.append({"matcher": matcher, "hooks": [hook]} if matcher else {"hooks": [hook]})
+            restored += 1
+        hooks[event] = groups
+    _write_json_atomic(settings_file, settings)
+    os.replace(registry_file, f"{registry_file}.bak")
+    return restored
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Multiplexing hook dispatcher")
+    sub = parser.add_subparsers(dest="command")
+    p_run = sub.add_parser("run", help="Dispatch one hook event (JSON on stdin)")
+    p_run.add_argument("event")
+    p_run.add_argument("--registry", default=str(REGISTRY_FILE), help=argparse.SUPPRESS)
+    for name in ("install", "uninstall"):
+        p = sub.add_parser(name, help=f"{name.capitalize()} the dispatcher in settings.json")
+        p.add_argument("--settings", default=str(SETTINGS_FILE))
+        p.add_argument("--registry", default=str(REGISTRY_FILE), help=argparse.SUPPRESS)
+    p_status = sub.add_parser("status", help="Registered handlers per event (JSON)")
+    p_status.add_argument("--registry", default=str(REGISTRY_FILE), help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        raw = sys.stdin.buffer.read(MAX_INPUT_BYTES)
+        code, stdout, stderr = dispatch(args.event, raw, _load_json(args.registry, {}) or {})
+        if stdout:
+            print(stdout)
+        if stderr:
+            print(stderr, file=sys.stderr)
+        return code
+    if args.command in ("install", "uninstall"):
+        try:
+            count = (install if args.command == "install" else uninstall)(args.settings, args.registry)
+        except (ValueError, OSError) as e:
+            print(f"ralph-hookd: {e}", file=sys.stderr)
+            return 1
+        print(json.dumps({args.command + "ed": count}))
+        return 0
+    if args.command == "status":
+        registry = _load_json(args.registry, {}) or {}
+        print(json.dumps({
+            "installed": bool(registry.get("events")),
+            "events": {event: [dict(h, name=handler_name(h["command"])) for h in handlers]
+                       for event, handlers in registry.get("events", {}).items()},
+        }, indent=2))
+        return 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
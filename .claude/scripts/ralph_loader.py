@@ -0,0 +1,40 @@
+"""
+Ralph loader (v2.50) - load the hyphen-named scripts next to a script as modules.
+
+The helper scripts are CLIs first, so their file names have hyphens and
+cannot be imported by name. Scripts that need another one load it by path
+with load_sibling(), once per process:
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from ralph_loader import load_sibling
+
+    def vector_index():
+        return load_sibling(__file__, "vector-index.py", optional=True)
+"""
+
+import importlib.util
+from pathlib import Path
+
+_LOADED = {}
+
+
+def load_sibling(caller, filename, optional=False):
+    """The module in `filename` next to `caller` (a __file__), loaded once.
+
+    Registered as ralph_<name> (vector-index.py -> ralph_vector_index). With
+    optional=True a missing or broken file gives None instead of raising, for
+    extras such as the vector index that must never fail the caller.
+    """
+    path = Path(caller).resolve().with_name(filename)
+    if path not in _LOADED:
+        name = "ralph_" + filename.rsplit(".", 1)[0].replace("-", "_")
+        try:
+            spec = importlib.util.spec_from_file_location(name, path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        except (OSError, ImportError, SyntaxError):
+            if not optional:
+                raise
+            module = None
+        _LOADED[path] = module
+    return _LOADED[path]
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Reflection Executor (v2.49, streaming v2.50) - Cold path of the memory system.
+
+Runs after a session ends (reflection-engine.sh, Stop hook) and turns the
+session transcript into episodic memory, then looks for patterns that recur
+across sessions and promotes them to procedural rules.
+
+    extract TRANSCRIPT   transcript turns -> episode (~/.ralph/episodes)
+    patterns [--save]    recurring decisions/learnings/errors -> rules.json
+    cleanup              drop stale checkpoints, compact episodic memory
+    status               cold path state (JSON)
+
+Since v2.50 `extract` streams the JSONL transcript line by line instead of
+loading it, so memory stays bounded however long the session was. It keeps
+a checkpoint per transcript in ~/.ralph/reflection/checkpoints/ holding the
+byte offset of the last complete line processed plus the running pattern
+state (counts, decisions, learnings, errors). A re-run seeks straight to the
+offset, reads only the turns appended since, merges them into the state and
+replaces the session's episode with one built from it (one episode per
+transcript, however many Stop hooks ran), so the Stop hook costs the same
+for a 50-turn session as for a 5,000-turn one. A trailing line without a newline is left
+for the next run (the transcript may still be written). Lines over
+MAX_LINE_BYTES (tool output dumps) are skipped without being buffered. A
+replaced or truncated transcript (other inode, size below the offset) starts
+again from byte 0.
+
+Security:
+    SEC-003: transcripts must resolve (symlinks followed) to a file inside
+             ~/.claude/projects, ~/.claude/transcripts or ~/.ralph/transcripts
+    SEC-004: specific exception handlers; bad lines are counted, not fatal
+    RE-002:  no way to bypass path validation
+
+Usage:
+    reflection-executor.py extract TRANSCRIPT [--session ID] [--project NAME]
+    reflection-executor.py patterns [--save] [--json]
+    reflection-executor.py cleanup
+    reflection-executor.py status
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# Hyphen-named siblings are loaded by path (ralph_loader.py, same directory)
+if str(Path(__file__).resolve().parent) not in sys.path:
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+from ralph_loader import load_sibling  # noqa: E402
+
+RALPH_DIR = Path.home() / ".ralph"
+CHECKPOINT_DIR = RALPH_DIR / "reflection" / "checkpoints"
+ALLOWED_TRANSCRIPT_DIRS = (
+    Path.home() / ".claude" / "projects",
+    Path.home() / ".claude" / "transcripts",
+    RALPH_DIR / "transcripts",
+)
+
+MAX_LINE_BYTES = 1024 * 1024
+SKIP_CHUNK_BYTES = 64 * 1024
+MAX_TEXT_CHARS = 4000
+MAX_SENTENCE_CHARS = 300
+MAX_ITEMS = 20
+
+SUCCESS_RE = re.compile(
+    r"\b(implemented|fixed|resolved|completed|succeeded|successfully|tests? pass(?:ed|ing)?)\b", re.I)
+FAILURE_RE = re.compile(r"\b(error|failed|failure|exception|traceback|regression)\b", re.I)
+DECISION_RE = re.compile(
+    r"\b(decided|decision|chose|chosen|going with|opted|we(?:'ll| will) use|switch(?:ed)? to)\b", re.I)
+LEARNING_RE = re.compile(r"\b(learned|lesson|turns out|root cause|gotcha|workaround|note to self)\b", re.I)
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def _warn(message):
+    print(f"reflection-executor: {message}", file=sys.stderr)
+
+
+def memory_manager():
+    """The memory-manager.py module next to this script."""
+    return load_sibling(__file__, "memory-manager.py")
+
+
+# =============================================================================
+# Transcript access
+# =============================================================================
+
+def validate_transcript_path(path):
+    """Resolved transcript path, or ValueError when outside the allowlist (SEC-003)."""
+    try:
+        resolved = Path(path).expanduser().resolve(strict=True)
+    except (OSError, RuntimeError) as e:
+        raise ValueError(f"transcript not found: {path}") from e
+    if not resolved.is_file():
+        raise ValueError(f"not a regular file: {path}")
+    for allowed in ALLOWED_TRANSCRIPT_DIRS:
+        try:
+            if resolved.is_relative_to(allowed.resolve()):
+                return resolved
+        except OSError:
+            continue
+    raise ValueError(f"transcript outside allowed directories: {path}")
+
+
+def iter_lines(f, max_bytes=MAX_LINE_BYTES):
+    """Yield (end_offset, line) for each complete line from f's position on.
+
+    An overlong line is skipped in chunks and yielded as None. A final line
+    without a newline is not yielded: its end offset is unknown until the
+    writer finishes it.
+    """
+    while True:
+        line = f.readline(max_bytes + 1)
+        if not line:
+            return
+        if line.endswith(b"\n"):
+            yield f.tell(), line
+            continue
+        if len(line) <= max_bytes:
+            return
+        while True:
+            chunk = f.readline(SKIP_CHUNK_BYTES)
+            if not chunk:
+                return
+            if chunk.endswith(b"\n"):
+                break
+        yield f.tell(), None
+
+
+def record_parts(record):
+    """(role, text, tool_names, had_error) for one transcript record.
+
+    Understands Claude Code transcripts ({"type", "message": {"role",
+    "content": str | blocks}}) as well as flat {"type", "content"} lines.
+    """
+    message = record.get("message") if isinstance(record.get("message"), dict) else record
+    role = message.get("role") or record.get("type") or ""
+    content = message.get("content")
+    texts, tools, had_error = [], [], False
+    if isinstance(content, str):
+        texts.append(content)
+    elif isinstance(content, list):
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            kind = block.get("type")
+            if kind == "text" and isinstance(block.get("text"), str):
+                texts.append(block["text"])
+            elif kind == "tool_use" and isinstance(block.get("name"), str):
+                tools.append(block["name"])
+            elif kind == "tool_result" and block.get("is_error"):
+                had_error = True
+                result = block.get("content")
+                if isinstance(result, str):
+                    texts.append(result)
+    return role, "\n".join(texts)[:MAX_TEXT_CHARS], tools, had_error
+
+
+# =============================================================================
+# Extraction state
+# =============================================================================
+
+def new_state():
+    return {
+        "offset": 0, "inode": None, "session_id": None, "task": None, "turns": 0,
+        "bad_lines": 0, "counts": {"success": 0, "failure": 0, "decision": 0, "learning": 0},
+        "tools": {}, "decisions": [], "learnings": [], "errors": [],
+        "episode_id": None, "episode_ts": None,
+    }
+
+
+def _remember(items, sentence):
+    if sentence not in items:
+        items.append(sentence)
+        del items[:-MAX_ITEMS]
+
+
+class Extraction:
+    """Patterns found in one run's worth of new transcript lines."""
+
+    def __init__(self):
+        self.state = new_state()
+
+    def feed(self, record):
+        state = self.state
+        state["turns"] += 1
+        if state["session_id"] is None and isinstance(record.get("sessionId"), str):
+            state["session_id"] = record["sessionId"]
+        role, text, tools, had_error = record_parts(record)
+        for name in tools:
+            state["tools"][name] = state["tools"].get(name, 0) + 1
+        if had_error:
+            state["counts"]["failure"] += 1
+        if not text.strip():
+            return
+        if state["task"] is None and role in ("user", "human", "message"):
+            state["task"] = text.strip().splitlines()[0][:200]
+        for sentence in SENTENCE_SPLIT_RE.split(text):
+            sentence = sentence.strip()
+            if not sentence or len(sentence) > MAX_SENTENCE_CHARS:
+                continue
+            if SUCCESS_RE.search(sentence):
+                state["counts"]["success"] += 1
+            if FAILURE_RE.search(sentence):
+                state["counts"]["failure"] += 1
+                if had_error or role != "user":
+                    _remember(state["errors"], sentence)
+            if DECISION_RE.search(sentence):
+                state["counts"]["decision"] += 1
+                _remember(state["decisions"], sentence)
+            if LEARNING_RE.search(sentence):
+                state["counts"]["learning"] += 1
+                _remember(state["learnings"], sentence)
+
+    def merge_into(self, total):
+        """Fold this run into the transcript's cumulative state."""
+        delta = self.state
+        total["turns"] += delta["turns"]
+        total["bad_lines"] += delta["bad_lines"]
+        total["session_id"] = total["session_id"] or delta["session_id"]
+        total["task"] = total["task"] or delta["task"]
+        for key, value in delta["counts"].items():
+            total["counts"][key] = total["counts"].get(key, 0) + value
+        for name, value in delta["tools"].items():
+            total["tools"][name] = total["tools"].get(name, 0) + value
+        for key in ("decisions", "learnings", "errors"):
+            for sentence in delta[key]:
+                _remember(total[key], sentence)
+
+
+class Checkpoint:
+    """Per-transcript offset and running state, held under an exclusive flock."""
+
+    def __init__(self, transcript, directory=None):
+        directory = Path(directory) if directory else CHECKPOINT_DIR
+        directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+        key = hashlib.sha256(str(transcript).encode()).hexdigest()[:32]
+        self.path = directory / f"{key}.json"
+        self.lock_path = directory / f"{key}.lock"
+        self.transcript = transcript
+
+    def __enter__(self):
+        self.fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self.fd)
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+
+    def load(self, stat):
+        """Saved state, or a fresh one if the transcript was replaced or truncated."""
+        state = memory_manager()._load_json(self.path, None)
+        if (not isinstance(state, dict) or state.get("inode") != stat.st_ino
+                or not 0 <= state.get("offset", -1) <= stat.st_size):
+            state = new_state()
+        state["inode"] = stat.st_ino
+        state["transcript"] = str(self.transcript)
+        return state
+
+    def save(self, state):
+        state["updated"] = time.time()
+        memory_manager()._write_json_atomic(self.path, state)
+
+
+def extract(transcript, manager, session_id=None, project=None, checkpoint_dir=None):
+    """Process the turns appended since the last checkpoint.
+
+    The transcript's episode is replaced (same episode_id and timestamp) with
+    one built from the cumulative state. Returns {"episode_id", "turns",
+    "from_offset", "to_offset", ...}; episode_id is None when there was
+    nothing new.
+    """
+    with Checkpoint(transcript, checkpoint_dir) as checkpoint, open(transcript, "rb") as f:
+        state = checkpoint.load(os.fstat(f.fileno()))
+        start = state["offset"]
+        f.seek(start)
+        run = Extraction()
+        end = start
+        for end, line in iter_lines(f):
+            if line is None:
+                run.state["bad_lines"] += 1
+                continue
+            try:
+                record = json.loads(line)
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                run.state["bad_lines"] += 1
+                continue
+            if isinstance(record, dict):
+                run.feed(record)
+
+        result = {"episode_id": None, "turns": run.state["turns"],
+                  "from_offset": start, "to_offset": end}
+        run.merge_into(state)
+        if run.state["turns"]:
+            counts = state["counts"]
+            episode = {
+                "task": state["task"] or f"Session {transcript.stem}",
+                "context": project or "",
+                "success": counts["failure"] == 0 or counts["success"] > counts["failure"],
+                "tags": ["reflection"],
+                "learnings": state["learnings"] + state["decisions"],
+                "errors": state["errors"],
+                "tools": state["tools"],
+                "turns": state["turns"],
+                "session_id": session_id or state["session_id"],
+                "project": project,
+                "transcript": {"path": str(transcript), "from": 0, "to": end},
+                # Kept from the first write so every version lands in one month
+                "timestamp": state.get("episode_ts") or memory_manager()._now_iso(),
+            }
+            if state.get("episode_id"):
+                episode["episode_id"] = state["episode_id"]
+            result["episode_id"] = manager.write_episode(episode, replace=True)
+            state["episode_id"], state["episode_ts"] = result["episode_id"], episode["timestamp"]
+        state["offset"] = end
+        checkpoint.save(state)
+        result.update(counts=state["counts"], total_turns=state["turns"],
+                      bad_lines=run.state["bad_lines"])
+        return result
+
+
+# =============================================================================
+# Cross-session patterns
+# =============================================================================
+
+def _normalize(sentence):
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]+", " ", sentence.lower())).strip()
+
+
+def detect_patterns(manager):
+    """Sentences that recur in at least pattern_detection_threshold sessions."""
+    threshold = int(manager.config["cold_path"].get("pattern_detection_threshold", 3))
+    seen = {}
+    for episode in manager.episodes.iter_episodes(since=manager._episodic_since()):
+        session = episode.get("session_id") or episode.get("episode_id")
+        kinds = [("failure", s) for s in episode.get("errors") or []]
+        kind = "success" if episode.get("success", True) else "optimization"
+        kinds += [(kind, s) for s in episode.get("learnings") or []]
+        for kind, sentence in kinds:
+            key = (kind, _normalize(str(sentence)))
+            if not key[1]:
+                continue
+            entry = seen.setdefault(key, {"type": kind, "text": str(sentence), "sessions": set()})
+            entry["sessions"].add(session)
+    patterns = []
+    for (kind, key), entry in seen.items():
+        occurrences = len(entry["sessions"])
+        if occurrences < threshold:
+            continue
+        patterns.append({
+            "pattern_id": f"pat-{hashlib.sha256(f'{kind}:{key}'.encode()).hexdigest()[:12]}",
+            "type": kind,
+            "text": entry["text"],
+            "occurrences": occurrences,
+            "confidence": round(min(0.95, 0.5 + 0.1 * occurrences), 2),
+        })
+    return sorted(patterns, key=lambda p: (-p["confidence"], p["text"]))
+
+
+def save_rules(manager, patterns):
+    """Merge confident patterns into procedural rules.json; returns rules added or updated."""
+    mm = memory_manager()
+    min_conf = float(manager.config["procedural"].get("min_confidence", 0.8))
+    promoted = [p for p in patterns if p["confidence"] >= min_conf]
+    if not promoted:
+        return 0
+    with mm._DirLock(manager.procedural_file.parent):
+        rules = {r.get("rule_id"): r for r in manager.rules()}
+        for p in promoted:
+            trigger = " ".join(sorted(mm.terms(p["text"]), key=len, reverse=True)[:4])
+            behavior = f"Avoid: {p['text']}" if p["type"] == "failure" else p["text"]
+            rules[p["pattern_id"]] = {
+                "rule_id": p["pattern_id"], "trigger": trigger, "behavior": behavior,
+                "confidence": p["confidence"], "occurrences": p["occurrences"],
+                "source": "reflection", "updated": mm._now_iso(),
+            }
+        mm._write_json_atomic(manager.procedural_file, {"rules": list(rules.values())})
+    return len(promoted)
+
+
+# =============================================================================
+# Maintenance
+# =============================================================================
+
+def cleanup_checkpoints(ttl_days, directory=None, now=None):
+    """Remove checkpoints whose transcript is gone or untouched for ttl_days."""
+    directory = Path(directory) if directory else CHECKPOINT_DIR
+    if not directory.is_dir():
+        return 0
+    now = now or time.time()
+    removed = 0
+    for path in directory.glob("*.json"):
+        state = memory_manager()._load_json(path, {})
+        transcript = state.get("transcript") if isinstance(state, dict) else None
+        updated = state.get("updated", 0) if isinstance(state, dict) else 0
+        if transcript and os.path.exists(transcript) and now - updated < ttl_days * 86400:
+            continue
+        for stale in (path, path.with_suffix(".lock")):
+            try:
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+        removed += 1
+    return removed
+
+
+def status(manager):
+    stats = manager.stats()
+    checkpoints = list(CHECKPOINT_DIR.glob("*.json")) if CHECKPOINT_DIR.is_dir() else []
+    last = max((p.stat().st_mtime for p in checkpoints), default=None)
+    return {
+        "cold_path_enabled": bool(manager.config["cold_path"].get("enabled", True)),
+        "reflection_on_stop": bool(manager.config["cold_path"].get("reflection_on_stop", True)),
+        "episode_count": stats["episodic_count"],
+        "procedural_rules": stats["procedural_count"],
+        "checkpoints": len(checkpoints),
+        "last_extract": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(last)) if last else None,
+    }
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Ralph cold path: reflect on session transcripts")
+    sub = parser.add_subparsers(dest="command")
+
+    p_extract = sub.add_parser("extract", help="Turn new transcript turns into an episode")
+    p_extract.add_argument("transcript")
+    p_extract.add_argument("--session")
+    p_extract.add_argument("--project", default=os.environ.get("PROJECT"))
+
+    p_patterns = sub.add_parser("patterns", help="Detect patterns across episodes")
+    p_patterns.add_argument("--save", action="store_true", help="Promote confident patterns to rules")
+    p_patterns.add_argument("--json", action="store_true")
+
+    sub.add_parser("cleanup", help="Drop stale checkpoints and compact episodes")
+    sub.add_parser("status", help="Cold path status (JSON)")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    manager = memory_manager().MemoryManager()
+
+    if args.command == "extract":
+        if not manager.config["cold_path"].get("enabled", True):
+            print("Cold path disabled; nothing extracted")
+            return 0
+        try:
+            transcript = validate_transcript_path(args.transcript)
+        except ValueError as e:
+            _warn(str(e))
+            return 1
+        try:
+            result = extract(transcript, manager, args.session, args.project)
+        except BlockingIOError:
+            print("Extraction already running for this transcript")
+            return 0
+        except OSError as e:
+            _warn(f"cannot read {transcript}: {e}")
+            return 1
+        if result["episode_id"]:
+            print(f"Episode saved: {result['episode_id']} "
+                  f"({result['turns']} new turns, bytes {result['from_offset']}-{result['to_offset']})")
+        else:
+            print(f"No new turns since byte {result['from_offset']}")
+    elif args.command == "patterns":
+        patterns = detect_patterns(manager)
+        saved = save_rules(manager, patterns) if args.save else 0
+        if args.json:
+            print(json.dumps({"patterns": patterns, "rules_saved": saved}, indent=2))
+        else:
+            print(f"{len(patterns)} pattern(s) detected")
+            for p in patterns:
+                print(f"  [{p['type']}] {p['text']} "
+                      f"(sessions: {p['occurrences']}, confidence: {p['confidence']:.2f})")
+            if args.save:
+                print(f"{saved} rule(s) saved to {manager.procedural_file}")
+    elif args.command == "cleanup":
+        ttl_days = float(manager.config["episodic"].get("ttl_days", 30))
+        result = manager.compact()
+        result["checkpoints_removed"] = cleanup_checkpoints(ttl_days)
+        print(json.dumps(result))
+    elif args.command == "status":
+        print(json.dumps(status(manager), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,826 @@
+#!/usr/bin/env python3
+"""
+Vector Index (v2.50) - One local similarity index over handoffs, ledgers and memory.
+
+Semantic recall used to be split between memvid, claude-mem and keyword
+greps over handoff/ledger markdown. This index holds one vector per document
+for all of them, so "which past sessions look like this task?" is a single
+top-k lookup.
+
+Embeddings are hashed n-gram vectors (words plus character trigrams, signed
+feature hashing into DIM buckets, L2-normalized): no model download, no
+network, deterministic across runs. Cosine similarity is then a plain dot
+product.
+
+Layout under ~/.ralph/index/ (RALPH_INDEX_DIR overrides):
+    vectors-<generation>.f32   float32 rows, append-only, memory-mapped
+    meta.sqlite3               key -> row plus source/session/project/path/title
+
+A row is ROW_DIM float32s: the text embedding (DIM), a hashed vector of the
+file paths the document touched (PATH_DIM), the update time in days and a
+24-bit project hash. Everything `rank` scores is in the row, so ranking
+never reads per-document metadata from SQLite.
+
+Writers append a row inside a SQLite write transaction; replacing a key
+leaves its old row dead until `compact` (run automatically once dead rows
+outnumber live ones) rewrites the file under a new generation. Searches
+score every row in one pass - NumPy when installed, a stdlib loop over the
+mmap otherwise - and only fetch metadata for the best candidates.
+
+Fed by ledger-manager.py save and handoff-generator.py create; any other
+writer can use `add`.
+
+`rank` scores every session for `ralph fork-suggest` in one vectorized pass
+over the rows. The signals are term overlap with the task, recency decay,
+a same-project boost, overlap with the files in the current git diff, and
+similarity to the current plan-state. Each hit carries its per-signal
+breakdown, and ties are broken by recency, so the top-N is stable.
+
+Usage:
+    vector-index.py add --key KEY --source SOURCE [--session ID] [--project P]
+                        [--path PATH] [--title T] (--text TEXT | --file PATH)
+    vector-index.py search QUERY... [--limit N] [--source S] [--sessions] [--json]
+    vector-index.py rank TASK... [--project P] [--plan FILE] [--changed-files FILE|-]
+                        [--limit N] [--json]
+    vector-index.py remove KEY...
+    vector-index.py rebuild
+    vector-index.py compact
+    vector-index.py stats
+"""
+
+import argparse
+import contextlib
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import sys
+import time
+import zlib
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # optional: the stdlib scorer gives identical results
+    np = None
+
+INDEX_DIR = Path.home() / ".ralph" / "index"
+RALPH_DIR = Path.home() / ".ralph"
+DIM = 256
+PATH_DIM = 128
+UPDATED_SLOT = DIM + PATH_DIM
+PROJECT_SLOT = UPDATED_SLOT + 1
+ROW_DIM = PROJECT_SLOT + 1
+ROW_BYTES = ROW_DIM * 4
+MAX_TEXT_CHARS = 20000
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.25
+COMPACT_MIN_DEAD = 1000
+# Sources whose entries point at a file: hits whose file is gone are dropped
+FILE_SOURCES = {"ledger", "handoff"}
+
+# fork-suggest ranking: signal weights (sum to 1) and recency half-life
+RANK_WEIGHTS = {"term": 0.4, "plan": 0.15, "files": 0.2, "recency": 0.1, "project": 0.15}
+RECENCY_HALF_LIFE_DAYS = 14.0
+# Hash collisions give unrelated texts small positive cosines; a row must
+# beat this on term, plan or files to be a candidate at all
+RANK_MIN_SIGNAL = 0.05
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in into is it of on or that the "
+    "this to was were will with".split()
+)
+
+
+# =============================================================================
+# Embedding
+# =============================================================================
+
+def features(text):
+    """Weighted hashed features of a text as {bucket: weight}."""
+    counts = {}
+    for word in re.findall(r"[a-z0-9_]+", text[:MAX_TEXT_CHARS].lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        counts["w:" + word] = counts.get("w:" + word, 0) + 1
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            gram = "c:" + padded[i:i + 3]
+            counts[gram] = counts.get(gram, 0) + 1
+
+    buckets = {}
+    for feature, count in counts.items():
+        h = zlib.crc32(feature.encode())
+        weight = (1.0 + math.log(count)) * (WORD_WEIGHT if feature[0] == "w" else TRIGRAM_WEIGHT)
+        bucket = h % DIM
+        buckets[bucket] = buckets.get(bucket, 0.0) + (weight if (h >> 16) & 1 else -weight)
+    return buckets
+
+
+def path_features(paths):
+    """Hashed features of file paths: the path, its basename and parent dirs."""
+    buckets = {}
+    for path in paths:
+        parts = [p for p in str(path).strip().strip("/").split("/") if p not in ("", ".")]
+        if not parts:
+            continue
+        weighted = [("p:" + "/".join(parts), 1.0), ("b:" + parts[-1], 0.5)]
+        weighted += [("d:" + "/".join(parts[:i]), 0.25) for i in range(1, len(parts))]
+        for feature, weight in weighted:
+            h = zlib.crc32(feature.encode())
+            buckets[h % PATH_DIM] = buckets.get(h % PATH_DIM, 0.0) + weight
+    return buckets
+
+
+def _normalized(buckets):
+    norm = math.sqrt(sum(w * w for w in buckets.values()))
+    if not norm:
+        return []
+    return sorted((b, w / norm) for b, w in buckets.items() if w)
+
+
+def embed(text):
+    """Sparse L2-normalized embedding as a sorted list of (bucket, weight)."""
+    return _normalized(features(text))
+
+
+def embed_paths(paths):
+    """Sparse L2-normalized path vector (buckets relative to the path block)."""
+    return _normalized(path_features(paths))
+
+
+def project_hash(project):
+    """Project name as a float32-exact non-zero integer (0 means no project)."""
+    return (zlib.crc32(project.encode()) & 0xFFFFFF) or 1 if project else 0
+
+
+def pack(doc):
+    """One index row for a document dict (see add_many)."""
+    row = [0.0] * ROW_DIM
+    for bucket, weight in embed(doc["text"]):
+        row[bucket] = weight
+    for bucket, weight in embed_paths(doc.get("files") or ()):
+        row[DIM + bucket] = weight
+    row[UPDATED_SLOT] = (doc.get("updated") or time.time()) / 86400.0
+    row[PROJECT_SLOT] = project_hash(doc.get("project"))
+    return struct.pack(f"<{ROW_DIM}f", *row)
+
+
+def document_text(body):
+    """Markdown minus headings, fenced blocks and **Field**: labels (template noise)."""
+    kept, in_fence = [], False
+    for line in body.splitlines():
+        if line.startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence or line.startswith("#") or line.startswith("|-"):
+            continue
+        kept.append(re.sub(r"\*\*\w+\*\*:\s*", "", line))
+    return "\n".join(kept)
+
+
+# =============================================================================
+# Index
+# =============================================================================
+
+class VectorIndex:
+    """Flat memory-mapped vector store with SQLite metadata."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            key        TEXT PRIMARY KEY,
+            row        INTEGER NOT NULL,
+            source     TEXT NOT NULL,
+            session_id TEXT,
+            project    TEXT,
+            path       TEXT,
+            title      TEXT,
+            updated    REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS items_row ON items (row);
+        CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+    """
+
+    def __init__(self, index_dir=None):
+        self.index_dir = Path(index_dir or os.environ.get("RALPH_INDEX_DIR") or INDEX_DIR)
+        self.index_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        db = self.index_dir / "meta.sqlite3"
+        fresh = not db.exists()
+        self.conn = sqlite3.connect(str(db), timeout=10, isolation_level=None)
+        if fresh:
+            os.chmod(db, 0o600)
+        self.conn.executescript(self.SCHEMA)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            dim = self._meta("dim")
+            if dim != ROW_DIM:
+                # New index, or rows from an older layout: start over
+                self.conn.execute("DELETE FROM items")
+                self._set_meta("dim", ROW_DIM)
+                self._set_meta("generation", (self._meta("generation") or 0) + 1)
+                self._set_meta("next_row", 0)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        if dim is not None and dim != ROW_DIM and self.index_dir == INDEX_DIR:
+            self.add_many(scan_documents())
+
+    def _meta(self, name):
+        row = self.conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name, value):
+        self.conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, int(value)),
+        )
+
+    def _vectors_path(self, generation):
+        return self.index_dir / f"vectors-{generation}.f32"
+
+    # -- writes --------------------------------------------------------------
+
+    def add(self, key, text, source, session_id=None, project=None, path=None,
+            title=None, updated=None, files=None):
+        """Insert or replace one document. `files` are the paths it touched."""
+        self.add_many([dict(key=key, text=text, source=source, session_id=session_id,
+                            project=project, path=path, title=title, updated=updated,
+                            files=files)])
+
+    def add_many(self, docs):
+        """Insert or replace documents in one transaction. Returns the count added."""
+        prepared = [(doc, pack(doc)) for doc in docs]
+        if not prepared:
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            generation = self._meta("generation")
+            row = self._meta("next_row")
+            fd = os.open(self._vectors_path(generation), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                os.pwrite(fd, b"".join(vec for _doc, vec in prepared), row * ROW_BYTES)
+            finally:
+                os.close(fd)
+            for doc, _vec in prepared:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO items "
+                    "(key, row, source, session_id, project, path, title, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (doc["key"], row, doc["source"], doc.get("session_id"), doc.get("project"),
+                     str(doc["path"]) if doc.get("path") else None,
+                     (doc.get("title") or "")[:200], doc.get("updated") or time.time()),
+                )
+                row += 1
+            self._set_meta("next_row", row)
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._maybe_compact()
+        return len(prepared)
+
+    def remove(self, keys):
+        """Forget documents by key. Returns how many existed."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            removed = 0
+            for key in keys:
+                removed += self.conn.execute("DELETE FROM items WHERE key = ?", (key,)).rowcount
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._maybe_compact()
+        return removed
+
+    def clear(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("DELETE FROM items")
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.compact()
+
+    def rebuild(self):
+        """Start over from the ledgers and handoffs on disk. Returns the count indexed."""
+        self.clear()
+        return self.add_many(scan_documents())
+
+    def _maybe_compact(self):
+        live = self.conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+        dead = self._meta("next_row") - live
+        if dead >= COMPACT_MIN_DEAD and dead > live:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the vector file with live rows only, under a new generation.
+
+        Readers hold a read transaction while they map the file, so the
+        generation switch cannot land between reading the row numbers and
+        reading the vectors; the old file is unlinked only after commit.
+        """
+        self.conn.execute("BEGIN IMMEDIATE")
+        old_gen = self._meta("generation")
+        new_gen = old_gen + 1
+        old_path, new_path = self._vectors_path(old_gen), self._vectors_path(new_gen)
+        try:
+            rows = self.conn.execute("SELECT key, row FROM items ORDER BY row").fetchall()
+            fd = os.open(new_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            try:
+                if rows:
+                    with open(old_path, "rb") as src:
+                        for new_row, (key, old_row) in enumerate(rows):
+                            src.seek(old_row * ROW_BYTES)
+                            os.write(fd, src.read(ROW_BYTES))
+                            if new_row != old_row:
+                                self.conn.execute(
+                                    "UPDATE items SET row = ? WHERE key = ?", (new_row, key)
+                                )
+            finally:
+                os.close(fd)
+            self._set_meta("generation", new_gen)
+            self._set_meta("next_row", len(rows))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            if new_path.exists():
+                new_path.unlink()
+            raise
+        for stale in self.index_dir.glob("vectors-*.f32"):
+            if stale != new_path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+
+    # -- reads ---------------------------------------------------------------
+
+    def search(self, query, limit=5, source=None, sessions=False, project=None):
+        """Top-`limit` documents by cosine similarity to `query`.
+
+        With sessions=True, hits are collapsed to the best one per session.
+        Returns dicts with key, source, session_id, project, path, title,
+        updated and score (rounded to 4 places), best first.
+        """
+        q = embed(query)
+        if not q or limit <= 0:
+            return []
+        with self._rows() as rows:
+            if rows is None:
+                return []
+            scores = rows.dot(q)
+            return [entry for _row, entry
+                    in self._collect(scores, rows.total, limit, source, sessions, project)]
+
+    def rank(self, task, plan_text=None, changed_files=None, project=None, limit=5,
+             now=None):
+        """Top-`limit` sessions for a task, scored on every row in one pass.
+
+        score = sum(RANK_WEIGHTS[s] * signal_s), each signal in [0, 1]:
+          term     cosine of the task with the document text
+          plan     cosine of the plan-state text with the document text
+          files    cosine of the changed files with the files the document touched
+          recency  0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+          project  1 when the document belongs to `project`
+        Rows without term, plan or file overlap above RANK_MIN_SIGNAL are
+        not candidates. Returns
+        search()-style dicts plus "signals" (the per-signal values), best
+        first; equal scores go to the most recently written row.
+        """
+        task_q = embed(task)
+        plan_q = embed(plan_text) if plan_text else []
+        files_q = [(DIM + b, w) for b, w in embed_paths(changed_files or ())]
+        if not (task_q or plan_q or files_q) or limit <= 0:
+            return []
+        with self._rows() as rows:
+            if rows is None:
+                return []
+            signals = {
+                "term": rows.dot(task_q),
+                "plan": rows.dot(plan_q),
+                "files": rows.dot(files_q),
+                "recency": rows.recency(UPDATED_SLOT, (now or time.time()) / 86400.0,
+                                        RECENCY_HALF_LIFE_DAYS),
+                "project": rows.equals(PROJECT_SLOT, project_hash(project)) if project
+                           else rows.zeros(),
+            }
+            scores = rows.combine(signals, RANK_WEIGHTS, ("term", "plan", "files"), RANK_MIN_SIGNAL)
+            hits = []
+            for row, entry in self._collect(scores, rows.total, limit, None, True, None):
+                entry["signals"] = {name: round(float(values[row]), 4)
+                                    for name, values in signals.items()}
+                hits.append(entry)
+            return hits
+
+    @contextlib.contextmanager
+    def _rows(self):
+        """The live vector file as a _Rows view (None when empty).
+
+        Held inside a read transaction (shared lock): no compaction can swap
+        the generation while rows are being scored. A vector file shorter
+        than the rows SQLite knows about (lost or truncated outside a
+        transaction) reads as empty and the index is rebuilt. A longer one is
+        normal: a writer that died between its append and its commit.
+        """
+        damaged = False
+        self.conn.execute("BEGIN")
+        try:
+            total = self._meta("next_row")
+            if not total:
+                yield None
+                return
+            try:
+                f = open(self._vectors_path(self._meta("generation")), "rb")
+            except FileNotFoundError:
+                f = None
+            with f or contextlib.nullcontext():
+                if f is None or os.fstat(f.fileno()).st_size < total * ROW_BYTES:
+                    damaged = True
+                    yield None
+                    return
+                with mmap.mmap(f.fileno(), total * ROW_BYTES, access=mmap.ACCESS_READ) as mm:
+                    rows = _Rows(mm, total)
+                    try:
+                        yield rows
+                    finally:
+                        rows.release()
+        finally:
+            self.conn.execute("COMMIT")
+            if damaged:
+                print(f"vector-index: {self._vectors_path(self._meta('generation'))} is shorter "
+                      f"than the index; rebuilding", file=sys.stderr)
+                if self.index_dir == INDEX_DIR:
+                    self.rebuild()
+                else:
+                    self.clear()
+
+    def _collect(self, scores, total, limit, source, sessions, project):
+        # Dead rows and filtered-out sources take candidate slots, so widen
+        # the candidate set until enough hits survive or every row was seen
+        window = max(limit * 4, 32)
+        while True:
+            hits, seen = [], set()
+            for row, score in _top(scores, min(window, total)):
+                if score <= 0:
+                    break
+                item = self.conn.execute(
+                    "SELECT key, source, session_id, project, path, title, updated "
+                    "FROM items WHERE row = ?", (row,),
+                ).fetchone()
+                if item is None:
+                    continue
+                entry = dict(zip(("key", "source", "session_id", "project", "path",
+                                  "title", "updated"), item), score=round(score, 4))
+                if source and entry["source"] != source:
+                    continue
+                if project and entry["project"] != project:
+                    continue
+                if entry["source"] in FILE_SOURCES and entry["path"] \
+                        and not os.path.exists(entry["path"]):
+                    continue
+                if sessions and entry["session_id"]:
+                    if entry["session_id"] in seen:
+                        continue
+                    seen.add(entry["session_id"])
+                hits.append((row, entry))
+                if len(hits) == limit:
+                    return hits
+            if window >= total:
+                return hits
+            window *= 4
+
+    def stats(self):
+        by_source = dict(self.conn.execute(
+            "SELECT source, COUNT(*) FROM items GROUP BY source ORDER BY source"
+        ).fetchall())
+        live = sum(by_source.values())
+        rows = self._meta("next_row")
+        path = self._vectors_path(self._meta("generation"))
+        return {
+            "count": live,
+            "sources": by_source,
+            "dead_rows": rows - live,
+            "dim": DIM,
+            "path_dim": PATH_DIM,
+            "size": path.stat().st_size if path.exists() else 0,
+            "numpy": np is not None,
+            "path": str(self.index_dir),
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class _Rows:
+    """Column access over the memory-mapped rows: NumPy when installed, else stdlib.
+
+    Scoring only touches the columns a query needs (its non-zero buckets plus
+    the scalar slots), so both paths stay proportional to rows x query terms.
+    """
+
+    def __init__(self, mm, total):
+        self.total = total
+        if np is not None:
+            self.matrix = np.frombuffer(mm, dtype="<f4", count=total * ROW_DIM)
+            self.matrix = self.matrix.reshape(total, ROW_DIM)
+            self.flat = None
+        else:
+            self.matrix = None
+            self.flat = memoryview(mm).cast("f")
+
+    def release(self):
+        self.matrix = None
+        if self.flat is not None:
+            self.flat.release()
+
+    def zeros(self):
+        return np.zeros(self.total, dtype=np.float32) if np is not None else [0.0] * self.total
+
+    def column(self, slot):
+        if self.matrix is not None:
+            return self.matrix[:, slot]
+        with self.flat[slot:self.total * ROW_DIM:ROW_DIM] as column:
+            return column.tolist()
+
+    def dot(self, q):
+        """Dot product of every row with a sparse vector of (column, weight)."""
+        if not q:
+            return self.zeros()
+        if self.matrix is not None:
+            columns = [c for c, _w in q]
+            weights = np.asarray([w for _c, w in q], dtype=np.float32)
+            return self.matrix[:, columns] @ weights
+        scores = [0.0] * self.total
+        for column, weight in q:
+            with self.flat[column:self.total * ROW_DIM:ROW_DIM] as values:
+                scores = [s + v * weight for s, v in zip(scores, values)]
+        return scores
+
+    def recency(self, slot, now_days, half_life):
+        ages = self.column(slot)
+        if self.matrix is not None:
+            return np.exp2(-np.maximum(now_days - ages, 0.0) / half_life)
+        return [2.0 ** (-max(now_days - a, 0.0) / half_life) for a in ages]
+
+    def equals(self, slot, value):
+        values = self.column(slot)
+        if self.matrix is not None:
+            return (values == value).astype(np.float32)
+        return [1.0 if v == value else 0.0 for v in values]
+
+    def combine(self, signals, weights, gate, threshold):
+        """Weighted sum of clipped signals; rows with no `gate` signal above
+        `threshold` score 0."""
+        if self.matrix is not None:
+            clipped = {name: np.clip(values, 0.0, 1.0) for name, values in signals.items()}
+            total = sum(weights[name] * clipped[name] for name in signals)
+            relevant = np.logical_or.reduce([clipped[name] > threshold for name in gate])
+            for name, values in clipped.items():
+                signals[name] = values
+            return np.where(relevant, total, 0.0)
+        for name, values in signals.items():
+            signals[name] = [min(max(v, 0.0), 1.0) for v in values]
+        columns = [signals[name] for name in signals]
+        factors = [weights[name] for name in signals]
+        gates = [signals[name] for name in gate]
+        return [
+            sum(f * v for f, v in zip(factors, row)) if any(g > threshold for g in gated) else 0.0
+            for row, gated in zip(zip(*columns), zip(*gates))
+        ]
+
+
+def _top(scores, k):
+    """(row, score) pairs of the k highest scores, best first.
+
+    Ties go to the higher (more recently written) row, in both paths, so the
+    order never depends on partitioning details.
+    """
+    if np is not None and isinstance(scores, np.ndarray):
+        if k < len(scores):
+            kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+            idx = np.flatnonzero(scores >= kth)
+        else:
+            idx = np.arange(len(scores))
+        idx = idx[np.lexsort((-idx, -scores[idx]))][:k]
+        return [(int(i), float(scores[i])) for i in idx]
+    return heapq.nlargest(k, ((row, score) for row, score in enumerate(scores)),
+                          key=lambda pair: (pair[1], pair[0]))
+
+
+# =============================================================================
+# Feeding
+# =============================================================================
+
+def enabled():
+    return os.environ.get("RALPH_VECTOR_INDEX", "on") != "off"
+
+
+def feed(key, text, source, **fields):
+    """Best-effort add used by the ledger/handoff writers: never raises.
+
+    The vector index is derived data (see `rebuild`), so a locked or
+    unwritable index must not fail the save that triggered it.
+    """
+    if not enabled():
+        return False
+    try:
+        index = VectorIndex()
+        try:
+            index.add(key, text, source, **fields)
+        finally:
+            index.close()
+        return True
+    except (OSError, sqlite3.Error):
+        return False
+
+
+def forget(keys):
+    """Best-effort remove; see feed()."""
+    if not enabled():
+        return False
+    try:
+        index = VectorIndex()
+        try:
+            index.remove(keys)
+        finally:
+            index.close()
+        return True
+    except (OSError, sqlite3.Error):
+        return False
+
+
+def ledger_key(session_id):
+    return f"ledger:{session_id}"
+
+
+def handoff_key(path):
+    return f"handoff:{path}"
+
+
+def scan_documents(ralph_dir=None):
+    """Ledger and handoff documents currently on disk, as add_many() input."""
+    ralph_dir = Path(ralph_dir) if ralph_dir else RALPH_DIR
+    docs = []
+    for path in sorted((ralph_dir / "ledgers").glob("CONTINUITY_RALPH-*.md")):
+        try:
+            body, mtime = path.read_text(errors="replace"), path.stat().st_mtime
+        except OSError:
+            continue
+        sid = path.name[len("CONTINUITY_RALPH-"):-3]
+        project = re.search(r"\*\*Project\*\*: ([^|\n]+)", body)
+        goal = re.search(r"^## CURRENT GOAL\s*\n+(.+)$", body, re.MULTILINE)
+        docs.append(dict(
+            key=ledger_key(sid), text=document_text(body), source="ledger", session_id=sid,
+            project=project.group(1).strip() if project else None, path=str(path),
+            title=goal.group(1).strip() if goal else "", updated=mtime,
+            files=re.findall(r"^- \[[ x]\] ([^\s:]+)(?::[\d,-]+)? - ", body, re.MULTILINE),
+        ))
+    for path in sorted((ralph_dir / "handoffs").glob("*/handoff-*.md")):
+        try:
+            body, mtime = path.read_text(errors="replace"), path.stat().st_mtime
+        except OSError:
+            continue
+        docs.append(dict(
+            key=handoff_key(path), text=document_text(body), source="handoff",
+            session_id=path.parent.name, path=str(path), title=_handoff_title(body),
+            updated=mtime, files=re.findall(r"^- [A-Z]+: (\S+)$", body, re.MULTILINE),
+        ))
+    return docs
+
+
+def plan_text(plan):
+    """Task and step text of a plan-state.json document, for `rank --plan`."""
+    parts = [str(plan.get("task") or "")]
+    for step in plan.get("steps") or []:
+        if isinstance(step, dict):
+            parts += [str(step.get(k) or "") for k in ("title", "description", "file")]
+    return "\n".join(p for p in parts if p)
+
+
+def _handoff_title(body):
+    match = re.search(r"^## CONTEXT SUMMARY\s*\n+- (.+)$", body, re.MULTILINE)
+    return match.group(1).strip() if match else ""
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local vector index over Ralph handoffs, ledgers and memory"
+    )
+    parser.add_argument("--dir", help="Index directory (default: ~/.ralph/index)")
+    sub = parser.add_subparsers(dest="command")
+
+    p_add = sub.add_parser("add", help="Add or replace a document")
+    p_add.add_argument("--key", required=True)
+    p_add.add_argument("--source", required=True)
+    p_add.add_argument("--session")
+    p_add.add_argument("--project")
+    p_add.add_argument("--path")
+    p_add.add_argument("--title")
+    text = p_add.add_mutually_exclusive_group(required=True)
+    text.add_argument("--text")
+    text.add_argument("--file", help="Read the document text from this file")
+
+    p_search = sub.add_parser("search", help="Nearest documents to a query")
+    p_search.add_argument("query", nargs="+")
+    p_search.add_argument("--limit", type=int, default=5)
+    p_search.add_argument("--source", help="Only this source (ledger, handoff, ...)")
+    p_search.add_argument("--project", help="Only this project")
+    p_search.add_argument("--sessions", action="store_true", help="Best hit per session")
+    p_search.add_argument("--json", action="store_true")
+
+    p_rank = sub.add_parser("rank", help="Rank past sessions for a task (fork-suggest)")
+    p_rank.add_argument("task", nargs="+")
+    p_rank.add_argument("--project", help="Boost sessions from this project")
+    p_rank.add_argument("--plan", help="plan-state.json to compare sessions against")
+    p_rank.add_argument("--changed-files", help="File listing changed paths, one per line ('-': stdin)")
+    p_rank.add_argument("--limit", type=int, default=5)
+    p_rank.add_argument("--json", action="store_true")
+
+    p_remove = sub.add_parser("remove", help="Forget documents by key")
+    p_remove.add_argument("keys", nargs="+")
+
+    sub.add_parser("rebuild", help="Re-index all ledgers and handoffs from disk")
+    sub.add_parser("compact", help="Drop dead rows from the vector file")
+    sub.add_parser("stats", help="Index statistics (JSON)")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        return 0
+
+    index = VectorIndex(args.dir)
+    try:
+        return _run(args, index)
+    finally:
+        index.close()
+
+
+def _run(args, index):
+    if args.command == "add":
+        body = Path(args.file).read_text(errors="replace") if args.file else args.text
+        index.add(args.key, document_text(body), args.source, session_id=args.session,
+                  project=args.project, path=args.path, title=args.title)
+        print(f"Indexed: {args.key}")
+    elif args.command == "search":
+        hits = index.search(" ".join(args.query), args.limit, args.source,
+                            args.sessions, args.project)
+        if args.json:
+            print(json.dumps(hits, indent=2))
+        elif not hits:
+            print("No matches")
+        else:
+            for hit in hits:
+                print(f"{hit['score']:.3f}  {hit['source']:<8} {hit['session_id'] or '-':<32} "
+                      f"{hit['title'] or hit['key']}")
+    elif args.command == "rank":
+        plan = None
+        if args.plan:
+            try:
+                with open(args.plan) as f:
+                    plan = plan_text(json.load(f))
+            except (OSError, ValueError, AttributeError):
+                plan = None
+        changed = None
+        if args.changed_files:
+            listing = sys.stdin if args.changed_files == "-" else open(args.changed_files)
+            with listing:
+                changed = [line.strip() for line in listing if line.strip()]
+        hits = index.rank(" ".join(args.task), plan, changed, args.project, args.limit)
+        if args.json:
+            print(json.dumps(hits, indent=2))
+        elif not hits:
+            print("No matches")
+        else:
+            for hit in hits:
+                breakdown = " ".join(f"{k}={v:.2f}" for k, v in hit["signals"].items())
+                print(f"{hit['score']:.3f}  {hit['session_id'] or hit['key']:<32} {breakdown}")
+    elif args.command == "remove":
+        print(f"Removed {index.remove(args.keys)} document(s)")
+    elif args.command == "rebuild":
+        count = index.rebuild()
+        print(f"Indexed {count} document(s)")
+    elif args.command == "compact":
+        index.compact()
+        print(json.dumps(index.stats()))
+    elif args.command == "stats":
+        print(json.dumps(index.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,10 @@ INSTALL_DIR="${HOME}/.local/bin"
 RALPH_DIR="${HOME}/.ralph"
 CLAUDE_DIR="${HOME}/.claude"
 
+# Helper scripts users may already run from a standalone context-engine setup.
+# A differing copy that Ralph did not install itself is kept, not replaced.
+USER_OWNED_SCRIPTS="ledger-manager.py handoff-generator.py"
+
 # Colors
 RED='\033[0;31m'
 GREEN='\033[0;32m'
@@ -135,13 +139,23 @@ merge_settings() {
     # 4. Preserve $schema from our file for validation
 
     jq -s '
+    # v2.50: Hooks wrapped by `ralph hooks profile on` compare as the command
+    # they wrap, so re-installing does not add an unwrapped duplicate
+    def hook_key:
+        (.command // "") as $c
+        | ("${HOME}/.claude/scripts/hook-timer.sh ") as $prefix
+        | if ($c | startswith($prefix) | not) then $c
+          elif ($c | test("^[^ ]+ [A-Za-z]+ --sh \u0027")) then
+              $c | sub("^[^\u0027]*\u0027"; "") | .[:-1] | gsub("\u0027\\\\\u0027\u0027"; "\u0027")
+          else $c[($prefix | length):] | sub("^[A-Za-z]+ -- "; "") end;
+
     # Helper to merge hook arrays by matcher (no duplicates)
     def merge_hooks(a; b):
         if (a | type) == "array" and (b | type) == "array" then
             # Both are arrays - combine and deduplicate by matcher
             (a + b) | group_by(.matcher) | map(
                 .[0] + {
-                    hooks: ([.[].hooks] | add | unique_by(.command))
+                    hooks: ([.[].hooks] | add | unique_by(hook_key))
                 }
             )
         elif (a | type) == "array" then a
@@ -200,7 +214,7 @@ create_directories() {
 
     mkdir -p "$INSTALL_DIR"
     mkdir -p "$RALPH_DIR"/{config,improvements/backups,logs}
-    mkdir -p "$CLAUDE_DIR"/{agents,commands,skills,hooks}
+    mkdir -p "$CLAUDE_DIR"/{agents,commands,skills,hooks,scripts}
 
     log_success "Directories created"
 }
@@ -257,6 +271,38 @@ install_claude_components() {
         log_success "  - quality-gates.sh (9-language validation)"
     fi
 
+    # Helper scripts (ledger/handoff engines, context-engine daemon)
+    if [ -d "${SCRIPT_DIR}/.claude/scripts" ]; then
+        mkdir -p "${CLAUDE_DIR}/scripts"
+        # Only top-level .py/.sh files: no __pycache__ or other build leftovers.
+        # The manifest records what Ralph owns, for upgrades and uninstall.
+        local manifest="${CLAUDE_DIR}/scripts/.ralph-installed"
+        local installed="" src name dest
+        for src in "${SCRIPT_DIR}/.claude/scripts/"*.py "${SCRIPT_DIR}/.claude/scripts/"*.sh; do
+            [ -f "$src" ] || continue
+            name="$(basename "$src")"
+            dest="${CLAUDE_DIR}/scripts/${name}"
+            case " $USER_OWNED_SCRIPTS " in
+                *" $name "*)
+                    if [ -f "$dest" ] && ! cmp -s "$src" "$dest" && \
+                       ! grep -qxF "$name" "$manifest" 2>/dev/null; then
+                        log_warn "Kept your existing ${name} (Ralph's version: ${src})"
+                        continue
+                    fi
+                    ;;
+            esac
+            cp "$src" "$dest"
+            chmod +x "$dest"
+            installed="${installed}${name}"$'\n'
+        done
+        printf '%s' "$installed" > "$manifest"
+        # v2.50: Seed the vector index from ledgers/handoffs written before it existed
+        if [ ! -f "${HOME}/.ralph/index/meta.sqlite3" ] && command -v python3 &>/dev/null; then
+            python3 "${CLAUDE_DIR}/scripts/vector-index.py" rebuild >/dev/null 2>&1 || true
+        fi
+        log_success "Scripts installed ($(ls -1 "${CLAUDE_DIR}/scripts/" 2>/dev/null | wc -l | tr -d ' ') files)"
+    fi
+
     # Merge settings.json (CRITICAL: preserve user's existing settings)
     if [ -f "${SCRIPT_DIR}/.claude/settings.json" ]; then
         merge_settings
@@ -79,6 +79,8 @@ def pytest_configure(config):
     config.addinivalue_line("markers", "security: mark test as a security test")
     config.addinivalue_line("markers", "integration: mark test as an integration test")
     config.addinivalue_line("markers", "slow: mark test as slow running")
+    config.addinivalue_line(
+        "markers", "benchmark: wall-clock performance test, run with -m benchmark")
 
 
 # Collection modifiers
@@ -93,6 +95,10 @@ def pytest_collection_modifyitems(config, items):
         if "integration" in item.nodeid.lower():
             item.add_marker(pytest.mark.integration)
 
+        # Timing assertions depend on the machine: only when asked for
+        if item.get_closest_marker("benchmark") and "benchmark" not in config.getoption("-m"):
+            item.add_marker(pytest.mark.skip(reason="benchmark (run with -m benchmark)"))
+
 
 # ============================================================
 # Multi-Agent Ralph v2.40 Fixtures
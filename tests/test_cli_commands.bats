@@ -349,11 +349,99 @@ run_cli() {
     [[ "$output" == *"MULTI-LEVEL SECURITY LOOP"* ]]
 }
 
+@test "cmd_security_loop re-audits only changed files and their importers" {
+    rm -f "$BIN_DIR/jq"  # findings merge needs real jq
+    command -v jq >/dev/null || skip "jq not installed"
+    for f in auth billing cart db email feed; do echo "x = 1" > "$TARGET_DIR/$f.py"; done
+    echo "from auth import x" > "$TARGET_DIR/billing.py"
+    cat > "$BIN_DIR/codex" << 'EOF'
+#!/usr/bin/env bash
+[[ "$1" == "--version" ]] && { echo "codex 0.0.0"; exit 0; }
+PROMPT="${@: -1}"
+if [[ "$*" == *"--full-auto"* ]]; then
+  echo "x = 2" >> "$TARGET_DIR/auth.py"
+  exit 0
+fi
+if [[ "$PROMPT" == *"Scope:"* ]]; then
+  echo "$PROMPT" > "$TARGET_DIR/../scoped_prompt.txt"
+  echo '{"vulnerabilities":[]}'
+else
+  echo '{"vulnerabilities":[{"id":"V1","severity":"LOW","file":"auth.py","line":1}]}'
+fi
+EOF
+    chmod +x "$BIN_DIR/codex"
+    run env HOME="$TEST_HOME" PATH="$TEST_PATH" TARGET_DIR="$TARGET_DIR" \
+        bash "$RALPH_SCRIPT" security-loop "$TARGET_DIR" --max-rounds 3
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"Re-auditing 2 of 7 files"* ]]
+    [[ "$output" == *"NO VULNERABILITIES REMAINING"* ]]
+    grep -q "billing.py" "$TEST_TMPDIR/scoped_prompt.txt"
+    ! grep -q "cart.py" "$TEST_TMPDIR/scoped_prompt.txt"
+}
+
 @test "cmd_bugs basic invocation" {
     run_cli bugs "$TARGET_DIR"
     [ "$status" -eq 0 ]
 }
 
+@test "cmd_security reuses cached review for an unchanged target" {
+    run_cli security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    run_cli security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"reusing cached result"* ]]
+}
+
+@test "cmd_security re-runs review after target content changes" {
+    run_cli security "$TARGET_DIR"
+    echo "changed" >> "$TARGET_DIR/file.txt"
+    run_cli security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    [[ "$output" != *"reusing cached result"* ]]
+}
+
+@test "review cache hits when codex logs progress to stderr" {
+    cat > "$BIN_DIR/codex" << 'EOF'
+#!/usr/bin/env bash
+[[ "$1" == "--version" ]] && { echo "codex 0.0.0"; exit 0; }
+echo "[codex] reading files..." >&2
+if [[ "$*" == *"--output-schema"* ]]; then
+  echo '{"vulnerabilities":[]}'
+else
+  echo "Consider extracting the retry loop."
+fi
+echo "[codex] tokens used: 42" >&2
+EOF
+    chmod +x "$BIN_DIR/codex"
+    run_cli security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    run_cli security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"security: unchanged target, reusing cached result"* ]]
+
+    # Text-mode pass (no schema), through the review queue
+    echo "$TARGET_DIR" > "$TEST_TMPDIR/targets.txt"
+    run_cli parallel --targets-from "$TEST_TMPDIR/targets.txt" --jobs 1 --kinds review
+    rm -rf "$TEST_HOME/.ralph/queue"
+    run_cli parallel --targets-from "$TEST_TMPDIR/targets.txt" --jobs 1 --kinds review
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"review: unchanged target, reusing cached result"* ]]
+}
+
+@test "cmd_bugs is never served from the cache (it may edit files)" {
+    run_cli bugs "$TARGET_DIR"
+    run_cli bugs "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    [[ "$output" != *"reusing cached result"* ]]
+}
+
+@test "review cache can be disabled with RALPH_REVIEW_CACHE=0" {
+    run_cli security "$TARGET_DIR"
+    run env HOME="$TEST_HOME" PATH="$TEST_PATH" RALPH_REVIEW_CACHE=0 bash "$RALPH_SCRIPT" security "$TARGET_DIR"
+    [ "$status" -eq 0 ]
+    [[ "$output" != *"reusing cached result"* ]]
+}
+
 @test "cmd_unit_tests basic invocation" {
     run_cli unit-tests "$TARGET_DIR"
     [ "$status" -eq 0 ]
@@ -369,6 +457,28 @@ run_cli() {
     [ "$status" -eq 0 ]
 }
 
+@test "cmd_parallel collects agents into review-summary.json" {
+    run env HOME="$TEST_HOME" PATH="$TEST_PATH" bash "$RALPH_SCRIPT" parallel "$TARGET_DIR" < /dev/null
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"All subagents completed"* ]]
+    ls "$TEST_HOME"/.ralph/reviews/*/review-summary.json
+}
+
+@test "cmd_parallel --targets-from queues jobs and persists the queue" {
+    mkdir -p "$TEST_TMPDIR/pkgs/a" "$TEST_TMPDIR/pkgs/b"
+    printf '%s\n' "$TEST_TMPDIR/pkgs/a" "$TEST_TMPDIR/pkgs/b" > "$TEST_TMPDIR/targets.txt"
+    run_cli parallel --targets-from "$TEST_TMPDIR/targets.txt" --jobs 2 --kinds security,review
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"4 jobs"* ]]
+    ls "$TEST_HOME"/.ralph/queue/*.tsv
+}
+
+@test "cmd_parallel --targets-from rejects unknown review kinds" {
+    printf '%s\n' "$TARGET_DIR" > "$TEST_TMPDIR/targets.txt"
+    run_cli parallel --targets-from "$TEST_TMPDIR/targets.txt" --kinds nope
+    [ "$status" -ne 0 ]
+}
+
 @test "cmd_adversarial basic invocation" {
     run_cli adversarial "$TARGET_DIR"
     [ "$status" -eq 0 ]
@@ -484,6 +594,47 @@ run_cli() {
     [ "$status" -eq 0 ]
 }
 
+@test "cmd_classify --json is produced without jq" {
+    run_cli classify "Fix typo in README" --json
+    [ "$status" -eq 0 ]
+    [[ "$output" == *'"workflow_route": "FAST_PATH"'* ]]
+}
+
+@test "cmd_classify - classifies one task per stdin line" {
+    run bash -c "printf '%s\n' 'Fix typo in README' 'Migrate all API endpoints to v2' \
+        | env HOME='$TEST_HOME' PATH='$TEST_PATH' bash '$RALPH_SCRIPT' classify -"
+    [ "$status" -eq 0 ]
+    [[ "$output" == *$'FAST_PATH\t2\tCONSTANT\tFITS\tFix typo in README'* ]]
+    [[ "$output" == *$'STANDARD\t6\tLINEAR\tFITS\tMigrate all API endpoints to v2'* ]]
+}
+
+@test "cmd_classify --batch streams JSONL with the --json schema" {
+    rm -f "$BIN_DIR/jq"  # batch decoding needs real jq
+    command -v jq >/dev/null || skip "jq not installed"
+    printf '%s\n' '{"id":1,"task":"Fix typo in README"}' '"Migrate all API endpoints to v2"' \
+        > "$TEST_TMPDIR/tasks.jsonl"
+    run bash -c "env HOME='$TEST_HOME' PATH='$TEST_PATH' bash '$RALPH_SCRIPT' classify --batch \
+        < '$TEST_TMPDIR/tasks.jsonl' > '$TEST_TMPDIR/routes.jsonl'"
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"Classified 2 tasks"*"tasks/s"* ]]
+    [ "$(wc -l < "$TEST_TMPDIR/routes.jsonl")" -eq 2 ]
+    run jq -r '[.id, .workflow_route, .classification.information_density] | @tsv' "$TEST_TMPDIR/routes.jsonl"
+    [[ "$output" == *$'1\tFAST_PATH\tCONSTANT'* ]]
+    [[ "$output" == *$'\tSTANDARD\tLINEAR'* ]]
+}
+
+@test "cmd_classify --bench reports per-call latency" {
+    run_cli classify --bench 20
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"20 calls"*"us/call"* ]]
+}
+
+@test "cmd_fast_path accepts trivial task" {
+    run_cli fast-path "Fix typo"
+    [ "$status" -eq 0 ]
+    [[ "$output" == *"qualifies for FAST_PATH"* ]]
+}
+
 @test "cmd_status basic invocation" {
     run_cli status
     [ "$status" -eq 0 ]
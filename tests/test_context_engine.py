@@ -20,6 +20,22 @@ SCRIPTS_DIR = Path.home() / ".claude" / "scripts"
 sys.path.insert(0, str(SCRIPTS_DIR))
 
 
+def load_script(name, module_name):
+    import importlib.util
+    spec = importlib.util.spec_from_file_location(module_name, SCRIPTS_DIR / name)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(autouse=True)
+def isolated_vector_index(tmp_path, monkeypatch):
+    """Saves feed the shared vector index; keep it out of the real ~/.ralph."""
+    index_dir = tmp_path / "vector-index"
+    monkeypatch.setenv("RALPH_INDEX_DIR", str(index_dir))
+    return index_dir
+
+
 class TestLedgerManager:
     """Tests for ledger-manager.py - Context preservation across sessions."""
 
@@ -193,6 +209,46 @@ class TestLedgerManager:
         mode = oct(path.stat().st_mode)[-3:]
         assert mode == "600", f"Expected 600 permissions, got {mode}"
 
+    def test_index_tracks_save_and_delete(self, manager, ledger_dir):
+        """Test that the sidecar index is updated on save/delete (v2.50)."""
+        manager.save(session_id="idx-a", goal="First goal", project="proj")
+        manager.save(session_id="idx-b", goal="Second goal", project="proj")
+        manager.delete("idx-a")
+
+        assert (ledger_dir / ".ledger-index.sqlite3").exists()
+        assert manager.stats()["count"] == 1
+        ledgers = manager.list_ledgers(limit=10)
+        assert [entry["session_id"] for entry in ledgers] == ["idx-b"]
+        assert ledgers[0]["goal"] == "Second goal"
+        assert ledgers[0]["project"] == "proj"
+
+    def test_index_reconciles_external_changes(self, manager, ledger_dir):
+        """Test that ledgers added or removed outside the manager are picked up."""
+        manager.save(session_id="kept", goal="Kept")
+        manager.save(session_id="removed", goal="Removed")
+        (ledger_dir / "CONTINUITY_RALPH-removed.md").unlink()
+        (ledger_dir / "CONTINUITY_RALPH-copied.md").write_text(
+            "# CONTINUITY_RALPH: copied\n\n## CURRENT GOAL\nCopied in by hand\n"
+        )
+
+        ids = {entry["session_id"]: entry for entry in manager.list_ledgers(limit=10)}
+        assert set(ids) == {"kept", "copied"}
+        assert ids["copied"]["goal"] == "Copied in by hand"
+        assert manager.load("removed") is None
+
+    def test_index_catches_in_place_rewrites(self, manager, ledger_dir):
+        """Rewriting a ledger in place leaves the directory mtime alone but is still seen."""
+        manager.save(session_id="edited", goal="Before")
+        path = ledger_dir / "CONTINUITY_RALPH-edited.md"
+        dir_mtime = ledger_dir.stat().st_mtime_ns
+        with open(path, "w") as f:
+            f.write("# CONTINUITY_RALPH: edited\n\n## CURRENT GOAL\nAfter the edit\n")
+        os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+        assert ledger_dir.stat().st_mtime_ns == dir_mtime
+
+        assert manager.list_ledgers(limit=1)[0]["goal"] == "After the edit"
+        assert "After the edit" in manager.load("edited")
+
 
 class TestHandoffGenerator:
     """Tests for handoff-generator.py - Context transfer between sessions."""
@@ -322,6 +378,195 @@ class TestHandoffGenerator:
         assert session_dir.exists()
         assert session_dir.is_dir()
 
+    def test_search_ranks_and_matches_phrases(self, generator, handoff_dir):
+        """Test BM25 ranking and phrase queries over the search index (v2.50)."""
+        generator.create(session_id="one", trigger="test",
+                         context_summary=["token refresh for the payment service"])
+        generator.create(session_id="two", trigger="test",
+                         context_summary=["payment token", "payment retries", "payment docs"])
+
+        ranked = generator.search("payment")
+        assert [r["session_id"] for r in ranked] == ["two", "one"]
+
+        phrase = generator.search('"token refresh"')
+        assert [r["session_id"] for r in phrase] == ["one"]
+        assert generator.search('"refresh token"') == []
+
+    def test_search_index_follows_cleanup_and_external_removal(self, generator, handoff_dir):
+        """Test that cleanup and files removed by hand drop out of the index."""
+        import time as _time
+        old = generator.create(session_id="aging", trigger="test", context_summary=["stale marker"])
+        generator.create(session_id="aging", trigger="test", context_summary=["fresh marker"])
+        past = _time.time() - 30 * 86400
+        os.utime(old, (past, past))
+        generator.index.reconcile()
+
+        assert generator.cleanup_old(days=7, keep_min=1) == 1
+        assert generator.search("stale") == []
+
+        gone = generator.create(session_id="manual", trigger="test", context_summary=["removed by hand"])
+        gone.unlink()
+        assert generator.search("removed") == []
+        assert [r["snippet"] for r in generator.search("fresh")]
+
+
+class TestVectorIndex:
+    """Tests for vector-index.py - shared similarity index (v2.50)."""
+
+    @pytest.fixture
+    def vectors(self):
+        return load_script("vector-index.py", "vector_index")
+
+    @pytest.fixture
+    def index(self, vectors, isolated_vector_index):
+        index = vectors.VectorIndex(isolated_vector_index)
+        yield index
+        index.close()
+
+    def test_nearest_documents_ranked_by_similarity(self, index):
+        """Related text ranks first; sessions collapse to their best hit."""
+        index.add("a", "Implement JWT authentication middleware", "ledger", session_id="auth")
+        index.add("b", "JWT token refresh for authentication", "handoff", session_id="auth")
+        index.add("c", "Migrate billing database to PostgreSQL", "ledger", session_id="db")
+
+        hits = index.search("jwt authentication", limit=3)
+        assert [h["session_id"] for h in hits[:2]] == ["auth", "auth"]
+        assert hits[0]["score"] >= hits[1]["score"] > 0
+
+        sessions = index.search("jwt authentication", limit=3, sessions=True)
+        assert [h["session_id"] for h in sessions] == ["auth", "db"][:len(sessions)]
+        assert index.search("postgresql migration", limit=1)[0]["key"] == "c"
+        assert {h["source"] for h in index.search("postgresql", limit=5, source="handoff")} == {"handoff"}
+
+    def test_replace_and_compact_keep_results(self, index):
+        """Re-adding a key replaces it; compaction drops dead rows only."""
+        index.add("a", "OAuth login flow", "semantic")
+        index.add("b", "Rate limiter design", "semantic")
+        index.add("a", "Kubernetes deployment manifests", "semantic")
+        assert index.stats()["dead_rows"] == 1
+        assert [h["key"] for h in index.search("oauth login")] != ["a"]
+
+        index.compact()
+        stats = index.stats()
+        assert stats["count"] == 2 and stats["dead_rows"] == 0
+        assert index.search("kubernetes deployment")[0]["key"] == "a"
+        assert index.search("rate limiter")[0]["key"] == "b"
+
+    def test_truncated_vector_file_triggers_rebuild(self, index):
+        """A vector file shorter than the row count is not mapped; the index starts over."""
+        index.add("a", "OAuth login flow", "semantic")
+        index.add("b", "Rate limiter design", "semantic")
+        path = index._vectors_path(index._meta("generation"))
+        path.write_bytes(path.read_bytes()[:100])
+
+        assert index.search("oauth login") == []
+        assert index.stats()["count"] == 0
+        index.add("c", "OAuth login flow", "semantic")
+        assert index.search("oauth login")[0]["key"] == "c"
+
+    def test_ledgers_and_handoffs_feed_the_index(self, vectors, index, tmp_path):
+        """Saving feeds the index; delete and cleanup remove entries."""
+        ledgers = load_script("ledger-manager.py", "ledger_manager").LedgerManager(tmp_path / "l")
+        handoffs = load_script("handoff-generator.py", "handoff_generator").HandoffGenerator(
+            tmp_path / "h"
+        )
+        ledgers.save("auth-session", "Implement JWT authentication")
+        path = handoffs.create("db-session", context_summary=["Postgres billing migration"])
+
+        assert index.search("jwt authentication", limit=1)[0]["session_id"] == "auth-session"
+        hit = index.search("postgres billing", limit=1)[0]
+        assert (hit["source"], hit["path"]) == ("handoff", str(path))
+
+        ledgers.delete("auth-session")
+        assert handoffs.cleanup_old(days=-1, keep_min=0) == 1
+        assert index.stats()["count"] == 0
+
+    def test_rank_breaks_down_signals(self, index):
+        """fork-suggest ranking combines term, files, project, plan and recency."""
+        now = 1_700_000_000.0
+        index.add("old", "JWT authentication middleware", "ledger", session_id="old",
+                  project="api", updated=now - 120 * 86400, files=["src/auth/jwt.ts"])
+        index.add("new", "JWT authentication middleware", "ledger", session_id="new",
+                  project="web", updated=now, files=["docs/readme.md"])
+        index.add("off", "Rotate the TLS certificates", "ledger", session_id="off",
+                  project="api", updated=now)
+
+        hits = index.rank("jwt authentication", changed_files=["src/auth/jwt.ts"],
+                          project="api", limit=5, now=now)
+        assert [h["session_id"] for h in hits][:2] == ["old", "new"]
+        old, new = hits[0]["signals"], hits[1]["signals"]
+        assert set(old) == {"term", "plan", "files", "recency", "project"}
+        assert old["files"] > 0.9 and new["files"] == 0
+        assert old["project"] == 1 and new["project"] == 0
+        assert new["recency"] == 1 and old["recency"] < 0.01
+        assert "off" not in [h["session_id"] for h in hits]  # no term/file/plan overlap
+
+        assert [h["session_id"] for h in index.rank("jwt authentication", now=now)] \
+            == ["new", "old"]  # equal text: recency decides
+        planned = index.rank("jwt authentication", plan_text="rotate tls certificates",
+                             now=now, limit=5)
+        assert {h["session_id"]: h["signals"]["plan"] for h in planned}["off"] > 0.5
+
+    def test_rank_numpy_and_stdlib_agree(self, vectors, index, monkeypatch):
+        """Both scoring paths return the same stable order."""
+        for i in range(40):
+            index.add(f"k{i}", f"session {i % 5} auth token cache", "ledger",
+                      session_id=f"s{i}", updated=1_700_000_000.0 + i % 3)
+        first = [h["key"] for h in index.rank("auth token", limit=10, now=1_700_000_100.0)]
+        monkeypatch.setattr(vectors, "np", None)
+        second = [h["key"] for h in index.rank("auth token", limit=10, now=1_700_000_100.0)]
+        assert first == second and len(first) == 10
+
+    @staticmethod
+    def _add_sessions(index, total):
+        """`total` single-document sessions through the public add_many()."""
+        import random
+        rng = random.Random(7)
+        words = ("auth token login route refresh billing postgres migration deploy cache "
+                 "queue worker retry session middleware jwt oauth schema index vector").split()
+        index.add_many(
+            dict(key=f"k{i}", text=" ".join(rng.sample(words, 6)), source="ledger",
+                 session_id=f"s{i}", project=rng.choice(("api", "web")),
+                 updated=1_700_000_000.0 - rng.uniform(0, 500) * 86400,
+                 files=[f"src/{rng.choice(words)}/{rng.choice(words)}.ts"])
+            for i in range(total)
+        )
+
+    RANK_ARGS = ("implement jwt authentication", "add login route and token refresh",
+                 ["src/auth/jwt.ts", "src/routes/login.ts"], "api", 5)
+
+    def test_rank_reads_metadata_for_top_candidates_only(self, index):
+        """Scoring stays in the vector file; SQLite is read for the top-k window only."""
+        self._add_sessions(index, 2_000)
+        statements = []
+        index.conn.set_trace_callback(statements.append)
+        try:
+            hits = index.rank(*self.RANK_ARGS)
+        finally:
+            index.conn.set_trace_callback(None)
+
+        assert len(hits) == 5
+        lookups = [s for s in statements if "FROM items WHERE row" in s]
+        assert 5 <= len(lookups) <= 32  # the first candidate window, not 2,000 rows
+        assert len(statements) - len(lookups) <= 5  # transaction and meta reads
+
+    @pytest.mark.benchmark
+    def test_rank_benchmark_50k_sessions(self, vectors, index):
+        """Ranking 50k sessions stays under 100 ms (vectorized path)."""
+        pytest.importorskip("numpy")
+        self._add_sessions(index, 50_000)
+
+        index.rank(*self.RANK_ARGS)  # warm the page cache
+        best = min(_timed(index.rank, *self.RANK_ARGS) for _ in range(3))
+        assert best < 0.1, f"rank over 50000 sessions took {best * 1000:.0f} ms"
+
+
+def _timed(fn, *args):
+    import time
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
 
 class TestCLIIntegration:
     """Integration tests for CLI commands."""
@@ -449,6 +694,197 @@ class TestHooksIntegration:
         assert output["continue"] is True
 
 
+class TestContextEngineDaemon:
+    """Tests for context-engine-daemon.py (v2.50) - resident ledger/handoff engine."""
+
+    REPO_DAEMON = Path(__file__).parent.parent / ".claude" / "scripts" / "context-engine-daemon.py"
+
+    FAKE_LEDGER = """
+import argparse, sys
+from pathlib import Path
+
+LEDGERS = Path.home() / ".ralph" / "ledgers"
+
+def main():
+    parser = argparse.ArgumentParser(description="Context preservation")
+    sub = parser.add_subparsers(dest="cmd")
+    save = sub.add_parser("save")
+    save.add_argument("--session")
+    sub.add_parser("list")
+    sub.add_parser("show")
+    args = parser.parse_args()
+    if args.cmd == "save":
+        (LEDGERS / f"CONTINUITY_RALPH-{args.session}.md").write_text(args.session)
+        print("saved", args.session)
+    elif args.cmd == "list":
+        for path in sorted(LEDGERS.iterdir()):
+            print(path.name)
+    elif args.cmd == "show":
+        print("no ledger", file=sys.stderr)
+        sys.exit(3)
+
+if __name__ == "__main__":
+    main()
+"""
+
+    @pytest.fixture
+    def engine_home(self, tmp_path):
+        """HOME with the daemon next to a stub ledger-manager.py."""
+        import shutil
+
+        scripts = tmp_path / ".claude" / "scripts"
+        scripts.mkdir(parents=True)
+        (tmp_path / ".ralph" / "ledgers").mkdir(parents=True)
+        (tmp_path / ".ralph" / "handoffs").mkdir(parents=True)
+        shutil.copy(self.REPO_DAEMON, scripts / "context-engine-daemon.py")
+        (scripts / "ledger-manager.py").write_text(self.FAKE_LEDGER)
+        (scripts / "handoff-generator.py").write_text(self.FAKE_LEDGER)
+        return tmp_path
+
+    def _run(self, home, *args):
+        env = dict(os.environ, HOME=str(home))
+        env.pop("RALPH_CONTEXT_ENGINE_SOCKET", None)
+        return subprocess.run(
+            [sys.executable, str(home / ".claude" / "scripts" / "context-engine-daemon.py"), *args],
+            capture_output=True, text=True, env=env, timeout=15
+        )
+
+    @pytest.fixture
+    def daemon(self, engine_home):
+        """Start the daemon and wait for its socket."""
+        import time
+
+        env = dict(os.environ, HOME=str(engine_home))
+        env.pop("RALPH_CONTEXT_ENGINE_SOCKET", None)
+        proc = subprocess.Popen(
+            [sys.executable, str(engine_home / ".claude" / "scripts" / "context-engine-daemon.py"),
+             "serve", "--idle-timeout", "30"],
+            env=env
+        )
+        sock = engine_home / ".ralph" / "run" / "context-engine.sock"
+        for _ in range(100):
+            if sock.exists():
+                break
+            time.sleep(0.05)
+        yield engine_home
+        self._run(engine_home, "stop")
+        proc.wait(timeout=10)
+
+    def test_run_falls_back_without_daemon(self, engine_home):
+        """Without a socket, run behaves exactly like the one-shot script."""
+        (engine_home / ".ralph" / "ledgers" / "CONTINUITY_RALPH-a.md").write_text("a")
+        result = self._run(engine_home, "run", "ledger", "list")
+        assert result.returncode == 0
+        assert "CONTINUITY_RALPH-a.md" in result.stdout
+
+    def test_socket_permissions(self, daemon):
+        """Socket must only be reachable by the owner."""
+        sock = daemon / ".ralph" / "run" / "context-engine.sock"
+        assert oct(sock.stat().st_mode)[-3:] == "600"
+
+    def test_run_through_daemon_preserves_output_and_exit(self, daemon):
+        """stdout, stderr and exit code come back unchanged."""
+        result = self._run(daemon, "run", "ledger", "save", "--session", "s1")
+        assert result.returncode == 0
+        assert "saved s1" in result.stdout
+
+        result = self._run(daemon, "run", "ledger", "show")
+        assert result.returncode == 3
+        assert "no ledger" in result.stderr
+
+    def test_read_cache_invalidated_by_new_files(self, daemon):
+        """Repeated reads hit the cache until the ledger directory changes."""
+        self._run(daemon, "run", "ledger", "list")
+        self._run(daemon, "run", "ledger", "list")
+        status = json.loads(self._run(daemon, "status").stdout)
+        assert status["cache_hits"] >= 1
+        assert status["modules_loaded"] == ["ledger"]
+
+        (daemon / ".ralph" / "ledgers" / "CONTINUITY_RALPH-new.md").write_text("new")
+        result = self._run(daemon, "run", "ledger", "list")
+        assert "CONTINUITY_RALPH-new.md" in result.stdout
+
+    def test_read_cache_is_per_cwd(self, daemon):
+        """The same read from another directory is not served from cache."""
+        elsewhere = daemon / "project"
+        elsewhere.mkdir()
+        env = dict(os.environ, HOME=str(daemon))
+        env.pop("RALPH_CONTEXT_ENGINE_SOCKET", None)
+        script = daemon / ".claude" / "scripts" / "context-engine-daemon.py"
+        for cwd in (daemon, elsewhere):
+            subprocess.run([sys.executable, str(script), "run", "ledger", "list"],
+                           cwd=cwd, env=env, capture_output=True, timeout=15)
+        status = json.loads(self._run(daemon, "status").stdout)
+        assert status["cache_hits"] == 0
+        assert status["cache_entries"] == 2
+
+    def test_broken_tool_module_does_not_kill_daemon(self, daemon):
+        """A syntax error in one tool falls back to the script; the daemon keeps serving."""
+        scripts = daemon / ".claude" / "scripts"
+        (scripts / "handoff-generator.py").write_text("def main(:\n")
+
+        broken = self._run(daemon, "run", "handoff", "list")
+        assert broken.returncode == 1
+        assert "SyntaxError" in broken.stderr
+
+        status = self._run(daemon, "status")
+        assert status.returncode == 0
+        assert json.loads(status.stdout)["ok"] is True
+        assert self._run(daemon, "run", "ledger", "list").returncode == 0
+
+    def test_read_cache_is_bounded(self, engine_home, monkeypatch):
+        """The least recently used read results are evicted past the cap."""
+        import importlib.util
+
+        monkeypatch.setenv("HOME", str(engine_home))
+        path = engine_home / ".claude" / "scripts" / "context-engine-daemon.py"
+        spec = importlib.util.spec_from_file_location("context_engine_daemon", path)
+        daemon_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(daemon_module)
+        monkeypatch.setattr(daemon_module, "CACHE_MAX_ENTRIES", 2)
+
+        engine = daemon_module.ContextEngine()
+        engine._invoke = lambda tool, argv, cwd: (0, " ".join(argv), "")
+        cwd = str(engine_home)
+        engine.run("ledger", ["list", "a"], cwd)
+        engine.run("ledger", ["list", "b"], cwd)
+        engine.run("ledger", ["list", "a"], cwd)  # hit: "a" is now most recent
+        engine.run("ledger", ["list", "c"], cwd)
+
+        assert [key[2] for key in engine.cache] == [("list", "a"), ("list", "c")]
+
+    def test_lost_reply_does_not_rerun_writes(self, engine_home):
+        """A write whose reply is lost is reported, not replayed via the one-shot script."""
+        import socket
+        import threading
+
+        sock_path = engine_home / ".ralph" / "run" / "context-engine.sock"
+        sock_path.parent.mkdir(parents=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(str(sock_path))
+        server.listen(4)
+
+        def drop_connections():
+            for _ in range(2):
+                conn, _ = server.accept()
+                conn.recv(65536)
+                conn.close()
+
+        thread = threading.Thread(target=drop_connections, daemon=True)
+        thread.start()
+        try:
+            write = self._run(engine_home, "run", "ledger", "save", "--session", "s1")
+            read = self._run(engine_home, "run", "ledger", "list")
+        finally:
+            thread.join(timeout=5)
+            server.close()
+
+        assert write.returncode == 1
+        assert "not retrying" in write.stderr
+        assert not (engine_home / ".ralph" / "ledgers" / "CONTINUITY_RALPH-s1.md").exists()
+        assert read.returncode == 0
+
+
 class TestFeatureFlags:
     """Tests for feature flag system."""
 
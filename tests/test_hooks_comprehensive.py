@@ -636,6 +636,139 @@ class TestPerformance:
         )
 
 
+class TestQueryCache:
+    """Tests for the v2.50 query-keyed memory-context cache."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        if not PROJECT_HOOK.exists():
+            pytest.skip(f"Hook not found: {PROJECT_HOOK}")
+        self.home = tmp_path / "home"
+        self.project = tmp_path / "project"
+        self.ledgers = self.home / ".ralph" / "ledgers"
+        self.ledgers.mkdir(parents=True)
+        self.project.mkdir()
+        (self.ledgers / "CONTINUITY_RALPH-first.md").write_text(
+            "# CONTINUITY_RALPH: first\n\n## CURRENT GOAL\nOAuth login flow\n"
+        )
+
+    def run(self, prompt):
+        result = run_hook(PROJECT_HOOK, create_valid_task_input(prompt),
+                          cwd=str(self.project), env={"HOME": str(self.home)})
+        assert result["is_valid_json"], result["stdout"]
+        context = json.loads((self.project / ".claude" / "memory-context.json").read_text())
+        return result["output"], context
+
+    def test_related_prompts_share_cache_entry(self):
+        """Same keyword set in a different prompt is served from cache."""
+        output, context = self.run("continue the oauth login work")
+        assert "cached" not in output.get("message", "").lower()
+        assert context["sources"]["ledgers"]["count"] == 1
+
+        output, context = self.run("Login OAuth: continue work")
+        assert "Using cached" in output.get("message", "")
+        assert context["sources"]["ledgers"]["count"] == 1
+
+    def test_new_ledger_invalidates_only_that_source(self):
+        """A new ledger is reflected immediately; other sources stay cached."""
+        self.run("continue the oauth login work")
+        time.sleep(0.05)
+        (self.ledgers / "CONTINUITY_RALPH-second.md").write_text(
+            "# CONTINUITY_RALPH: second\n\n## CURRENT GOAL\nOAuth token refresh\n"
+        )
+
+        output, context = self.run("continue the oauth login work")
+        assert "cached" not in output.get("message", "").lower()
+        assert context["sources"]["ledgers"]["count"] == 2
+        assert context["cached_sources"] == len(context["sources"]) - 1
+
+
+class TestVectorSource:
+    """Tests for the v2.50 vector index source and fork suggestions."""
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        if not PROJECT_HOOK.exists():
+            pytest.skip(f"Hook not found: {PROJECT_HOOK}")
+        self.home = tmp_path / "home"
+        self.project = tmp_path / "project"
+        scripts = self.home / ".claude" / "scripts"
+        scripts.mkdir(parents=True)
+        for name in ("vector-index.py", "ledger-manager.py"):
+            (scripts / name).symlink_to(PROJECT_ROOT / ".claude" / "scripts" / name)
+        self.project.mkdir()
+        env = {**os.environ, "HOME": str(self.home)}
+        env.pop("RALPH_INDEX_DIR", None)
+        for sid, goal in (("jwt-work", "Implement JWT authentication middleware"),
+                          ("db-work", "Migrate the billing database to PostgreSQL")):
+            subprocess.run(["python3", str(scripts / "ledger-manager.py"), "save",
+                            "--session", sid, "--goal", goal],
+                           env=env, capture_output=True, check=True, timeout=30)
+
+    def test_nearest_sessions_become_fork_suggestions(self):
+        """Sessions from the vector index are ranked into fork_suggestions."""
+        result = run_hook(PROJECT_HOOK, create_valid_task_input("add authentication with jwt"),
+                          cwd=str(self.project), env={"HOME": str(self.home)})
+        assert result["is_valid_json"], result["stdout"]
+        context = json.loads((self.project / ".claude" / "memory-context.json").read_text())
+        assert context["sources"]["vectors"]["status"] == "ok"
+        suggestions = context["fork_suggestions"]
+        assert suggestions[0]["session"] == "jwt-work"
+        assert suggestions[0]["score"] > suggestions[-1]["score"] or len(suggestions) == 1
+
+
+class TestSourceDeadlines:
+    """Tests for v2.50 per-source deadlines and partial results."""
+
+    SLOW_MEMVID = "import time\ntime.sleep(4)\nprint('memvid: oauth login decision')\n"
+
+    @pytest.fixture(autouse=True)
+    def setup(self, tmp_path):
+        if not PROJECT_HOOK.exists():
+            pytest.skip(f"Hook not found: {PROJECT_HOOK}")
+        self.home = tmp_path / "home"
+        self.project = tmp_path / "project"
+        (self.home / ".claude" / "scripts").mkdir(parents=True)
+        (self.home / ".claude" / "scripts" / "memvid-core.py").write_text(self.SLOW_MEMVID)
+        (self.home / ".ralph" / "memory").mkdir(parents=True)
+        (self.home / ".ralph" / "memory" / "ralph-memory.mv2").write_text("")
+        self.project.mkdir()
+
+    def run(self):
+        result = run_hook(PROJECT_HOOK, create_valid_task_input("continue the oauth login work"),
+                          cwd=str(self.project),
+                          env={"HOME": str(self.home), "RALPH_MEMORY_DEADLINE_MEMVID_MS": "300"})
+        assert result["is_valid_json"], result["stdout"]
+        context = json.loads((self.project / ".claude" / "memory-context.json").read_text())
+        return result, context
+
+    def test_slow_source_times_out_with_partial_result(self):
+        """A slow source does not hold up the hook; it is reported as timed out."""
+        result, context = self.run()
+        assert result["execution_time"] < 3.5
+        assert context["partial"] is True
+        memvid = context["sources"]["memvid"]
+        assert memvid["status"] == "timeout"
+        assert memvid["count"] == 0
+        for source in context["sources"].values():
+            assert {"status", "latency_ms", "count"} <= set(source)
+
+    def test_late_result_backfills_cache(self):
+        """The late source's result is cached for the next call."""
+        self.run()
+        cached = list((self.home / ".ralph" / "cache" / "memory-search").glob("*/*/memvid.json"))
+        deadline = time.time() + 10
+        while not cached and time.time() < deadline:
+            time.sleep(0.2)
+            cached = list((self.home / ".ralph" / "cache" / "memory-search").glob("*/*/memvid.json"))
+        assert cached, "late memvid result was not written to the cache"
+
+        _, context = self.run()
+        assert context["partial"] is False
+        assert context["sources"]["memvid"]["status"] == "cached"
+        assert context["sources"]["memvid"]["count"] == 1
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # Category 7: INJECT-SESSION-CONTEXT HOOK TESTS
 # ═══════════════════════════════════════════════════════════════════════════════
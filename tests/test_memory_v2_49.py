@@ -17,6 +17,7 @@ import json
 import os
 import subprocess
 import tempfile
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, Any
@@ -243,6 +244,105 @@ class TestReflectionExecutor:
                 temp_path.unlink()
 
 
+class TestStreamingExtraction:
+    """Tests for v2.50 checkpointed, streaming transcript extraction."""
+
+    @pytest.fixture
+    def reflection(self, tmp_path, monkeypatch):
+        if not REFLECTION_EXECUTOR.exists():
+            pytest.skip(f"Script not found: {REFLECTION_EXECUTOR}")
+        import importlib.util
+        monkeypatch.setenv("RALPH_VECTOR_INDEX", "off")
+        spec = importlib.util.spec_from_file_location("reflection_executor", REFLECTION_EXECUTOR)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        mm = module.memory_manager()
+        config = json.loads(json.dumps(mm.DEFAULT_CONFIG))
+        config["lifecycle"]["auto_compact"] = False
+        manager = mm.MemoryManager(config=config, episodes_dir=tmp_path / "episodes",
+                                   semantic_file=tmp_path / "semantic.json",
+                                   procedural_file=tmp_path / "procedural" / "rules.json")
+        return module, manager, tmp_path / "checkpoints"
+
+    @staticmethod
+    def turn(role, text):
+        return json.dumps({"type": role, "message": {"role": role, "content": text}}) + "\n"
+
+    def test_rerun_only_reads_new_turns(self, reflection, tmp_path):
+        module, manager, checkpoints = reflection
+        transcript = tmp_path / "session.jsonl"
+        first = (self.turn("user", "Add OAuth login")
+                 + self.turn("assistant", "We decided to use PKCE for the flow.")
+                 + self.turn("assistant", "Implemented the callback handler."))
+        partial = self.turn("assistant", "Turns out the redirect URI must match exactly.")
+        transcript.write_text(first + partial[:20])
+
+        result = module.extract(transcript, manager, checkpoint_dir=checkpoints)
+        assert result["turns"] == 3
+        assert result["to_offset"] == len(first.encode())  # partial line left for later
+        episode = manager.episodes.get(result["episode_id"])
+        assert episode["task"] == "Add OAuth login"
+        assert "We decided to use PKCE for the flow." in episode["learnings"]
+
+        with open(transcript, "a") as f:
+            f.write(partial[20:] + self.turn("assistant", "Error: token refresh failed."))
+        second = module.extract(transcript, manager, checkpoint_dir=checkpoints)
+        assert second["from_offset"] == result["to_offset"]
+        assert second["turns"] == 2 and second["total_turns"] == 5
+        # One episode per session, replaced with the cumulative state
+        assert second["episode_id"] == result["episode_id"]
+        episode = manager.episodes.get(second["episode_id"])
+        assert episode["task"] == "Add OAuth login" and episode["turns"] == 5
+        assert episode["learnings"] == ["Turns out the redirect URI must match exactly.",
+                                        "We decided to use PKCE for the flow."]
+        assert episode["errors"] == ["Error: token refresh failed."]
+        assert [e["turns"] for e in manager.episodes.iter_episodes()] == [5]
+        assert manager.episodes.stats()["episodes"] == 1
+
+        third = module.extract(transcript, manager, checkpoint_dir=checkpoints)
+        assert third["episode_id"] is None and third["turns"] == 0
+
+        transcript.write_text(self.turn("user", "Start over"))  # truncated: re-read from 0
+        fourth = module.extract(transcript, manager, checkpoint_dir=checkpoints)
+        assert fourth["from_offset"] == 0 and fourth["turns"] == 1
+        assert fourth["episode_id"] != result["episode_id"]
+
+    def test_overlong_lines_are_skipped_unbuffered(self, reflection):
+        import io
+        module = reflection[0]
+        data = b'{"a": 1}\n' + b"x" * 100 + b'\n{"b": 2}\n{"c"'
+        lines = list(module.iter_lines(io.BytesIO(data), max_bytes=16))
+        assert [line for _end, line in lines] == [b'{"a": 1}\n', None, b'{"b": 2}\n']
+        assert lines[-1][0] == len(data) - len(b'{"c"')
+
+    def test_recurring_learnings_become_rules(self, reflection, tmp_path):
+        module, manager, checkpoints = reflection
+        for n in range(4):
+            transcript = tmp_path / f"session-{n}.jsonl"
+            transcript.write_text(self.turn("user", f"Task {n}")
+                                  + self.turn("assistant", "Root cause was a stale lockfile."))
+            module.extract(transcript, manager, session_id=f"s{n}", checkpoint_dir=checkpoints)
+
+        patterns = module.detect_patterns(manager)
+        assert [p["occurrences"] for p in patterns] == [4]
+        assert module.save_rules(manager, patterns) == 1
+        rule = manager.rules()[0]
+        assert rule["behavior"] == "Root cause was a stale lockfile."
+        assert rule["confidence"] >= 0.8
+
+    def test_transcript_outside_allowed_dirs_rejected(self, tmp_path):
+        if not REFLECTION_EXECUTOR.exists():
+            pytest.skip(f"Script not found: {REFLECTION_EXECUTOR}")
+        outside = tmp_path / "transcript.jsonl"
+        outside.write_text('{"type": "message", "content": "hello"}\n')
+        result = subprocess.run(
+            ["python3", str(REFLECTION_EXECUTOR), "extract", str(outside)],
+            capture_output=True, text=True, timeout=30
+        )
+        assert result.returncode == 1
+        assert "outside allowed directories" in result.stderr
+
+
 class TestHotPathHooks:
     """Tests for Hot Path hooks."""
 
@@ -317,6 +417,55 @@ class TestHotPathHooks:
         assert output.get("decision") == "continue"
 
 
+class TestMemoryTriggerFastPath:
+    """Tests for the v2.50 two-tier memory-write-trigger.sh."""
+
+    def test_no_trigger_path_under_5ms(self):
+        """Prompts without a trigger are answered by pure bash (no jq/python)."""
+        if not MEMORY_TRIGGER_HOOK.exists():
+            pytest.skip(f"Hook not found: {MEMORY_TRIGGER_HOOK}")
+        input_bytes = json.dumps({"user_prompt": "Fix the bug in the login page " * 20}).encode()
+        # Best of several runs: detached writers started by earlier trigger
+        # tests may still be competing for the CPU
+        timings = []
+        deadline = time.time() + 3
+        while not timings or (min(timings) >= 5 and time.time() < deadline):
+            start = time.perf_counter()
+            result = subprocess.run(["bash", str(MEMORY_TRIGGER_HOOK)], input=input_bytes,
+                                    capture_output=True, timeout=10)
+            timings.append((time.perf_counter() - start) * 1000)
+            assert json.loads(result.stdout) == {"decision": "continue"}
+        assert min(timings) < 5, f"no-trigger path took {min(timings):.2f}ms"
+
+    def test_trigger_writes_fact_detached(self, tmp_path):
+        """A trigger stores the prompt via memory-manager.py in the background."""
+        if not MEMORY_TRIGGER_HOOK.exists():
+            pytest.skip(f"Hook not found: {MEMORY_TRIGGER_HOOK}")
+        (tmp_path / ".claude").mkdir()
+        (tmp_path / ".claude" / "scripts").symlink_to(CLAUDE_DIR / "scripts")
+        config = tmp_path / ".ralph" / "config" / "memory-config.json"
+        config.parent.mkdir(parents=True)
+        config.write_text(json.dumps({"hot_path": {"enabled": True, "auto_triggers": ["jot down"]}}))
+        env = {**os.environ, "HOME": str(tmp_path), "RALPH_VECTOR_INDEX": "off"}
+
+        def run(prompt):
+            result = subprocess.run(["bash", str(MEMORY_TRIGGER_HOOK)],
+                                    input=json.dumps({"prompt": prompt}), capture_output=True,
+                                    text=True, timeout=10, env=env)
+            return json.loads(result.stdout)
+
+        assert "memory_trigger" not in run("Please remember this")  # not a configured trigger
+        output = run("Jot down: --staging uses port 8443")
+        assert output["memory_trigger"] == {"detected": True, "trigger": "jot down"}
+
+        semantic = tmp_path / ".ralph" / "memory" / "semantic.json"
+        deadline = time.time() + 10
+        while not semantic.exists() and time.time() < deadline:
+            time.sleep(0.05)
+        facts = json.loads(semantic.read_text())["facts"]
+        assert [f["content"] for f in facts] == ["Jot down: --staging uses port 8443"]
+
+
 class TestColdPathHooks:
     """Tests for Cold Path hooks."""
 
@@ -390,6 +539,98 @@ class TestProceduralInjection:
         assert output.get("decision") == "continue"
 
 
+class TestProceduralMatcher:
+    """Tests for the v2.50 compiled procedural-rule matcher."""
+
+    @pytest.fixture
+    def matcher_module(self):
+        script = CLAUDE_DIR / "scripts" / "procedural-matcher.py"
+        if not script.exists():
+            pytest.skip(f"Script not found: {script}")
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("procedural_matcher", script)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    @staticmethod
+    def write_rules(path, rules):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps({"rules": rules}))
+
+    def make_matcher(self, module, tmp_path, min_confidence=0.8):
+        config = tmp_path / "memory-config.json"
+        config.write_text(json.dumps({"procedural": {"min_confidence": min_confidence}}))
+        return module.Matcher(rules_file=tmp_path / "rules.json", config_file=config,
+                              compiled_file=tmp_path / "rules.compiled.json")
+
+    def test_threshold_applied_at_compile_time(self, matcher_module, tmp_path):
+        self.write_rules(tmp_path / "rules.json", [
+            {"rule_id": "r1", "trigger": "database migration",
+             "behavior": "Back up the schema first", "confidence": 0.9},
+            {"rule_id": "r2", "trigger": "database migration",
+             "behavior": "Low confidence guess", "confidence": 0.5},
+        ])
+        matcher = self.make_matcher(matcher_module, tmp_path)
+        compiled = matcher.load()
+        assert [r[0] for r in compiled["rules"]] == ["r1"] and compiled["skipped"] == 1
+        assert [r["rule_id"] for r in matcher.match("Run the database migration")] == ["r1"]
+        assert matcher.match("Refactor the logger") == []
+
+    def test_recompiles_when_rules_change(self, matcher_module, tmp_path):
+        rules_file = tmp_path / "rules.json"
+        self.write_rules(rules_file, [{"rule_id": "r1", "trigger": "auth review",
+                                       "behavior": "Check token expiry", "confidence": 0.9}])
+        assert self.make_matcher(matcher_module, tmp_path).match("auth review")
+
+        self.write_rules(rules_file, [{"rule_id": "r2", "trigger": "deploy staging",
+                                       "behavior": "Run smoke tests", "confidence": 0.95}])
+        matcher = matcher_module.Matcher(rules_file=rules_file,
+                                         config_file=tmp_path / "memory-config.json",
+                                         compiled_file=tmp_path / "rules.compiled.json")
+        assert matcher.match("auth review") == []
+        assert [r["rule_id"] for r in matcher.match("deploy to staging")] == ["r2"]
+
+    def test_match_cost_flat_in_rule_count(self, matcher_module, tmp_path):
+        rules = [{"rule_id": f"r{i}", "trigger": f"component{i} subsystem{i % 97}",
+                  "behavior": f"Behavior {i}", "confidence": 0.9} for i in range(5000)]
+        rules.append({"rule_id": "hit", "trigger": "payment webhook retries",
+                      "behavior": "Make handlers idempotent", "confidence": 0.9})
+        self.write_rules(tmp_path / "rules.json", rules)
+        matcher = self.make_matcher(matcher_module, tmp_path)
+        matcher.load()
+        prompt = "Fix the payment webhook retries in the billing service " * 20
+
+        start = time.perf_counter()
+        for _ in range(100):
+            found = matcher.match(prompt)
+        per_call_ms = (time.perf_counter() - start) * 10
+        assert [r["rule_id"] for r in found] == ["hit"]
+        assert per_call_ms < 5, f"match took {per_call_ms:.2f}ms with 5000 rules"
+
+    def test_hook_injects_matching_rules(self, tmp_path):
+        if not PROCEDURAL_HOOK.exists():
+            pytest.skip(f"Hook not found: {PROCEDURAL_HOOK}")
+        (tmp_path / ".claude").mkdir()
+        (tmp_path / ".claude" / "scripts").symlink_to(CLAUDE_DIR / "scripts")
+        self.write_rules(tmp_path / ".ralph" / "procedural" / "rules.json", [
+            {"rule_id": "r1", "trigger": "authentication review",
+             "behavior": "Check session fixation", "confidence": 0.9},
+        ])
+        input_json = json.dumps({"tool_name": "Task", "tool_input": {
+            "prompt": "Review the authentication code", "description": "Code review"}})
+        result = subprocess.run(
+            ["bash", str(PROCEDURAL_HOOK)], input=input_json, capture_output=True,
+            text=True, timeout=10, env={**os.environ, "HOME": str(tmp_path)}
+        )
+        assert result.returncode == 0
+        output = json.loads(result.stdout)
+        assert output["decision"] == "continue"
+        context = output["hookSpecificOutput"]["additionalContext"]
+        assert context.startswith("Based on past experience:")
+        assert "Check session fixation" in context
+
+
 class TestEpisodicMemoryStorage:
     """Tests for episodic memory storage."""
 
@@ -420,6 +661,111 @@ class TestEpisodicMemoryStorage:
         episode_file.unlink()
 
 
+class TestEpisodicSegments:
+    """Tests for the v2.50 segment-file episodic store."""
+
+    @pytest.fixture
+    def store_module(self):
+        if not MEMORY_MANAGER.exists():
+            pytest.skip(f"Script not found: {MEMORY_MANAGER}")
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("memory_manager", MEMORY_MANAGER)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    @staticmethod
+    def episode(task, days_ago, now):
+        ts = datetime.fromtimestamp(now - days_ago * 86400).isoformat()
+        return {"task": task, "context": "pytest", "success": True, "timestamp": ts}
+
+    def test_append_get_and_header_stats(self, store_module, tmp_path):
+        """Episodes land in rolling segments; stats come from headers alone."""
+        store = store_module.EpisodicStore(tmp_path, segment_max_bytes=400)
+        now = time.time()
+        ids = store.append_many(self.episode(f"task number {i}", 0, now) for i in range(10))
+
+        month_dir = next(p for p in tmp_path.iterdir() if p.is_dir())
+        assert len(list(month_dir.glob("segment-*.jsonl"))) > 1
+        assert not list(month_dir.glob("ep-*.json"))
+        assert store.get(ids[7])["task"] == "task number 7"
+
+        with patch.object(store, "_read_segment", side_effect=AssertionError("segment read")):
+            stats = store.stats()
+        assert stats["episodes"] == 10 and stats["segments"] > 1
+
+    def test_compact_enforces_ttl_and_migrates_legacy(self, store_module, tmp_path):
+        """Expired segments go, straddling ones are trimmed, old legacy files fold in."""
+        store = store_module.EpisodicStore(tmp_path, segment_max_bytes=1 << 20)
+        now = time.time()
+        store.append(self.episode("ancient deploy", 90, now))
+        store.append(self.episode("stale migration", 40, now))
+        store.append(self.episode("fresh migration", 1, now))
+        legacy_dir = tmp_path / datetime.fromtimestamp(now - 2 * 86400).strftime("%Y-%m")
+        legacy_dir.mkdir(exist_ok=True)
+        legacy = legacy_dir / "ep-legacy.json"
+        legacy.write_text(json.dumps(dict(self.episode("legacy oauth", 2, now),
+                                          episode_id="ep-legacy")))
+        os.utime(legacy, (now - 7200, now - 7200))
+        recent = legacy_dir / "ep-recent.json"
+        recent.write_text(json.dumps(self.episode("recent legacy", 0, now)))
+
+        result = store.compact(ttl_days=30, now=now)
+
+        assert result["expired"] == 2 and result["migrated"] == 1
+        tasks = {e["task"] for e in store.iter_episodes()}
+        assert tasks == {"fresh migration", "legacy oauth", "recent legacy"}
+        assert not legacy.exists() and recent.exists()
+        assert store.get("ep-legacy")["task"] == "legacy oauth"
+        assert [e["task"] for e in store.search("migration")] == ["fresh migration"]
+
+    def test_get_reads_one_month_and_since_filters_episodes(self, store_module, tmp_path):
+        """get() opens only the id's month; search(since=) drops old episodes in a kept segment."""
+        store = store_module.EpisodicStore(tmp_path, segment_max_bytes=1 << 20)
+        now = time.time()
+        old_id = store.append(self.episode("deploy rollback 70 days ago", 70, now))
+        store.append(self.episode("deploy rollback 40 days ago", 40, now))
+        new_id = store.append(self.episode("deploy rollback today", 0, now))
+        assert len(store.months()) >= 2
+
+        with patch.object(store, "_locate", wraps=store._locate) as locate:
+            assert store.get(old_id)["task"] == "deploy rollback 70 days ago"
+        assert [call.args[0] for call in locate.call_args_list] == [
+            datetime.fromtimestamp(now - 70 * 86400).strftime("%Y-%m")]
+
+        # One segment can straddle the cutoff: filter by each episode's time
+        month_start = datetime.fromtimestamp(now).replace(
+            day=1, hour=0, minute=0, second=0, microsecond=0).timestamp()
+        store.append(dict(self.episode("deploy rollback at month start", 0, now),
+                          timestamp=datetime.fromtimestamp(month_start).isoformat()))
+        found = store.search("deploy rollback", since=(month_start + now) / 2)
+        assert [e["episode_id"] for e in found] == [new_id]
+
+    def test_replace_keeps_newest_version_until_compaction(self, store_module, tmp_path):
+        """Replaced episodes read as one; compaction drops the stale copies."""
+        store = store_module.EpisodicStore(tmp_path, segment_max_bytes=300)
+        now = time.time()
+        first = self.episode("session draft", 0, now)
+        episode_id = store.append(first)
+        store.append(self.episode("unrelated work", 0, now))
+        for version in range(2, 5):
+            store.append(dict(first, episode_id=episode_id, task=f"session v{version}"),
+                         replace=True)
+
+        assert store.get(episode_id)["task"] == "session v4"
+        assert sorted(e["task"] for e in store.iter_episodes()) == ["session v4", "unrelated work"]
+        assert store.stats()["episodes"] == 2
+
+        result = store.compact(ttl_days=30, now=now)
+
+        assert result["superseded"] == 3 and result["expired"] == 0
+        month_dir = next(p for p in tmp_path.iterdir() if p.is_dir())
+        lines = sum(len(p.read_text().splitlines()) for p in month_dir.glob("segment-*.jsonl"))
+        assert lines == 2
+        assert store.get(episode_id)["task"] == "session v4"
+        assert store.stats()["episodes"] == 2
+
+
 class TestProceduralMemoryStorage:
     """Tests for procedural memory storage."""
 
@@ -194,3 +194,44 @@ setup() {
     run grep -A10 'main()' "$RALPH_SCRIPT"
     [[ "$output" == *"help"* ]] && [[ "$output" == *"version"* ]]
 }
+
+# ============================================================================
+# Tool Inventory Cache Tests (v2.50)
+# ============================================================================
+
+@test "tool inventory cache functions exist" {
+    run grep -qE '^load_tool_inventory\(\)' "$RALPH_SCRIPT"
+    [ "$status" -eq 0 ]
+    run grep -qE '^refresh_tool_inventory\(\)' "$RALPH_SCRIPT"
+    [ "$status" -eq 0 ]
+}
+
+@test "startup_validation writes tool inventory cache" {
+    local TEST_HOME
+    TEST_HOME=$(mktemp -d)
+    HOME="$TEST_HOME" run bash "$RALPH_SCRIPT" classify "Fix typo in README" --json
+    [ -f "$TEST_HOME/.ralph/cache/tool-inventory" ]
+    run grep -q '^fingerprint=' "$TEST_HOME/.ralph/cache/tool-inventory"
+    [ "$status" -eq 0 ]
+    rm -rf "$TEST_HOME"
+}
+
+@test "tool inventory cache is invalidated when PATH changes" {
+    local TEST_HOME
+    TEST_HOME=$(mktemp -d)
+    HOME="$TEST_HOME" run bash "$RALPH_SCRIPT" classify "Fix typo" --json
+    local BEFORE
+    BEFORE=$(grep '^fingerprint=' "$TEST_HOME/.ralph/cache/tool-inventory")
+    mkdir -p "$TEST_HOME/bin"
+    HOME="$TEST_HOME" PATH="$TEST_HOME/bin:$PATH" run bash "$RALPH_SCRIPT" classify "Fix typo" --json
+    local AFTER
+    AFTER=$(grep '^fingerprint=' "$TEST_HOME/.ralph/cache/tool-inventory")
+    [ "$BEFORE" != "$AFTER" ]
+    rm -rf "$TEST_HOME"
+}
+
+@test "integrations --refresh rebuilds tool inventory cache" {
+    run grep -A4 'cmd_integrations()' "$RALPH_SCRIPT"
+    [[ "$output" == *"--refresh"* ]]
+    [[ "$output" == *"refresh_tool_inventory"* ]]
+}
@@ -0,0 +1,278 @@
+"""
+Tests for v2.50 hook infrastructure.
+
+- hook-timer.sh: opt-in per-hook timing wrapper
+- ralph hooks profile: on/off settings rewrite and latency report
+- ralph-hookd.py: one dispatcher per event, parallel handlers, merged output
+"""
+
+import json
+import os
+import subprocess
+import time
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+HOOK_TIMER = PROJECT_ROOT / ".claude" / "scripts" / "hook-timer.sh"
+HOOKD = PROJECT_ROOT / ".claude" / "scripts" / "ralph-hookd.py"
+RALPH = PROJECT_ROOT / "scripts" / "ralph"
+
+
+@pytest.fixture
+def fake_home(tmp_path):
+    """HOME with the repo's scripts/hooks installed as ~/.claude symlinks."""
+    claude = tmp_path / ".claude"
+    claude.mkdir()
+    (claude / "scripts").symlink_to(PROJECT_ROOT / ".claude" / "scripts")
+    (claude / "hooks").symlink_to(PROJECT_ROOT / ".claude" / "hooks")
+    return tmp_path
+
+
+def run_ralph(home, *args):
+    return subprocess.run(
+        ["bash", str(RALPH), *args], capture_output=True, text=True, timeout=60,
+        env={**os.environ, "HOME": str(home)}
+    )
+
+
+class TestHookTimer:
+    """hook-timer.sh must be transparent to the hook it wraps."""
+
+    def test_passthrough_and_record(self, fake_home, tmp_path):
+        hook = tmp_path / "echo-hook.sh"
+        hook.write_text('#!/bin/bash\ncat\necho "warned" >&2\nexit 2\n')
+        hook.chmod(0o755)
+        payload = json.dumps({"tool_name": "Bash", "tool_input": {"command": "ls"}})
+
+        result = subprocess.run(
+            ["bash", str(HOOK_TIMER), "PreToolUse", "--", str(hook)],
+            input=payload, capture_output=True, text=True, timeout=10,
+            env={**os.environ, "HOME": str(fake_home)}
+        )
+
+        assert result.returncode == 2
+        assert result.stdout.strip() == payload
+        assert result.stderr.strip() == "warned"
+        files = list((fake_home / ".ralph" / "metrics" / "hooks").glob("*.jsonl"))
+        assert len(files) == 1
+        record = json.loads(files[0].read_text())
+        assert record["event"] == "PreToolUse"
+        assert record["hook"] == "echo-hook.sh"
+        assert record["tool"] == "Bash"
+        assert record["exit"] == 2
+        assert record["bytes"] == len(payload)
+        assert record["us"] > 0
+
+    def test_compound_command_round_trips_through_bash_c(self, fake_home):
+        settings = fake_home / ".claude" / "settings.json"
+        compound = "FOO=it\\'s; echo \"$FOO\" && exit 3"
+        settings.write_text(json.dumps({"hooks": {"Stop": [{"hooks": [
+            {"type": "command", "command": compound}]}]}}))
+
+        assert run_ralph(fake_home, "hooks", "profile", "on").returncode == 0
+        wrapped = json.loads(settings.read_text())["hooks"]["Stop"][0]["hooks"][0]["command"]
+        assert " Stop --sh '" in wrapped
+
+        result = subprocess.run(
+            ["bash", "-c", wrapped.replace("${HOME}", str(fake_home))], input="{}",
+            capture_output=True, text=True, timeout=10,
+            env={**os.environ, "HOME": str(fake_home)}
+        )
+        assert (result.returncode, result.stdout) == (3, "it's\n")
+
+        assert run_ralph(fake_home, "hooks", "profile", "off").returncode == 0
+        restored = json.loads(settings.read_text())["hooks"]["Stop"][0]["hooks"][0]["command"]
+        assert restored == compound
+
+
+class TestHooksProfileCommand:
+    """ralph hooks profile on|off and the percentile report."""
+
+    SETTINGS = {
+        "model": "opus",
+        "hooks": {
+            "PreToolUse": [{"matcher": "Bash", "hooks": [
+                {"type": "command", "command": "${HOME}/.claude/hooks/git-safety-guard.py", "timeout": 5}
+            ]}],
+            "Stop": [{"hooks": [
+                {"type": "command", "command": "${HOME}/.claude/hooks/reflection-engine.sh"}
+            ]}],
+        },
+    }
+
+    def test_on_off_round_trip(self, fake_home):
+        settings = fake_home / ".claude" / "settings.json"
+        settings.write_text(json.dumps(self.SETTINGS))
+
+        assert run_ralph(fake_home, "hooks", "profile", "on").returncode == 0
+        assert run_ralph(fake_home, "hooks", "profile", "on").returncode == 0  # idempotent
+        wrapped = json.loads(settings.read_text())
+        command = wrapped["hooks"]["PreToolUse"][0]["hooks"][0]["command"]
+        assert command == ("${HOME}/.claude/scripts/hook-timer.sh PreToolUse -- "
+                           "${HOME}/.claude/hooks/git-safety-guard.py")
+        assert wrapped["hooks"]["Stop"][0]["hooks"][0]["command"].count("hook-timer.sh") == 1
+        assert wrapped["model"] == "opus"
+
+        assert run_ralph(fake_home, "hooks", "profile", "off").returncode == 0
+        assert json.loads(settings.read_text()) == self.SETTINGS
+
+    def test_report_percentiles_and_budget(self, fake_home):
+        metrics = fake_home / ".ralph" / "metrics" / "hooks"
+        metrics.mkdir(parents=True)
+        lines = [{"ts": 1, "event": "PreToolUse", "hook": "slow.sh", "tool": "Task",
+                  "us": ms * 1000, "exit": 0 if ms < 100 else 1, "bytes": 10}
+                 for ms in range(1, 101)]
+        lines += [{"ts": 1, "event": "Stop", "hook": "fast.sh", "tool": "",
+                   "us": 2000, "exit": 0, "bytes": 0}] * 5
+        (metrics / "2026-01-01.jsonl").write_text("".join(json.dumps(l) + "\n" for l in lines))
+
+        result = run_ralph(fake_home, "hooks", "profile", "--budget", "50", "--json")
+        assert result.returncode == 0, result.stderr
+        report = {h["hook"]: h for h in json.loads(result.stdout)["hooks"]}
+
+        slow = report["slow.sh"]
+        assert (slow["calls"], slow["p50"], slow["p95"], slow["p99"], slow["max"]) == (100, 50, 95, 99, 100)
+        assert slow["errors"] == 1 and slow["over_budget"] is True
+        assert report["fast.sh"]["p95"] == 2 and report["fast.sh"]["over_budget"] is False
+
+        text = run_ralph(fake_home, "hooks", "profile", "--budget", "50").stdout
+        assert "OVER BUDGET" in text and "1 hook(s) exceed" in text
+
+
+class TestHookDispatcher:
+    """ralph-hookd.py run/install/uninstall."""
+
+    @staticmethod
+    def handler(tmp_path, name, body):
+        script = tmp_path / name
+        script.write_text("#!/bin/bash\n" + body + "\n")
+        script.chmod(0o755)
+        return str(script)
+
+    def dispatch(self, tmp_path, event, events, payload):
+        registry = tmp_path / "hookd.json"
+        registry.write_text(json.dumps({"version": 1, "events": {event: events}}))
+        start = time.monotonic()
+        result = subprocess.run(
+            ["python3", str(HOOKD), "run", event, "--registry", str(registry)],
+            input=json.dumps(payload), capture_output=True, text=True, timeout=30,
+            env={**os.environ, "HOME": str(tmp_path)}
+        )
+        return result, time.monotonic() - start
+
+    def test_parallel_handlers_merge_context(self, tmp_path):
+        ctx = '{"decision": "continue", "hookSpecificOutput": {"additionalContext": "%s"}}'
+        events = [
+            {"matcher": "Task", "command": self.handler(tmp_path, "a.sh", f"sleep 0.5; echo '{ctx % 'from a'}'")},
+            {"matcher": "Task", "command": self.handler(tmp_path, "b.sh", f"sleep 0.5; echo '{ctx % 'from b'}'")},
+            {"matcher": "Bash", "command": self.handler(tmp_path, "c.sh", "echo never; exit 2")},
+            {"command": self.handler(tmp_path, "d.sh", "cat > /dev/null; echo 'not json'")},
+        ]
+        result, elapsed = self.dispatch(tmp_path, "PreToolUse", events, {"tool_name": "Task"})
+
+        assert result.returncode == 0, result.stderr
+        output = json.loads(result.stdout)
+        assert output["decision"] == "continue"
+        assert output["hookSpecificOutput"] == {"additionalContext": "from a\n\nfrom b",
+                                                "hookEventName": "PreToolUse"}
+        assert elapsed < 0.95, f"handlers ran serially ({elapsed:.2f}s)"
+
+    def test_deny_and_block_win(self, tmp_path):
+        allow = '{"hookSpecificOutput": {"permissionDecision": "allow"}}'
+        deny = ('{"hookSpecificOutput": {"permissionDecision": "deny", '
+                '"permissionDecisionReason": "force push"}}')
+        events = [
+            {"matcher": "Bash", "command": self.handler(tmp_path, "allow.sh", f"echo '{allow}'")},
+            {"matcher": "Bash", "command": self.handler(tmp_path, "deny.sh", f"echo '{deny}'")},
+            {"matcher": "Bash", "parallel": False,
+             "command": self.handler(tmp_path, "later.sh", f"touch {tmp_path}/ran")},
+        ]
+        result, _ = self.dispatch(tmp_path, "PreToolUse", events, {"tool_name": "Bash"})
+        specific = json.loads(result.stdout)["hookSpecificOutput"]
+        assert specific["permissionDecision"] == "deny"
+        assert specific["permissionDecisionReason"] == "force push"
+        assert not (tmp_path / "ran").exists(), "batches after a deny must not run"
+
+        events = [
+            {"command": self.handler(tmp_path, "ok.sh", "echo '{\"decision\": \"continue\"}'")},
+            {"command": self.handler(tmp_path, "stop.sh", "echo 'secrets in prompt' >&2; exit 2")},
+            {"command": self.handler(tmp_path, "crash.sh", "exit 1")},
+        ]
+        result, _ = self.dispatch(tmp_path, "UserPromptSubmit", events, {"prompt": "x"})
+        assert result.returncode == 2
+        assert result.stderr.strip() == "secrets in prompt"
+
+    def test_install_uninstall_round_trip(self, tmp_path):
+        settings_file = tmp_path / "settings.json"
+        settings = {
+            "model": "opus",
+            "hooks": {
+                "PreToolUse": [
+                    {"matcher": "Task", "hooks": [
+                        {"type": "command", "command": "${HOME}/.claude/hooks/smart-memory-search.sh", "timeout": 15},
+                        {"type": "command", "command": "${HOME}/.claude/hooks/procedural-inject.sh", "timeout": 5},
+                    ]},
+                    {"matcher": "Bash", "hooks": [
+                        {"type": "command", "command": "python3 ${HOME}/.claude/hooks/git-safety-guard.py"},
+                        {"type": "prompt", "prompt": "Is this command safe?"},
+                    ]},
+                ],
+                "Stop": [{"hooks": [{"type": "command", "command": "${HOME}/.claude/hooks/reflection-engine.sh"}]}],
+            },
+        }
+        settings_file.write_text(json.dumps(settings))
+        registry = tmp_path / "hookd.json"
+
+        def cli(*args):
+            return subprocess.run(["python3", str(HOOKD), *args, "--settings", str(settings_file),
+                                   "--registry", str(registry)],
+                                  capture_output=True, text=True, timeout=30)
+
+        assert json.loads(cli("install").stdout) == {"installed": 4}
+        installed = json.loads(settings_file.read_text())
+        pre = installed["hooks"]["PreToolUse"]
+        assert pre[0] == {"matcher": "Bash", "hooks": [{"type": "prompt", "prompt": "Is this command safe?"}]}
+        assert pre[1]["hooks"] == [{"type": "command", "timeout": 65,
+                                    "command": "python3 ${HOME}/.claude/scripts/ralph-hookd.py run PreToolUse"}]
+        assert [h["matcher"] for h in json.loads(registry.read_text())["events"]["PreToolUse"]] == \
+            ["Task", "Task", "Bash"]
+        assert json.loads(cli("install").stdout) == {"installed": 0}  # idempotent
+
+        assert json.loads(cli("uninstall").stdout) == {"uninstalled": 4}
+        restored = json.loads(settings_file.read_text())
+        assert restored["model"] == "opus"
+        assert restored["hooks"]["Stop"] == settings["hooks"]["Stop"]
+        assert restored["hooks"]["PreToolUse"][1] == settings["hooks"]["PreToolUse"][0]
+        assert not registry.exists()
+
+    def test_profiled_dispatcher_is_recognized(self, tmp_path):
+        settings_file = tmp_path / "settings.json"
+        settings_file.write_text(json.dumps({"hooks": {"Stop": [{"hooks": [
+            {"type": "command", "command": "${HOME}/.claude/hooks/reflection-engine.sh"}]}]}}))
+        registry = tmp_path / "hookd.json"
+
+        def cli(*args):
+            return subprocess.run(["python3", str(HOOKD), *args, "--settings", str(settings_file),
+                                   "--registry", str(registry)],
+                                  capture_output=True, text=True, timeout=30)
+
+        def profile():
+            # What `ralph hooks profile on` does to every settings.json command
+            data = json.loads(settings_file.read_text())
+            for group in data["hooks"]["Stop"]:
+                for hook in group["hooks"]:
+                    hook["command"] = "${HOME}/.claude/scripts/hook-timer.sh Stop -- " + hook["command"]
+            settings_file.write_text(json.dumps(data))
+
+        assert json.loads(cli("install").stdout) == {"installed": 1}
+        profile()
+        assert json.loads(cli("install").stdout) == {"installed": 0}
+        commands = json.loads(registry.read_text())["events"]["Stop"]
+        assert [h["command"] for h in commands] == ["${HOME}/.claude/hooks/reflection-engine.sh"]
+
+        assert json.loads(cli("uninstall").stdout) == {"uninstalled": 1}
+        stop = json.loads(settings_file.read_text())["hooks"]["Stop"]
+        assert [h["command"] for g in stop for h in g["hooks"]] == \
+            ["${HOME}/.claude/hooks/reflection-engine.sh"]
@@ -0,0 +1,398 @@
+"""
+Tests for the v2.50 plan-state engine (.claude/scripts/plan-state.py).
+
+- operation log + materialized plan-state.json view + current-step pointer
+- lock-free concurrent appends
+- adoption of a plan-state.json written by the v2.45 hooks
+- `ralph plan` subcommands on top of the engine
+- plan-drift.py: incremental interface drift and downstream propagation
+- plan-scheduler.py: DAG scheduling with file ownership, retries, worktrees
+"""
+
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+ENGINE = PROJECT_ROOT / ".claude" / "scripts" / "plan-state.py"
+DRIFT = PROJECT_ROOT / ".claude" / "scripts" / "plan-drift.py"
+SCHEDULER = PROJECT_ROOT / ".claude" / "scripts" / "plan-scheduler.py"
+RALPH = PROJECT_ROOT / "scripts" / "ralph"
+
+
+def engine(project, *args):
+    return subprocess.run(
+        ["python3", str(ENGINE), "--dir", str(project / ".claude"), *args],
+        capture_output=True, text=True, timeout=30
+    )
+
+
+def drift(project, *args):
+    return subprocess.run(
+        ["python3", str(DRIFT), "--dir", str(project / ".claude"), *args],
+        capture_output=True, text=True, timeout=30
+    )
+
+
+def view(project):
+    return json.loads((project / ".claude" / "plan-state.json").read_text())
+
+
+class TestPlanStateEngine:
+    """Op log, snapshot view and pointer."""
+
+    def test_transitions_materialize_view_and_pointer(self, tmp_path):
+        plan_id = engine(tmp_path, "init", "Build auth", "7", "opus").stdout.strip()
+        engine(tmp_path, "add-step", "1", "Schema", "src/db.sql")
+        engine(tmp_path, "add-step", "2", "Routes", "src/routes.ts", "modify", "login/logout")
+        assert engine(tmp_path, "start", "1").returncode == 0
+
+        plan = view(tmp_path)
+        assert plan["plan_id"] == plan_id
+        assert plan["classification"] == {"complexity": 7, "model_routing": "opus",
+                                          "adversarial_required": True}
+        assert [s["status"] for s in plan["steps"]] == ["in_progress", "pending"]
+        assert plan["steps"][1]["description"] == "login/logout"
+        assert (tmp_path / ".claude" / "plan-state.current").read_text() == "1\tin_progress\tSchema\n"
+
+        engine(tmp_path, "complete", "1")
+        assert (tmp_path / ".claude" / "plan-state.current").read_text() == "2\tpending\tRoutes\n"
+
+        result = engine(tmp_path, "start", "9")
+        assert result.returncode == 1 and "Unknown step: 9" in result.stderr
+
+    def test_updates_append_and_fold_later(self, tmp_path):
+        engine(tmp_path, "init", "task")
+        engine(tmp_path, "add-step", "s1", "Step one")
+        before = (tmp_path / ".claude" / "plan-state.json").read_bytes()
+
+        assert engine(tmp_path, "update", "--step", "s1",
+                      '{"drift": {"detected": true, "items": ["renamed"]}}').returncode == 0
+        assert (tmp_path / ".claude" / "plan-state.json").read_bytes() == before
+
+        shown = json.loads(engine(tmp_path, "show").stdout)
+        assert shown["steps"][0]["drift"] == {"detected": True, "items": ["renamed"]}
+        engine(tmp_path, "materialize")
+        assert view(tmp_path)["steps"][0]["drift"]["detected"] is True
+
+    def test_concurrent_appends_are_not_lost(self, tmp_path):
+        engine(tmp_path, "init", "task")
+        engine(tmp_path, "add-step", "s1", "Step one")
+
+        def update(i):
+            return engine(tmp_path, "update", "--step", "s1", json.dumps({f"k{i}": "x" * 200})).returncode
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            assert set(pool.map(update, range(40))) == {0}
+
+        lines = (tmp_path / ".claude" / "plan-state.log").read_text().splitlines()
+        assert all(json.loads(line) for line in lines)
+        step = json.loads(engine(tmp_path, "show").stdout)["steps"][0]
+        assert sum(1 for k in step if k.startswith("k")) == 40
+
+    def test_torn_record_ignored(self, tmp_path):
+        engine(tmp_path, "init", "task")
+        engine(tmp_path, "add-step", "s1", "Step one")
+        with open(tmp_path / ".claude" / "plan-state.log", "a") as f:
+            f.write('{"op":"status","id":"s1","stat')
+        assert json.loads(engine(tmp_path, "show").stdout)["steps"][0]["status"] == "pending"
+
+    def test_adopts_legacy_plan(self, tmp_path):
+        claude = tmp_path / ".claude"
+        claude.mkdir()
+        legacy = {"plan_id": "legacy-1", "task": "old", "classification": {"complexity": 3},
+                  "steps": [{"id": "a", "title": "A", "status": "completed"},
+                            {"id": "b", "title": "B", "status": "pending"}],
+                  "loop_state": {}, "metadata": {}}
+        (claude / "plan-state.json").write_text(json.dumps(legacy))
+
+        assert engine(tmp_path, "start", "b").returncode == 0
+        plan = view(tmp_path)
+        assert plan["plan_id"] == "legacy-1"
+        assert [s["status"] for s in plan["steps"]] == ["completed", "in_progress"]
+        first = json.loads((claude / "plan-state.log").read_text().splitlines()[0])
+        assert first["op"] == "import"
+
+    def test_concurrent_first_writers_import_legacy_plan_once(self, tmp_path, monkeypatch):
+        import importlib.util
+        spec = importlib.util.spec_from_file_location("plan_state", ENGINE)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        claude = tmp_path / ".claude"
+        claude.mkdir()
+        legacy = {"plan_id": "legacy-1", "task": "old", "metadata": {},
+                  "steps": [{"id": "a", "title": "A", "status": "pending"}]}
+        (claude / "plan-state.json").write_text(json.dumps(legacy))
+
+        # Widen the window between the emptiness check and the import
+        read_view = module.PlanState._read_view
+
+        def slow_read_view(self):
+            time.sleep(0.05)
+            return read_view(self)
+
+        monkeypatch.setattr(module.PlanState, "_read_view", slow_read_view)
+
+        def update(i):
+            module.PlanState(claude).append({"op": "update", "id": "a", "set": {f"k{i}": i}})
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(update, range(8)))
+
+        ops = [json.loads(line)["op"] for line in (claude / "plan-state.log").read_text().splitlines()]
+        assert ops == ["import"] + ["update"] * 8
+
+
+class TestPlanDrift:
+    """Fingerprints per step, propagation through depends_on."""
+
+    @pytest.fixture
+    def project(self, tmp_path):
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / "auth.py").write_text(
+            "def login(user, password):\n    return True\n\ndef _helper():\n    pass\n")
+        (tmp_path / "src" / "routes.ts").write_text("export function loginRoute(req) {}\n")
+        engine(tmp_path, "init", "auth")
+        engine(tmp_path, "add-step", "s1", "Auth service", "src/auth.py")
+        engine(tmp_path, "add-step", "s2", "Routes", "src/routes.ts", "--depends-on", "s1")
+        engine(tmp_path, "add-step", "s3", "Docs", "docs/auth.md", "--depends-on", "s2")
+        engine(tmp_path, "add-step", "s4", "CLI", "src/cli.py", "--symbols", "login")
+        engine(tmp_path, "add-step", "s5", "Unrelated", "src/other.py")
+        engine(tmp_path, "complete", "s1")
+        assert drift(tmp_path, "baseline", "--step", "s1").returncode == 0
+        return tmp_path
+
+    @staticmethod
+    def steps(project):
+        return {s["id"]: s["drift"] for s in json.loads(engine(project, "show").stdout)["steps"]}
+
+    def test_signature_change_propagates_downstream(self, project):
+        auth = project / "src" / "auth.py"
+        auth.write_text(auth.read_text().replace("def _helper", "def _helper2").replace("True", "1"))
+        assert json.loads(drift(project, "check", "src/auth.py").stdout) == {}, "body-only edit"
+
+        auth.write_text(auth.read_text().replace("(user, password)", "(user, password, otp)"))
+        updates = json.loads(drift(project, "check", str(auth)).stdout)
+        assert sorted(updates) == ["s1", "s2", "s3", "s4"]
+
+        steps = self.steps(project)
+        assert steps["s1"]["detected"] and "signature changed: login" in steps["s1"]["items"][0]
+        assert "needs_patch" not in steps["s1"]
+        for downstream in ("s2", "s3", "s4"):
+            assert steps[downstream]["needs_patch"] is True
+            assert steps[downstream]["upstream"] == ["s1"]
+        assert steps["s5"] == {"detected": False, "items": []}
+
+        report = json.loads(drift(project, "report", "--json").stdout)
+        assert [e["id"] for e in report["needs_patch"]] == ["s2", "s3", "s4"]
+
+        auth.write_text(auth.read_text().replace(", otp", ""))
+        drift(project, "check", "src/auth.py")
+        assert not any(d["detected"] for d in self.steps(project).values())
+
+    def test_hook_only_reads_declared_files(self, project):
+        index = project / ".claude" / "plan-drift.json"
+        before = index.read_bytes()
+        payload = {"tool_name": "Edit", "tool_input": {"file_path": str(project / "README.md")}}
+        result = subprocess.run(["python3", str(DRIFT), "--dir", str(project / ".claude"), "hook"],
+                                input=json.dumps(payload), capture_output=True, text=True, timeout=30)
+        assert json.loads(result.stdout) == {"decision": "continue"}
+        assert index.read_bytes() == before
+
+        (project / "src" / "auth.py").write_text("def signin(user):\n    pass\n")
+        payload["tool_input"]["file_path"] = str(project / "src" / "auth.py")
+        result = subprocess.run(["python3", str(DRIFT), "--dir", str(project / ".claude"), "hook"],
+                                input=json.dumps(payload), capture_output=True, text=True, timeout=30)
+        context = json.loads(result.stdout)["hookSpecificOutput"]["additionalContext"]
+        assert "step(s) s1" in context and "s2, s3, s4" in context
+
+    def test_hook_prefilter_matches_non_ascii_paths(self, project, tmp_path):
+        (project / "src" / "café.py").write_text("def brew(size):\n    pass\n")
+        engine(project, "add-step", "s6", "Café", "src/café.py")
+        engine(project, "complete", "s6")
+        drift(project, "baseline", "--step", "s6")
+        assert "src/café.py" in (project / ".claude" / "plan-drift.json").read_text("utf-8")
+
+        home = tmp_path / "home"
+        (home / ".claude").mkdir(parents=True)
+        (home / ".claude" / "scripts").symlink_to(PROJECT_ROOT / ".claude" / "scripts")
+        (project / "src" / "café.py").write_text("def brew(size, milk):\n    pass\n")
+        payload = json.dumps({"tool_name": "Edit",
+                              "tool_input": {"file_path": str(project / "src" / "café.py")}},
+                             ensure_ascii=False)
+        result = subprocess.run(
+            ["bash", str(PROJECT_ROOT / ".claude" / "hooks" / "plan-drift-check.sh")],
+            input=payload, capture_output=True, text=True, timeout=30, cwd=project,
+            env={**os.environ, "HOME": str(home)})
+        assert "step(s) s6" in json.loads(result.stdout)["hookSpecificOutput"]["additionalContext"]
+
+
+class TestPlanScheduler:
+    """plan-scheduler.py run: critical-path wall time, ownership, failure handling."""
+
+    @staticmethod
+    def schedule(project, *args):
+        return subprocess.run(
+            ["python3", str(SCHEDULER), "--dir", str(project / ".claude"), "run", "--json", *args],
+            capture_output=True, text=True, timeout=60, cwd=project,
+            env={**os.environ, "HOME": str(project)}
+        )
+
+    @pytest.fixture
+    def diamond(self, tmp_path):
+        """a -> (b, c) -> d, plus e (independent) and f (shares a's file)."""
+        engine(tmp_path, "init", "diamond")
+        engine(tmp_path, "add-step", "a", "A", "a.py")
+        engine(tmp_path, "add-step", "b", "B", "b.py", "--depends-on", "a")
+        engine(tmp_path, "add-step", "c", "C", "c.py", "--depends-on", "a")
+        engine(tmp_path, "add-step", "d", "D", "d.py", "--depends-on", "b,c")
+        engine(tmp_path, "add-step", "e", "E", "e.py")
+        engine(tmp_path, "add-step", "f", "F", "f.py", "--files", "a.py")
+        return tmp_path
+
+    def test_dry_run_waves(self, diamond):
+        result = json.loads(self.schedule(diamond, "--jobs", "4", "--dry-run").stdout)
+        assert result["waves"] == [["a", "e"], ["b", "c", "f"], ["d"]]
+        assert result["critical_path"] == ["a", "b", "d"]
+
+    def test_wall_time_follows_critical_path(self, diamond):
+        worker = 'sleep 0.4; echo "$RALPH_STEP_ID $(date +%s%N)" >> "$RALPH_PLAN_DIR/../order"'
+        start = time.monotonic()
+        result = self.schedule(diamond, "--jobs", "4", "--worker", worker)
+        elapsed = time.monotonic() - start
+
+        assert result.returncode == 0, result.stderr
+        report = json.loads(result.stdout)
+        assert sorted(report["completed"]) == ["a", "b", "c", "d", "e", "f"]
+        assert elapsed < 6 * 0.4, f"steps ran serially ({elapsed:.2f}s)"
+        order = [line.split()[0] for line in (diamond / "order").read_text().splitlines()]
+        assert order.index("a") < order.index("b") and order.index("a") < order.index("f")
+        assert order[-1] == "d"
+        assert {s["status"] for s in view(diamond)["steps"]} == {"completed"}
+
+    def test_failure_blocks_dependents_only(self, diamond):
+        worker = '[ "$RALPH_STEP_ID" != c ] || { echo boom; exit 3; }'
+        result = self.schedule(diamond, "--jobs", "2", "--retries", "1", "--worker", worker)
+        assert result.returncode == 1
+        report = json.loads(result.stdout)
+        assert report["failed"] == ["c"]
+        assert report["blocked"] == {"d": ["c"]}
+        assert sorted(report["completed"]) == ["a", "b", "e", "f"]
+
+        steps = {s["id"]: s for s in view(diamond)["steps"]}
+        assert steps["c"]["status"] == "failed" and "exit 3" in steps["c"]["run"]["error"]
+        assert steps["d"]["status"] == "pending" and steps["d"]["blocked_by"] == ["c"]
+        assert len(list(Path(report["logs"]).glob("c.*.log"))) == 2
+
+        # Next run picks up the failed step and what it blocked
+        report = json.loads(self.schedule(diamond, "--worker", "true").stdout)
+        assert report["completed"] == ["c", "d"]
+        steps = {s["id"]: s for s in view(diamond)["steps"]}
+        assert steps["d"]["status"] == "completed" and steps["d"]["blocked_by"] == []
+
+    def test_git_timeout_fails_the_merge(self, tmp_path):
+        import importlib.util
+
+        spec = importlib.util.spec_from_file_location("plan_scheduler", SCHEDULER)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        state = module.plan_state_module().PlanState(tmp_path / ".claude")
+        scheduler = module.Scheduler(state, jobs=1, worktrees=True, log=lambda message: None)
+        calls = []
+
+        def slow_git(*args, cwd=None):
+            calls.append(args[0])
+            if args[0] == "merge" and "--abort" not in args:
+                raise subprocess.TimeoutExpired(["git", *args], 120)
+            return subprocess.CompletedProcess(args, 0, "", "")
+
+        scheduler._git = slow_git
+        error = scheduler._merge_worktree({"plan_id": "p"}, {"id": "a", "title": "A"})
+        assert error == "git merge timed out after 120s"
+        assert calls[-1] == "merge" and "worktree" not in calls
+
+    def test_cycle_rejected(self, tmp_path):
+        engine(tmp_path, "init", "cycle")
+        engine(tmp_path, "add-step", "a", "A", "a.py")
+        engine(tmp_path, "add-step", "b", "B", "b.py", "--depends-on", "a")
+        engine(tmp_path, "add-step", "a", "A", "a.py", "--depends-on", "b")
+        result = self.schedule(tmp_path, "--worker", "true")
+        assert result.returncode == 1 and "Dependency cycle" in result.stderr
+
+    def test_worktrees_merge_back(self, tmp_path):
+        def git(*args):
+            subprocess.run(["git", *args], cwd=tmp_path, check=True, capture_output=True)
+
+        git("init", "-q")
+        git("config", "user.email", "ralph@example.com")
+        git("config", "user.name", "ralph")
+        (tmp_path / ".gitignore").write_text(".claude/\n.worktrees/\n")
+        git("add", ".gitignore")
+        git("commit", "-qm", "init")
+        engine(tmp_path, "init", "worktrees")
+        engine(tmp_path, "add-step", "a", "A", "a.txt")
+        engine(tmp_path, "add-step", "b", "B", "b.txt")
+        engine(tmp_path, "add-step", "c", "C", "c.txt", "--depends-on", "a,b")
+
+        result = self.schedule(tmp_path, "--jobs", "2", "--worktrees", "--worker",
+                               'ls > "$RALPH_STEP_ID.txt"')
+        assert result.returncode == 0, result.stderr
+        assert "a.txt" in (tmp_path / "c.txt").read_text()
+        assert not (tmp_path / ".worktrees" / "plan-c").exists()
+
+
+class TestRalphPlanCommands:
+    """ralph plan subcommands go through the engine."""
+
+    @pytest.fixture
+    def fake_home(self, tmp_path):
+        home = tmp_path / "home"
+        (home / ".claude").mkdir(parents=True)
+        (home / ".claude" / "scripts").symlink_to(PROJECT_ROOT / ".claude" / "scripts")
+        return home
+
+    def ralph(self, home, cwd, *args):
+        return subprocess.run(["bash", str(RALPH), "plan", *args], capture_output=True, text=True,
+                              timeout=60, cwd=cwd, env={**os.environ, "HOME": str(home)})
+
+    def test_plan_lifecycle(self, fake_home, tmp_path):
+        project = tmp_path / "project"
+        project.mkdir()
+        assert self.ralph(fake_home, project, "init", "Add login", "4").returncode == 0
+        assert self.ralph(fake_home, project, "add-step", "1", "Login form").returncode == 0
+        assert self.ralph(fake_home, project, "start", "1").returncode == 0
+
+        current = self.ralph(fake_home, project, "current")
+        assert current.stdout.strip().splitlines()[-1] == "1 [in_progress] Login form"
+        assert "Current:  1 [in_progress] Login form" in self.ralph(fake_home, project, "status").stdout
+
+        engine(project, "update", "--step", "1", '{"drift": {"detected": true, "items": ["x"]}}')
+        assert "Found 1 step(s) with drift" in self.ralph(fake_home, project, "sync").stdout
+
+        assert self.ralph(fake_home, project, "clear").returncode == 0
+        assert not list((project / ".claude").glob("plan-state*"))
+
+    def test_verify_reports_drift_without_rebaselining(self, fake_home, tmp_path):
+        project = tmp_path / "project"
+        project.mkdir()
+        (project / "api.py").write_text("def fetch(url):\n    pass\n")
+        self.ralph(fake_home, project, "init", "API", "4")
+        engine(project, "add-step", "1", "API client", "api.py")
+        assert self.ralph(fake_home, project, "complete", "1").returncode == 0
+
+        (project / "api.py").write_text("def fetch(url, timeout):\n    pass\n")
+        for _ in range(2):
+            verify = self.ralph(fake_home, project, "verify", "1")
+            assert verify.returncode == 0
+            assert "drifted from its completion baseline" in verify.stdout
+            assert "signature changed: fetch" in verify.stdout
+        assert view(project)["steps"][0]["drift"]["detected"] is True
+
+        self.ralph(fake_home, project, "complete", "1")
+        plan = json.loads(engine(project, "show").stdout)
+        assert plan["steps"][0]["drift"]["detected"] is False
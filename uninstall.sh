@@ -61,6 +61,22 @@ RALPH_COMMANDS=(
     "improvements.md"
 )
 
+# Ralph helper scripts to remove when install.sh left no manifest
+# (ledger-manager.py/handoff-generator.py may be the user's own, so not listed)
+RALPH_SCRIPTS=(
+    "context-engine-daemon.py"
+    "hook-timer.sh"
+    "memory-manager.py"
+    "plan-drift.py"
+    "plan-scheduler.py"
+    "plan-state.py"
+    "procedural-matcher.py"
+    "ralph-hookd.py"
+    "ralph_loader.py"
+    "reflection-executor.py"
+    "vector-index.py"
+)
+
 # Ralph skills to remove
 RALPH_SKILLS=(
     "ask-questions-if-underspecified"
@@ -113,6 +129,30 @@ remove_claude_components() {
     [ -f "${CLAUDE_DIR}/hooks/git-safety-guard.py" ] && rm -f "${CLAUDE_DIR}/hooks/git-safety-guard.py"
     log_success "Removed Ralph hooks (quality-gates.sh, git-safety-guard.py)"
 
+    # Remove helper scripts (stop the context-engine daemon first). Only the
+    # files install.sh recorded are removed, so a user's own ledger-manager.py
+    # or handoff-generator.py that the installer kept stays in place.
+    if [ -f "${CLAUDE_DIR}/scripts/context-engine-daemon.py" ]; then
+        python3 "${CLAUDE_DIR}/scripts/context-engine-daemon.py" stop >/dev/null 2>&1 || true
+    fi
+    local manifest="${CLAUDE_DIR}/scripts/.ralph-installed"
+    local script
+    local scripts=("${RALPH_SCRIPTS[@]}")
+    if [ -f "$manifest" ]; then
+        scripts=()
+        while IFS= read -r script; do
+            [ -n "$script" ] && scripts+=("$script")
+        done < "$manifest"
+    fi
+    for script in ${scripts[@]+"${scripts[@]}"}; do
+        case "$script" in */*|.*) continue ;; esac
+        rm -f "${CLAUDE_DIR}/scripts/${script}"
+    done
+    rm -f "$manifest"
+    rm -rf "${CLAUDE_DIR}/scripts/__pycache__"
+    rmdir "${CLAUDE_DIR}/scripts" 2>/dev/null || true
+    log_success "Removed Ralph helper scripts"
+
     # Clean settings.json (remove only Ralph entries, preserve user config)
     clean_settings_json
 }